@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# pylint: disable=C0111
+"""
+Time the hot paths of the order models and views and compare them against stored baselines.
+
+Every benchmark is run against a fresh test database, created and migrated like the one of the test suite, and timed
+over a number of rounds. The median time of each benchmark is compared with benchmarks/baseline.json, and benchmarks
+which got slower than the baseline by more than the threshold are flagged, in which case the script exits with 1.
+
+Run it from the src directory, after collecting the static files like the test suite does:
+
+    $ export DJANGO_SETTINGS_MODULE=config.settings.test DJANGO_DATABASE_URL=sqlite:///:memory:
+    $ python manage.py collectstatic --no-input
+    $ python ../benchmarks/hot_paths.py
+    $ python ../benchmarks/hot_paths.py --save    # after an intended change, to store new baselines
+
+Timings depend on the machine and the database, so baselines are only comparable when recorded on the same setup.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+SRC_DIR = BENCHMARKS_DIR.parent / 'src'
+BASELINE_FILE = BENCHMARKS_DIR / 'baseline.json'
+
+
+def parse_args():
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('names', nargs='*', help='run only the benchmarks whose name starts with one of these')
+    parser.add_argument('--rounds', type=int, default=20, help='timed rounds per benchmark (default: 20)')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='flag benchmarks slower than baseline * (1 + threshold) (default: 0.25)')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_FILE,
+                        help=f'baseline file (default: {BASELINE_FILE.relative_to(BENCHMARKS_DIR.parent)})')
+    parser.add_argument('--save', action='store_true', help='store the measured times as new baselines')
+    return parser.parse_args()
+
+
+def setup_django():
+    """Configure Django with the test settings and return a function which destroys the test database."""
+    sys.path.insert(0, str(SRC_DIR if SRC_DIR.is_dir() else Path.cwd()))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.test')
+    os.environ.setdefault('DJANGO_DATABASE_URL', 'sqlite:///:memory:')
+    import django  # pylint: disable=C0415
+    from django.test.utils import setup_databases, setup_test_environment, teardown_databases  # pylint: disable=C0415
+    django.setup()
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    return lambda: teardown_databases(old_config, verbosity=0)
+
+
+def create_order(item_count, number=0, state='preparing'):
+    """Return a saved order with item_count items of different participants."""
+    from chaospizza.orders.models import Order, OrderItem  # pylint: disable=C0415
+    order = Order.objects.create(coordinator=f'Coordinator {number}', restaurant_name=f'Restaurant {number}')
+    order.change_items(create=[
+        OrderItem(participant=f'Participant {index}', description=f'Pizza {index % 30}',
+                  price=Decimal('6.50'), amount=1 + index % 3)
+        for index in range(item_count)
+    ])
+    if state != 'preparing':
+        Order.objects.filter(pk=order.pk).update(state=state)
+        order.state = state
+    return order
+
+
+class Benchmark:
+    """A timed call, prepared by an untimed setup."""
+
+    def __init__(self, name, setup, call):
+        """
+        Create a benchmark.
+
+        :param setup: function returning the argument passed to call, called before every round
+        :param call: function whose duration is measured
+        """
+        self.name = name
+        self.setup = setup
+        self.call = call
+
+    def run(self, rounds):
+        """Run one untimed warm-up round and the given number of timed rounds, and return the times in ms."""
+        from django.core.cache import cache  # pylint: disable=C0415
+        from django.db import transaction  # pylint: disable=C0415
+        times = []
+        for _ in range(rounds + 1):
+            # Every round starts from the same data, which is rolled back afterwards.
+            with transaction.atomic():
+                cache.clear()
+                argument = self.setup()
+                start = time.perf_counter()
+                self.call(argument)
+                times.append((time.perf_counter() - start) * 1000)
+                transaction.set_rollback(True)
+        return times[1:]
+
+
+def order_total(item_count):
+    """Recalculate and read the total price of an order, as done after every change of its items."""
+    def call(order):
+        order.update_summary()
+        return order.total_price
+    return Benchmark(f'order_total[{item_count}]', lambda: create_order(item_count), call)
+
+
+def state_transitions():
+    """Move an order with 10 items from preparing to delivered."""
+    def call(order):
+        order.ordering()
+        order.ordered()
+        order.delivered()
+    return Benchmark('state_transitions', lambda: create_order(10), call)
+
+
+def orderitem_save(item_count):
+    """Save a single new item to an order, with the state check and summary update of OrderItem.save()."""
+    from chaospizza.orders.models import OrderItem  # pylint: disable=C0415
+
+    def setup():
+        return OrderItem(order=create_order(item_count), participant='Bernd', description='Pizza Salami',
+                         price=Decimal('5.60'), amount=1)
+    return Benchmark(f'orderitem_save[{item_count}]', setup, lambda item: item.save())
+
+
+def render_order_list(order_count):
+    """Render the first page of the full order list response, with an empty page cache."""
+    from django.test import Client  # pylint: disable=C0415
+    from django.urls import reverse  # pylint: disable=C0415
+
+    def setup():
+        for number in range(order_count):
+            create_order(3, number, state='preparing' if number % 2 else 'delivered')
+        return Client()
+
+    def call(client):
+        response = client.get(reverse('orders:list_orders'))
+        assert response.status_code == 200, response.status_code
+    return Benchmark(f'render_order_list[{order_count}]', setup, call)
+
+
+def render_order_detail(item_count):
+    """Render the full order page response, with an empty page cache."""
+    from django.test import Client  # pylint: disable=C0415
+
+    def setup():
+        return Client(), create_order(item_count).get_absolute_url()
+
+    def call(argument):
+        client, url = argument
+        response = client.get(url)
+        assert response.status_code == 200, response.status_code
+    return Benchmark(f'render_order_detail[{item_count}]', setup, call)
+
+
+def metrics_overhead(request_count):
+    """Pass request_count requests through the metrics middleware, to a view which does nothing."""
+    from django.http import HttpResponse  # pylint: disable=C0415
+    from django.test import RequestFactory  # pylint: disable=C0415
+    from django.urls import resolve  # pylint: disable=C0415
+    from chaospizza.metrics.middleware import MetricsMiddleware  # pylint: disable=C0415
+
+    def setup():
+        request = RequestFactory().get('/')
+        request.resolver_match = resolve('/')
+        return MetricsMiddleware(lambda request: HttpResponse('')), request
+
+    def call(argument):
+        middleware, request = argument
+        for _ in range(request_count):
+            middleware(request)
+    return Benchmark(f'metrics_overhead[{request_count}]', setup, call)
+
+
+def get_benchmarks():
+    """Return all benchmarks."""
+    return (
+        [order_total(count) for count in (10, 100, 1000)]
+        + [state_transitions()]
+        + [orderitem_save(count) for count in (10, 100, 1000)]
+        + [render_order_list(count) for count in (10, 50, 100)]
+        + [render_order_detail(count) for count in (10, 100, 1000)]
+        + [metrics_overhead(1000)]
+    )
+
+
+def main(args):
+    """Run the benchmarks, compare them to the baselines and return the exit status."""
+    baselines = json.loads(args.baseline.read_text(encoding='utf-8')) if args.baseline.exists() else {}
+    teardown = setup_django()
+    results = {}
+    regressions = []
+    try:
+        print(f'{"benchmark":<28} {"median":>10} {"baseline":>10} {"change":>8}')
+        for benchmark in get_benchmarks():
+            if args.names and not benchmark.name.startswith(tuple(args.names)):
+                continue
+            median = statistics.median(benchmark.run(args.rounds))
+            results[benchmark.name] = round(median, 3)
+            baseline = baselines.get(benchmark.name)
+            if baseline is None:
+                print(f'{benchmark.name:<28} {median:>7.2f} ms {"-":>10} {"-":>8}')
+                continue
+            change = median / baseline - 1
+            flag = ''
+            if change > args.threshold:
+                regressions.append(benchmark.name)
+                flag = '  SLOWER'
+            print(f'{benchmark.name:<28} {median:>7.2f} ms {baseline:>7.2f} ms {change:>+7.0%}{flag}')
+    finally:
+        teardown()
+    if args.save:
+        baselines.update(results)
+        args.baseline.write_text(json.dumps(baselines, indent=2, sort_keys=True) + '\n', encoding='utf-8')
+        print(f'Stored {len(results)} baselines in {args.baseline}.')
+        return 0
+    if regressions:
+        print(f'{len(regressions)} benchmarks are more than {args.threshold:.0%} slower than their baseline: '
+              f'{", ".join(regressions)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(parse_args()))
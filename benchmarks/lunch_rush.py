@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# pylint: disable=C0111
+"""
+Simulate the lunch rush on a single order against a running server.
+
+A coordinator announces an order, then many participants join it at once. Every participant keeps a session of its
+own and, with a short think time in between, refreshes the order page, adds items, edits and deletes its own items.
+The coordinator keeps refreshing the order and the order list. When the rush is over, the coordinator steps the order
+through ordering, ordered and delivered.
+
+Requests are sent like a browser does: every client keeps its cookies, reads the CSRF token from the csrftoken cookie
+and posts it with every form. Redirects are not followed, so every request is measured on its own. Responses with a
+status code of 400 or higher and failed connections count as errors.
+
+Start the server, e.g. with the four sync workers of the container, and run the scenario against it:
+
+    $ ./run.sh
+    $ python benchmarks/lunch_rush.py http://localhost:8000/ --participants 40 --duration 60
+
+Only the standard library is used, so the script can run from any machine with Python 3.8+.
+"""
+import argparse
+import html
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode, urljoin
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+DISHES = (
+    ('Pizza Margherita', '5.50'), ('Pizza Salami', '6.50'), ('Pizza Funghi', '6.50'), ('Pizza Tonno', '7.00'),
+    ('Pizza Hawaii', '7.00'), ('Pizza Diavolo', '7.50'), ('Pizza Spinaci', '7.00'), ('Pizzabrötchen', '3.50'),
+    ('Lasagne', '7.90'), ('Salat Mista', '5.50'), ('Tiramisu', '3.90'), ('Club Mate', '2.00'),
+)
+ORDER_URL = re.compile(r'/order/([\w-]+)/$')
+# Edit links are only shown to the participant who added the item, see order_detail_body.html.
+OWN_ITEM_URL = re.compile(r'/order/[\w-]+/item/([\w-]+)/update')
+
+
+def parse_args():
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('url', help='base URL of the server, e.g. http://localhost:8000/')
+    parser.add_argument('--participants', type=int, default=40, help='number of participants (default: 40)')
+    parser.add_argument('--duration', type=float, default=60, help='seconds the rush lasts (default: 60)')
+    parser.add_argument('--ramp-up', type=float, default=5,
+                        help='seconds over which the participants arrive (default: 5)')
+    parser.add_argument('--think-time', type=float, default=1,
+                        help='mean seconds a client waits between two requests (default: 1)')
+    parser.add_argument('--timeout', type=float, default=30, help='timeout of a request (default: 30)')
+    parser.add_argument('--seed', type=int, help='seed of the random choices of the clients')
+    return parser.parse_args()
+
+
+class NoRedirect(HTTPRedirectHandler):
+    """Return redirects as responses instead of following them."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):  # noqa
+        return None
+
+
+class Stats:
+    """Latencies and errors of all requests, by URL name and method, shared by all clients."""
+
+    def __init__(self):
+        """Start with no requests."""
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_statuses = Counter()
+
+    def record(self, name, latency, status):
+        """Record a request with its status code, None if the connection failed."""
+        with self.lock:
+            self.latencies[name].append(latency)
+            if status is None or status >= 400:
+                self.errors[name] += 1
+                self.error_statuses[status or 'connection failed'] += 1
+
+
+class Client:
+    """A browser with its own cookies, and so its own session."""
+
+    def __init__(self, base_url, stats, timeout):
+        """
+        Create a client without cookies.
+
+        :param base_url: URL of the server, all paths are relative to it
+        :param stats: Stats recording every request
+        """
+        self.base_url = base_url
+        self.stats = stats
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies), NoRedirect)
+
+    def csrf_token(self):
+        """Return the CSRF token, as set in the csrftoken cookie by the first page with a form."""
+        return next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), '')
+
+    def request(self, name, path, data=None):
+        """
+        Send a GET request, or a POST request with the given form data and the CSRF token, and record it.
+
+        :return: status code, response body and Location header, or None, '', None if the request failed
+        """
+        url = urljoin(self.base_url, path)
+        body = None
+        if data is not None:
+            body = urlencode(dict(data, csrfmiddlewaretoken=self.csrf_token())).encode()
+        request = Request(url, data=body, headers={'Referer': url})
+        start = time.monotonic()
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                status, content, location = response.status, response.read(), None
+        except HTTPError as err:
+            status, content, location = err.code, err.read(), err.headers.get('Location')
+        except (URLError, OSError):
+            self.stats.record(f'{name} {request.get_method()}', time.monotonic() - start, None)
+            return None, '', None
+        self.stats.record(f'{name} {request.get_method()}', time.monotonic() - start, status)
+        return status, content.decode('utf-8', 'replace'), location
+
+
+class Participant:
+    """A participant who keeps adding, changing and deleting items of an order, and refreshing it."""
+
+    def __init__(self, client, order_slug, name, rng):
+        """Join the order with the given slug under the given name."""
+        self.client = client
+        self.order_path = f'order/{order_slug}/'
+        self.name = name
+        self.random = rng
+        self.own_items = []
+
+    def view_order(self):
+        """Refresh the order page, and learn which items may be changed."""
+        _, content, _ = self.client.request('view_order', self.order_path)
+        self.own_items = OWN_ITEM_URL.findall(content)
+
+    def add_item(self):
+        """Open the form and add an item, then return to the order page like the redirect does."""
+        path = f'{self.order_path}item/create'
+        self.client.request('create_orderitem', path)
+        description, price = self.random.choice(DISHES)
+        self.client.request('create_orderitem', path, {
+            'participant': self.name,
+            'items-TOTAL_FORMS': '1',
+            'items-INITIAL_FORMS': '0',
+            'items-0-description': description,
+            'items-0-price': price,
+            'items-0-amount': str(self.random.choice((1, 1, 1, 2))),
+        })
+        self.view_order()
+
+    def edit_item(self):
+        """Open the form of one of the own items and change its amount, then return to the order page."""
+        path = f'{self.order_path}item/{self.random.choice(self.own_items)}/update'
+        status, content, _ = self.client.request('update_orderitem', path)
+        description = re.search(r'name="description"[^>]*value="([^"]*)"', content)
+        price = re.search(r'name="price"[^>]*value="([^"]*)"', content)
+        if status != 200 or not description or not price:
+            return
+        self.client.request('update_orderitem', path, {
+            'participant': self.name,
+            'description': html.unescape(description.group(1)),
+            'price': price.group(1),
+            'amount': str(self.random.randint(1, 3)),
+        })
+        self.view_order()
+
+    def delete_item(self):
+        """Delete one of the own items, then return to the order page."""
+        item_slug = self.random.choice(self.own_items)
+        self.client.request('delete_orderitem', f'{self.order_path}item/{item_slug}/delete', {})
+        self.view_order()
+
+    def run(self, deadline, think_time):
+        """Act until the deadline, mostly refreshing the order."""
+        self.add_item()
+        while time.monotonic() < deadline:
+            time.sleep(self.random.expovariate(1 / think_time))
+            action = self.random.choices(('view', 'add', 'edit', 'delete'), weights=(70, 12, 12, 6))[0]
+            if action == 'add' and len(self.own_items) < 3:
+                self.add_item()
+            elif action == 'edit' and self.own_items:
+                self.edit_item()
+            elif action == 'delete' and self.own_items:
+                self.delete_item()
+            else:
+                self.view_order()
+
+
+def announce_order(client):
+    """Announce an order as coordinator and return its slug."""
+    client.request('create_order', 'create')
+    status, _, location = client.request('create_order', 'create', {
+        'coordinator': 'Coordinator',
+        'restaurant_name': 'Lunch Rush Pizza',
+        'restaurant_url': '',
+    })
+    match = ORDER_URL.search(location or '')
+    if status != 302 or not match:
+        raise SystemExit(f'Could not announce an order, server responded with {status}.')
+    return match.group(1)
+
+
+def coordinate(client, order_slug, deadline, think_time, rng):
+    """Keep refreshing the order and the order list until the deadline, then finish the order."""
+    while time.monotonic() < deadline:
+        time.sleep(rng.expovariate(1 / think_time))
+        if rng.random() < 0.8:
+            client.request('view_order', f'order/{order_slug}/')
+        else:
+            client.request('list_orders', '')
+    for new_state in ('ordering', 'ordered', 'delivered'):
+        client.request('update_state', f'order/{order_slug}/update-state', {'new_state': new_state})
+        client.request('view_order', f'order/{order_slug}/')
+
+
+def percentile(values, fraction):
+    """Return the value at the given fraction of the sorted values."""
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def report(stats, elapsed):
+    """Print throughput, latency percentiles and error rates by URL name."""
+    total = sum(len(latencies) for latencies in stats.latencies.values())
+    errors = sum(stats.errors.values())
+    print(f'{"URL name":<24} {"requests":>8} {"errors":>7} {"p50":>8} {"p95":>8} {"p99":>8} {"max":>8}')
+    for name in sorted(stats.latencies):
+        latencies = sorted(stats.latencies[name])
+        print(
+            f'{name:<24} {len(latencies):>8} {stats.errors[name] / len(latencies):>7.1%} '
+            + ' '.join(f'{percentile(latencies, fraction) * 1000:>5.0f} ms' for fraction in (0.5, 0.95, 0.99))
+            + f' {latencies[-1] * 1000:>5.0f} ms'
+        )
+    print(f'requests:       {total} in {elapsed:.1f}s, {total / elapsed:.1f} requests/s')
+    print(f'errors:         {errors} ({errors / max(total, 1):.1%})', ', '.join(
+        f'{count}x {status}' for status, count in stats.error_statuses.most_common()
+    ))
+
+
+def main(args):
+    """Announce an order, run the rush and print the results."""
+    rng = random.Random(args.seed)
+    stats = Stats()
+    base_url = args.url if args.url.endswith('/') else args.url + '/'
+    coordinator = Client(base_url, stats, args.timeout)
+    order_slug = announce_order(coordinator)
+    start = time.monotonic()
+    deadline = start + args.ramp_up + args.duration
+    threads = [threading.Thread(target=coordinate, args=(
+        coordinator, order_slug, deadline, args.think_time, random.Random(rng.random())
+    ))]
+    for number in range(args.participants):
+        participant = Participant(
+            Client(base_url, stats, args.timeout), order_slug, f'Participant {number + 1}', random.Random(rng.random())
+        )
+        threads.append(threading.Thread(target=participant.run, args=(deadline, args.think_time)))
+    for number, thread in enumerate(threads):
+        thread.start()
+        time.sleep(args.ramp_up / len(threads) if number else 0)
+    for thread in threads:
+        thread.join()
+    print(f'URL:            {base_url}order/{order_slug}/')
+    print(f'participants:   {args.participants}, think time {args.think_time}s, {args.duration}s')
+    report(stats, time.monotonic() - start)
+
+
+if __name__ == '__main__':
+    main(parse_args())
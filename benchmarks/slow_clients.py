@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# pylint: disable=C0111
+"""
+Measure throughput and latency of a running server while many slow clients are connected.
+
+Slow clients open a connection and send their request headers one byte at a time, like a participant on a bad
+mobile connection.  At the same time a number of fast clients request the given URL in a loop and record the
+latency of every response.
+
+Start the server twice, once per worker class, and run the benchmark against both:
+
+    $ ./run.sh
+    $ python benchmarks/slow_clients.py http://localhost:8000/
+
+    $ GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker ./run.sh
+    $ python benchmarks/slow_clients.py http://localhost:8000/
+
+Only the standard library is used, so the script can run from any machine with Python 3.8+.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+def parse_args():
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('url', help='URL requested by all clients, e.g. http://localhost:8000/')
+    parser.add_argument('--slow-clients', type=int, default=200, help='number of slow clients (default: 200)')
+    parser.add_argument('--byte-interval', type=float, default=0.5,
+                        help='seconds between two bytes sent by a slow client (default: 0.5)')
+    parser.add_argument('--fast-clients', type=int, default=20, help='number of fast clients (default: 20)')
+    parser.add_argument('--duration', type=float, default=20, help='seconds to measure (default: 20)')
+    parser.add_argument('--timeout', type=float, default=10, help='timeout of a fast request (default: 10)')
+    return parser.parse_args()
+
+
+def build_request(url):
+    """Return host, port and the raw HTTP request of the given URL."""
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    request = f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nConnection: close\r\n\r\n'
+    return parts.hostname, parts.port or 80, request.encode('ascii')
+
+
+async def slow_client(host, port, request, byte_interval, deadline):
+    """Trickle the request to the server until the deadline, then read the response."""
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        return
+    try:
+        for byte in request:
+            if time.monotonic() > deadline:
+                return
+            writer.write(bytes([byte]))
+            await writer.drain()
+            await asyncio.sleep(byte_interval)
+        await reader.read()
+    except OSError:
+        pass
+    finally:
+        writer.close()
+
+
+async def fast_client(host, port, request, timeout, deadline, latencies, errors):
+    """Request the URL in a loop until the deadline and record the latency of every successful response."""
+    while time.monotonic() < deadline:
+        start = time.monotonic()
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            try:
+                writer.write(request)
+                response = await asyncio.wait_for(reader.read(), timeout)
+            finally:
+                writer.close()
+        except (OSError, asyncio.TimeoutError):
+            errors.append(time.monotonic() - start)
+            continue
+        if response.startswith((b'HTTP/1.1 200', b'HTTP/1.0 200')):
+            latencies.append(time.monotonic() - start)
+        else:
+            errors.append(time.monotonic() - start)
+
+
+def percentile(values, fraction):
+    """Return the value at the given fraction of the sorted values."""
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def main(args):
+    """Run slow and fast clients until the deadline and print the results."""
+    host, port, request = build_request(args.url)
+    deadline = time.monotonic() + args.duration
+    latencies, errors = [], []
+    slow = [
+        asyncio.create_task(slow_client(host, port, request, args.byte_interval, deadline))
+        for _ in range(args.slow_clients)
+    ]
+    # Give the slow clients time to occupy their connections before measuring.
+    await asyncio.sleep(1)
+    start = time.monotonic()
+    await asyncio.gather(*[
+        fast_client(host, port, request, args.timeout, deadline, latencies, errors)
+        for _ in range(args.fast_clients)
+    ])
+    elapsed = time.monotonic() - start
+    for task in slow:
+        task.cancel()
+    await asyncio.gather(*slow, return_exceptions=True)
+
+    print(f'URL:            {args.url}')
+    print(f'slow clients:   {args.slow_clients} (one byte every {args.byte_interval}s)')
+    print(f'fast clients:   {args.fast_clients}')
+    print(f'requests:       {len(latencies)} ok, {len(errors)} failed')
+    print(f'requests/s:     {len(latencies) / elapsed:.1f}')
+    if latencies:
+        latencies.sort()
+        print(f'latency mean:   {statistics.mean(latencies) * 1000:.1f} ms')
+        for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+            print(f'latency {name}:    {percentile(latencies, fraction) * 1000:.1f} ms')
+        print(f'latency max:    {latencies[-1] * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
@@ -1,5 +1,19 @@
 # pylint: disable=C0111
-# from django.contrib import admin
+from django.contrib import admin
+from .models import Restaurant, MenuItem
 
 
-# Register your models here.
+class MenuItemInline(admin.TabularInline):  # noqa
+    model = MenuItem
+
+
+class RestaurantAdmin(admin.ModelAdmin):  # noqa
+    list_display = ('name', 'url')
+    prepopulated_fields = {'slug': ('name',)}
+    readonly_fields = ('version',)
+    inlines = [
+        MenuItemInline,
+    ]
+
+
+admin.site.register(Restaurant, RestaurantAdmin)
@@ -0,0 +1,151 @@
+# pylint: disable=C0111
+"""
+Per-process cache of all restaurants and their menus.
+
+Menus are shown whenever an order or an order item is created, but they rarely change. Every process keeps its own
+copy of each restaurant with its menu items, together with the version the copy has been loaded at. The current
+versions of all restaurants are kept in the shared cache, so checking the local copies costs a single cache lookup
+instead of a query, and only restaurants with a newer version are loaded again.
+
+Writers delete the versions key right away and once more after their transaction has been committed, readers only add
+it, like the order versions in orders/cache.py.
+
+Restaurants are returned as plain dicts which must not be modified, they are shared by all requests of the process.
+The reader functions have async variants, prefixed with ``a``, for the async views.
+"""
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+
+VERSIONS_KEY = 'menus:versions'
+
+# Restaurant id to restaurant dict, replaced as a whole whenever a restaurant changed.
+_restaurants = {}
+
+
+def invalidate():
+    """Make all processes check the versions of their restaurants again."""
+    cache.delete(VERSIONS_KEY)
+    transaction.on_commit(lambda: cache.delete(VERSIONS_KEY))
+
+
+def get_versions():
+    """Return a dict of the current version of every restaurant by its id."""
+    versions = cache.get(VERSIONS_KEY)
+    if versions is None:
+        versions = dict(_restaurant_model().objects.values_list('id', 'version'))
+        cache.add(VERSIONS_KEY, versions)
+    return versions
+
+
+async def aget_versions():
+    """Return a dict of the current version of every restaurant by its id, like get_versions()."""
+    versions = await cache.aget(VERSIONS_KEY)
+    if versions is None:
+        versions = {
+            restaurant_id: version
+            async for restaurant_id, version in _restaurant_model().objects.values_list('id', 'version')
+        }
+        await cache.aadd(VERSIONS_KEY, versions)
+    return versions
+
+
+def restaurant_to_dict(restaurant):
+    """Return the cached representation of a restaurant whose menu items have been prefetched."""
+    return {
+        'id': restaurant.id,
+        'slug': restaurant.slug,
+        'name': restaurant.name,
+        'url': restaurant.url,
+        'version': restaurant.version,
+        'items': [{'name': item.name, 'price': item.price} for item in restaurant.items.all()],
+    }
+
+
+def get_catalog():
+    """Return a dict of all restaurants by their id, loading the ones which changed since they have been cached."""
+    restaurants, stale = _current_restaurants(get_versions())
+    if stale is not None:
+        restaurants.update((restaurant.id, restaurant_to_dict(restaurant)) for restaurant in _stale_queryset(stale))
+        _replace_catalog(restaurants)
+    return restaurants
+
+
+async def aget_catalog():
+    """Return a dict of all restaurants by their id like get_catalog(), using the async ORM API."""
+    restaurants, stale = _current_restaurants(await aget_versions())
+    if stale is not None:
+        restaurants.update([
+            (restaurant.id, restaurant_to_dict(restaurant)) async for restaurant in _stale_queryset(stale)
+        ])
+        _replace_catalog(restaurants)
+    return restaurants
+
+
+def get_restaurants():
+    """Return all restaurants, ordered by name."""
+    return _sorted_by_name(get_catalog())
+
+
+async def aget_restaurants():
+    """Return all restaurants, ordered by name."""
+    return _sorted_by_name(await aget_catalog())
+
+
+def get_restaurant(restaurant_id):
+    """Return the restaurant with the given id, or None if it does not exist."""
+    return get_catalog().get(restaurant_id)
+
+
+def get_restaurant_by_slug(restaurant_slug):
+    """Return the restaurant with the given slug, or None if it does not exist."""
+    return _find_by_slug(get_catalog(), restaurant_slug)
+
+
+async def aget_restaurant_by_slug(restaurant_slug):
+    """Return the restaurant with the given slug, or None if it does not exist."""
+    return _find_by_slug(await aget_catalog(), restaurant_slug)
+
+
+def clear():
+    """Forget the restaurants cached by this process."""
+    global _restaurants  # pylint: disable=W0603
+    _restaurants = {}
+
+
+def _restaurant_model():
+    return apps.get_model('menus', 'Restaurant')
+
+
+def _current_restaurants(versions):
+    """
+    Return the restaurants of this process which are still current, and the ids of the ones to load.
+
+    The ids are None if the cached restaurants can be used as they are.
+    """
+    restaurants = {
+        restaurant_id: _restaurants[restaurant_id]
+        for restaurant_id, version in versions.items()
+        if restaurant_id in _restaurants and _restaurants[restaurant_id]['version'] >= version
+    }
+    stale = [restaurant_id for restaurant_id in versions if restaurant_id not in restaurants]
+    if stale or len(restaurants) != len(_restaurants):
+        return restaurants, stale
+    return restaurants, None
+
+
+def _stale_queryset(stale):
+    return _restaurant_model().objects.filter(id__in=stale).prefetch_related('items')
+
+
+def _replace_catalog(restaurants):
+    global _restaurants  # pylint: disable=W0603
+    _restaurants = restaurants
+
+
+def _sorted_by_name(restaurants):
+    return sorted(restaurants.values(), key=lambda restaurant: restaurant['name'].lower())
+
+
+def _find_by_slug(restaurants, restaurant_slug):
+    return next((restaurant for restaurant in restaurants.values() if restaurant['slug'] == restaurant_slug), None)
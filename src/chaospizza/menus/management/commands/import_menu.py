@@ -0,0 +1,200 @@
+# pylint: disable=C0111
+import csv
+import json
+import re
+import sys
+import time
+from contextlib import nullcontext
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from chaospizza.orders.models import OrderItem
+from ...models import Restaurant, MenuItem
+
+FORMATS = {
+    '.csv': 'csv',
+    '.json': 'json',
+    '.jsonl': 'json',
+    '.ndjson': 'json',
+}
+JSON_SEPARATORS = re.compile(r'[\s,\[\]]*')
+
+
+def iter_csv_rows(file):
+    """Yield the line number and a dict of every row of a CSV file with a header line."""
+    reader = csv.DictReader(file)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def iter_json_rows(file, chunk_size=64 * 1024):
+    """
+    Yield the number and the value of every row of a JSON array, or of a JSON lines file.
+
+    The file is decoded chunk by chunk, so only the current chunk is kept in memory, however large the file is.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, number = '', 0, 0
+    while True:
+        position = JSON_SEPARATORS.match(buffer, position).end()
+        try:
+            row, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as err:
+            chunk = file.read(chunk_size)
+            if chunk:
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            if position == len(buffer):
+                return
+            raise CommandError(f'Row {number + 1}: invalid JSON: {err}') from err
+        number += 1
+        yield number, row
+
+
+class Command(BaseCommand):
+    """Import the menu of a restaurant from a CSV or JSON file."""
+
+    help = (
+        'Import menu items from a CSV file with a header line, or from a JSON array or JSON lines file of objects. '
+        'Items are matched by name, new items are created and the prices of existing ones are updated.'
+    )
+
+    def add_arguments(self, parser):  # noqa
+        parser.add_argument('restaurant', help='Name of the restaurant, which is created if it does not exist.')
+        parser.add_argument('file', help='File to import, - reads from stdin.')
+        parser.add_argument(
+            '--format', choices=sorted(set(FORMATS.values())),
+            help='Format of the file (default: guessed from the file name).'
+        )
+        parser.add_argument('--url', help='Set the URL of the restaurant.')
+        parser.add_argument(
+            '--name-column', default='name',
+            help='Column or key of the item names (default: name).'
+        )
+        parser.add_argument(
+            '--price-column', default='price',
+            help='Column or key of the item prices (default: price).'
+        )
+        parser.add_argument(
+            '--encoding', default='utf-8-sig',
+            help='Encoding of the file (default: utf-8-sig).'
+        )
+        parser.add_argument(
+            '--replace', action='store_true',
+            help='Delete all menu items of the restaurant before importing.'
+        )
+        parser.add_argument(
+            '--skip-invalid', action='store_true',
+            help='Skip invalid rows instead of aborting the import.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of rows written per query (default: 500).'
+        )
+
+    def handle(self, *args, **options):  # noqa
+        iter_rows = iter_json_rows if self.get_format(options) == 'json' else iter_csv_rows
+        counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+        start = time.monotonic()
+        with self.open(options) as file, transaction.atomic():
+            restaurant = self.get_restaurant(options['restaurant'], options['url'])
+            if options['replace']:
+                restaurant.items.all().delete()
+            rows = self.clean_rows(iter_rows(file), options, counts)
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                self.import_batch(restaurant, batch, counts)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{sum(counts.values())} rows...')
+            restaurant.touch()
+        elapsed = max(time.monotonic() - start, 1e-6)
+        total = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {total} rows into {restaurant.name} in {elapsed:.2f}s ({total / elapsed:.0f} rows/s): '
+            + ', '.join(f'{count} {name}' for name, count in counts.items())
+        ))
+
+    @staticmethod
+    def get_format(options):
+        """Return the format given as option or guessed from the file name."""
+        if options['format']:
+            return options['format']
+        for extension, file_format in FORMATS.items():
+            if options['file'].lower().endswith(extension):
+                return file_format
+        raise CommandError(f'Can not guess the format of {options["file"]}, use --format.')
+
+    @staticmethod
+    def open(options):
+        """Open the file to import as text."""
+        if options['file'] == '-':
+            return nullcontext(sys.stdin)
+        try:
+            return open(options['file'], newline='', encoding=options['encoding'])  # pylint: disable=R1732
+        except OSError as err:
+            raise CommandError(f'Can not open {options["file"]}: {err}') from err
+
+    @staticmethod
+    def get_restaurant(name, url):
+        """Return the restaurant with the given name, it is created if it does not exist yet."""
+        restaurant, created = Restaurant.objects.get_or_create(name=name, defaults={'url': url or ''})
+        if not created and url is not None and restaurant.url != url:
+            restaurant.url = url
+            restaurant.save()
+        return restaurant
+
+    def clean_rows(self, rows, options, counts):
+        """Yield the validated name and price of every row, invalid rows abort the import unless they are skipped."""
+        for number, row in rows:
+            try:
+                yield self.clean_row(row, options['name_column'], options['price_column'])
+            except ValidationError as err:
+                message = f'Row {number}: {"; ".join(err.messages)}'
+                if not options['skip_invalid']:
+                    raise CommandError(message) from err
+                self.stderr.write(message)
+                counts['skipped'] += 1
+
+    @staticmethod
+    def clean_row(row, name_column, price_column):
+        """
+        Return the name and the price of a row.
+
+        Prices are validated by the price field of OrderItem, so every imported item can be ordered.
+        """
+        if not isinstance(row, dict):
+            raise ValidationError('Expected an object.')
+        name = row.get(name_column)
+        price = row.get(price_column)
+        try:
+            name = MenuItem._meta.get_field('name').clean(name.strip() if isinstance(name, str) else name, None)
+        except ValidationError as err:
+            raise ValidationError([f'{name_column}: {message}' for message in err.messages]) from err
+        try:
+            # JSON numbers are floats, which are validated with all their binary digits otherwise.
+            price = OrderItem._meta.get_field('price').clean(str(price) if isinstance(price, float) else price, None)
+        except ValidationError as err:
+            raise ValidationError([f'{price_column}: {message}' for message in err.messages]) from err
+        return name, price
+
+    @staticmethod
+    def import_batch(restaurant, batch, counts):
+        """Create new and update changed menu items of a batch of rows, with one query each."""
+        prices = dict(batch)
+        updated = []
+        for item in restaurant.items.filter(name__in=list(prices)).only('id', 'name', 'price'):
+            price = prices.pop(item.name)
+            if item.price != price:
+                item.price = price
+                updated.append(item)
+        created = [MenuItem(restaurant=restaurant, name=name, price=price) for name, price in prices.items()]
+        MenuItem.objects.bulk_create(created)
+        MenuItem.objects.bulk_update(updated, ['price'])
+        counts['created'] += len(created)
+        counts['updated'] += len(updated)
+        counts['unchanged'] += len(batch) - len(created) - len(updated)
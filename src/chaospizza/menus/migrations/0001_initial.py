@@ -0,0 +1,41 @@
+# Generated by Django 4.2 on 2026-10-18 07:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):  # noqa
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Restaurant',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=250, unique=True)),
+                ('slug', models.SlugField(unique=True)),
+                ('url', models.URLField(blank=True)),
+                ('version', models.PositiveIntegerField(default=0, editable=False)),
+            ],
+            options={
+                'ordering': ('name', 'id'),
+            },
+        ),
+        migrations.CreateModel(
+            name='MenuItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=250)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='menus.restaurant')),
+            ],
+            options={
+                'ordering': ('name', 'id'),
+                'unique_together': {('restaurant', 'name')},
+            },
+        ),
+    ]
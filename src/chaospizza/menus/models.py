@@ -1,5 +1,84 @@
 # pylint: disable=C0111
-# from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils.text import slugify
 
+from . import catalog
 
-# Create your models here.
+
+class Restaurant(models.Model):
+    """
+    A restaurant with its menu, used as template for new orders.
+
+    The version is incremented whenever the restaurant or one of its menu items changes, see catalog.py.
+    """
+
+    class Meta:  # noqa
+        ordering = ('name', 'id')
+
+    name = models.CharField(max_length=250, unique=True)
+    slug = models.SlugField(max_length=50, unique=True)
+    url = models.URLField(blank=True)
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    def __str__(self):
+        """Return the name of the restaurant."""
+        return self.name
+
+    def get_absolute_url(self):
+        """Return public url to view the menu of the restaurant."""
+        return reverse('menu_restaurant', kwargs={'restaurant_slug': self.slug})
+
+    def save(self, *args, **kwargs):
+        """Generate the slug from the name and increment the version."""
+        if not self.slug:
+            self.slug = slugify(self.name)[:50]
+        if self.pk is None:
+            super().save(*args, **kwargs)
+        else:
+            self.version = F('version') + 1
+            super().save(*args, **kwargs)
+            self.refresh_from_db(fields=['version'])
+        catalog.invalidate()
+
+    def delete(self, *args, **kwargs):
+        """Delete the restaurant with its menu."""
+        result = super().delete(*args, **kwargs)
+        catalog.invalidate()
+        return result
+
+    def touch(self):
+        """Increment the version after the menu has been changed."""
+        Restaurant.objects.filter(pk=self.pk).update(version=F('version') + 1)
+        self.refresh_from_db(fields=['version'])
+        catalog.invalidate()
+
+
+class MenuItem(models.Model):
+    """A dish or drink of a restaurant, used as template for new order items."""
+
+    class Meta:  # noqa
+        ordering = ('name', 'id')
+        unique_together = ('restaurant', 'name')
+
+    restaurant = models.ForeignKey(Restaurant, related_name='items', on_delete=models.CASCADE)
+    name = models.CharField(max_length=250)
+    price = models.DecimalField(max_digits=5, decimal_places=2)
+
+    def __str__(self):
+        """Return the name of the menu item."""
+        return self.name
+
+    def save(self, *args, **kwargs):
+        """Save the menu item and increment the version of its restaurant."""
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.restaurant.touch()
+
+    def delete(self, *args, **kwargs):
+        """Delete the menu item and increment the version of its restaurant."""
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self.restaurant.touch()
+        return result
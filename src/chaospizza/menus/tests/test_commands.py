@@ -0,0 +1,96 @@
+# pylint: disable=C0111
+# pylint: disable=W0621
+import io
+import json
+from decimal import Decimal
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+
+from .. import catalog
+from ..management.commands.import_menu import iter_json_rows
+from ..models import Restaurant, MenuItem
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def clear_catalog():
+    cache.clear()
+    catalog.clear()
+
+
+def import_menu(tmp_path, name, content, *args):
+    path = tmp_path / name
+    path.write_text(content, encoding='utf-8')
+    stdout, stderr = io.StringIO(), io.StringIO()
+    call_command('import_menu', 'Hallo Pizza', str(path), *args, stdout=stdout, stderr=stderr)
+    return stdout.getvalue(), stderr.getvalue()
+
+
+def menu():
+    return [(item.name, item.price) for item in MenuItem.objects.filter(restaurant__name='Hallo Pizza')]
+
+
+class TestImportMenu:
+    def test_import_csv(self, tmp_path):
+        stdout, _ = import_menu(
+            tmp_path, 'menu.csv', 'name,price\nPizza Salami,5.60\nCola,2\n', '--url=https://hallopizza.de/'
+        )
+        assert menu() == [('Cola', Decimal('2.00')), ('Pizza Salami', Decimal('5.60'))]
+        assert Restaurant.objects.get().url == 'https://hallopizza.de/'
+        assert 'Imported 2 rows' in stdout and 'rows/s' in stdout
+
+    def test_existing_items_are_updated(self, tmp_path):
+        import_menu(tmp_path, 'menu.csv', 'name,price\nPizza Salami,5.60\nCola,2.00\n')
+        catalog.get_restaurants()
+        stdout, _ = import_menu(tmp_path, 'menu.csv', 'name,price\nCola,2.50\nPizza Salami,5.60\nFanta,2.00\n')
+        assert menu() == [('Cola', Decimal('2.50')), ('Fanta', Decimal('2.00')), ('Pizza Salami', Decimal('5.60'))]
+        assert '1 created, 1 updated, 1 unchanged' in stdout
+        assert [item['name'] for item in catalog.get_restaurants()[0]['items']] == ['Cola', 'Fanta', 'Pizza Salami']
+
+    def test_import_json_in_batches(self, tmp_path):
+        rows = [{'name': f'Pizza {number}', 'price': 5.6} for number in range(25)]
+        import_menu(tmp_path, 'menu.json', json.dumps(rows), '--batch-size=10')
+        assert len(menu()) == 25
+        assert {price for _, price in menu()} == {Decimal('5.60')}
+
+    def test_replace(self, tmp_path):
+        import_menu(tmp_path, 'menu.csv', 'name,price\nPizza Salami,5.60\n')
+        import_menu(tmp_path, 'menu.csv', 'name,price\nCola,2.00\n', '--replace')
+        assert menu() == [('Cola', Decimal('2.00'))]
+
+    @pytest.mark.parametrize('price', ['1000.00', '5.605', 'free', ''])
+    def test_invalid_price_aborts_import(self, tmp_path, price):
+        with pytest.raises(CommandError, match='Row 3: price'):
+            import_menu(tmp_path, 'menu.csv', f'name,price\nCola,2.00\nPizza Salami,{price}\n')
+        assert not MenuItem.objects.exists()
+
+    def test_skip_invalid(self, tmp_path):
+        stdout, stderr = import_menu(
+            tmp_path, 'menu.jsonl', '{"name": "Cola", "price": "2.00"}\n{"name": "", "price": "1.00"}\n',
+            '--skip-invalid'
+        )
+        assert menu() == [('Cola', Decimal('2.00'))]
+        assert 'Row 2: name' in stderr
+        assert '1 skipped' in stdout
+
+    def test_unknown_format(self, tmp_path):
+        with pytest.raises(CommandError, match='--format'):
+            import_menu(tmp_path, 'menu.txt', '')
+
+
+class TestIterJsonRows:
+    @pytest.mark.parametrize('content', [
+        '[{"name": "a"}, {"name": "b"}]',
+        '{"name": "a"}\n{"name": "b"}\n',
+    ])
+    def test_rows_are_read_in_chunks(self, content):
+        rows = list(iter_json_rows(io.StringIO(content), chunk_size=3))
+        assert rows == [(1, {'name': 'a'}), (2, {'name': 'b'})]
+
+    def test_invalid_json(self):
+        with pytest.raises(CommandError, match='Row 2'):
+            list(iter_json_rows(io.StringIO('[{"name": "a"}, {"name": ]')))
@@ -0,0 +1,132 @@
+# pylint: disable=C0111
+# pylint: disable=W0621
+from decimal import Decimal
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import Client
+from django.urls import reverse
+
+from chaospizza.orders.models import Order
+from .. import catalog
+from ..models import Restaurant, MenuItem
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def clear_catalog():
+    """Start every test with empty caches, the database is rolled back after each test but the caches are not."""
+    cache.clear()
+    catalog.clear()
+
+
+@pytest.fixture
+def restaurant():
+    restaurant = Restaurant.objects.create(name='Hallo Pizza', url='https://hallopizza.de/')
+    MenuItem.objects.create(restaurant=restaurant, name='Pizza Salami', price=Decimal('5.60'))
+    MenuItem.objects.create(restaurant=restaurant, name='Cola', price=Decimal('2.00'))
+    return restaurant
+
+
+class TestRestaurant:
+    def test_slug_is_generated(self, restaurant):
+        assert restaurant.slug == 'hallo-pizza'
+
+    def test_menu_changes_increment_version(self, restaurant):
+        version = Restaurant.objects.get(id=restaurant.id).version
+        item = restaurant.items.get(name='Cola')
+        item.price = Decimal('2.50')
+        item.save()
+        item.delete()
+        assert Restaurant.objects.get(id=restaurant.id).version == version + 2
+
+
+class TestCatalog:
+    def test_restaurants_are_cached(self, restaurant, django_assert_num_queries):
+        with django_assert_num_queries(3):
+            catalog.get_restaurants()
+        with django_assert_num_queries(0):
+            restaurants = catalog.get_restaurants()
+        assert [(item['name'], item['price']) for item in restaurants[0]['items']] == [
+            ('Cola', Decimal('2.00')), ('Pizza Salami', Decimal('5.60'))
+        ]
+
+    def test_only_changed_restaurants_are_loaded(self, restaurant, django_assert_num_queries):
+        other = Restaurant.objects.create(name='Asia')
+        catalog.get_restaurants()
+        MenuItem.objects.create(restaurant=restaurant, name='Fanta', price=Decimal('2.00'))
+        with django_assert_num_queries(3):
+            restaurants = catalog.get_restaurants()
+        assert [item['name'] for item in restaurants[1]['items']] == ['Cola', 'Fanta', 'Pizza Salami']
+        assert restaurants[0] is catalog.get_restaurant(other.id)
+
+    def test_async_variants_share_the_cached_restaurants(self, restaurant, django_assert_num_queries):
+        async def scenario():
+            return await catalog.aget_restaurants(), await catalog.aget_restaurant_by_slug('hallo-pizza')
+
+        with django_assert_num_queries(3):
+            restaurants, by_slug = async_to_sync(scenario)()
+        assert by_slug is restaurants[0]
+        assert [item['name'] for item in by_slug['items']] == ['Cola', 'Pizza Salami']
+        with django_assert_num_queries(0):
+            assert catalog.get_restaurants() == restaurants
+
+    def test_deleted_restaurants_are_removed(self, restaurant):
+        catalog.get_restaurants()
+        restaurant.delete()
+        assert catalog.get_restaurants() == []
+
+
+class TestViews:
+    def test_menu_home(self, restaurant):
+        response = Client().get(reverse('menu_home'))
+        assert response.status_code == 200
+        assert b'Hallo Pizza' in response.content
+
+    def test_menu_restaurant(self, restaurant):
+        response = Client().get(restaurant.get_absolute_url())
+        assert response.status_code == 200
+        assert b'Pizza Salami' in response.content
+
+    def test_unknown_restaurant(self):
+        assert Client().get(reverse('menu_restaurant', kwargs={'restaurant_slug': 'foo'})).status_code == 404
+
+
+class TestOrderTemplates:
+    def test_create_order_from_restaurant(self, restaurant):
+        client = Client()
+        response = client.get(reverse('orders:create_order'), data={'restaurant': restaurant.slug})
+        assert response.context['form'].initial['restaurant'] == restaurant.id
+        client.post(reverse('orders:create_order'), data={'coordinator': 'Bernd', 'restaurant': restaurant.id})
+        order = Order.objects.get()
+        assert (order.restaurant, order.restaurant_name, order.restaurant_url) == (
+            restaurant, 'Hallo Pizza', 'https://hallopizza.de/'
+        )
+
+    def test_restaurant_name_is_required_without_restaurant(self, restaurant):
+        response = Client().post(reverse('orders:create_order'), data={'coordinator': 'Bernd', 'restaurant': ''})
+        assert 'restaurant_name' in response.context['form'].errors
+        assert not Order.objects.exists()
+
+    def test_menu_prices_are_filled_in(self, restaurant):
+        order = Order.objects.create(coordinator='Bernd', restaurant_name='Hallo Pizza', restaurant=restaurant)
+        url = reverse('orders:create_orderitem', kwargs={'order_slug': order.slug})
+        client = Client()
+        assert b'<datalist id="item-suggestions">' in client.get(url).content
+        response = client.post(url, data={
+            'participant': 'Kevin',
+            'items-TOTAL_FORMS': '2', 'items-INITIAL_FORMS': '0',
+            'items-0-description': 'Pizza Salami', 'items-0-price': '', 'items-0-amount': '1',
+            'items-1-description': 'Pasta', 'items-1-price': '', 'items-1-amount': '1',
+        })
+        assert response.context['formset'].forms[1].errors == {'price': ['This field is required.']}
+        response = client.post(url, data={
+            'participant': 'Kevin',
+            'items-TOTAL_FORMS': '1', 'items-INITIAL_FORMS': '0',
+            'items-0-description': 'Pizza Salami', 'items-0-price': '', 'items-0-amount': '2',
+        })
+        assert response.status_code == 302
+        assert Order.objects.get(id=order.id).total_price == Decimal('11.20')
@@ -1,8 +1,9 @@
 # pylint: disable=C0111
 from django.urls import re_path
-from .views import menu_home
+from .views import menu_home, menu_restaurant
 
 
 urlpatterns = [
     re_path(r'^$', menu_home, name='menu_home'),
+    re_path(r'^(?P<restaurant_slug>[\w-]+)/$', menu_restaurant, name='menu_restaurant'),
 ]
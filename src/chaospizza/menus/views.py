@@ -1,8 +1,19 @@
 # pylint: disable=C0111
-# from django.shortcuts import render
-from django.http import HttpResponse
+from django.http import Http404
+from django.template.response import TemplateResponse
 
+from . import catalog
 
-def menu_home(request):
-    """Django view which returns simple hello world text."""
-    return HttpResponse("hi from menus app")
+
+async def menu_home(request):
+    """Show all restaurants, served from the per-process catalog."""
+    restaurants = await catalog.aget_restaurants()
+    return TemplateResponse(request, 'menus/restaurant_list.html', {'restaurant_list': restaurants})
+
+
+async def menu_restaurant(request, restaurant_slug):
+    """Show the menu of a single restaurant, served from the per-process catalog."""
+    restaurant = await catalog.aget_restaurant_by_slug(restaurant_slug)
+    if restaurant is None:
+        raise Http404(f'No restaurant found matching {restaurant_slug}')
+    return TemplateResponse(request, 'menus/restaurant_detail.html', {'restaurant': restaurant})
@@ -0,0 +1 @@
+"""Django application to measure requests and serve the measurements in the Prometheus text format."""
@@ -0,0 +1,15 @@
+# pylint: disable=C0111
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+from .registry import install_execute_wrapper
+
+
+class MetricsConfig(AppConfig):
+    """Default AppConfig."""
+
+    name = 'chaospizza.metrics'
+
+    def ready(self):
+        """Measure the queries of every database connection."""
+        connection_created.connect(install_execute_wrapper)
@@ -0,0 +1,64 @@
+# pylint: disable=C0111
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .registry import UNRESOLVED, RequestMetrics, current_request, process_metrics
+
+
+class MetricsMiddleware:
+    """
+    Measure every request by URL name, see registry.py.
+
+    The duration covers the middleware after this one and the view, including rendering the response, but not sending
+    it. Streamed responses, like order events, are only measured until the stream starts, and without their size unless
+    they have a Content-Length.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Wrap the next middleware or view, which is either sync or async."""
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Measure the response of the next middleware or view."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_metrics = RequestMetrics()
+        token = current_request.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.record(request, response, time.perf_counter() - start, request_metrics)
+        return response
+
+    async def __acall__(self, request):
+        """Measure the response of the next middleware or view, when served by ASGI."""
+        request_metrics = RequestMetrics()
+        token = current_request.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.record(request, response, time.perf_counter() - start, request_metrics)
+        return response
+
+    @staticmethod
+    def record(request, response, duration, request_metrics):
+        """Add the request to the totals of this process, which are written to METRICS_DIR shortly after."""
+        view_name = request.resolver_match.view_name if request.resolver_match else UNRESOLVED
+        if response.streaming:
+            response_size = int(response.get('Content-Length') or 0)
+        else:
+            response_size = len(response.content)
+        process_metrics.record((view_name, request.method, str(response.status_code)),
+                               duration, request_metrics, response_size)
+        process_metrics.schedule_flush(settings.METRICS_DIR)
@@ -0,0 +1,210 @@
+# pylint: disable=C0111
+"""
+Request metrics, aggregated over all worker processes.
+
+Every request is measured by MetricsMiddleware into a RequestMetrics object, which is kept in a context variable. The
+queries and template renders of the request add their time to it, also when they run in the threads of async views.
+Once the response is returned, the request is added to the totals of the process, by URL name, method and status.
+
+Each process writes its totals to a file of its own in METRICS_DIR, replacing the whole file from a timer thread within
+FLUSH_INTERVAL seconds after a request. The metrics endpoint adds up the files of all processes, including those of
+processes which have exited, so counters do not go backwards while the server runs. Without METRICS_DIR, only the
+totals of the process serving the endpoint are shown, which is enough for the development server.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from pathlib import Path
+from uuid import uuid4
+
+# Upper bounds of the request duration histogram in seconds, the defaults of the Prometheus client libraries.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNTERS = ('requests', 'duration', 'queries', 'query_duration', 'render_duration', 'response_size')
+FLUSH_INTERVAL = 1.0
+# URL name of requests which did not match a URL pattern, like static files and unknown URLs.
+UNRESOLVED = 'unresolved'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Counters exposed by format_metrics(), besides the request duration histogram.
+METRICS = (
+    ('chaospizza_http_requests_total', 'requests', 'Requests by URL name, method and status code.'),
+    ('chaospizza_db_queries_total', 'queries', 'Database queries run by requests.'),
+    ('chaospizza_db_query_duration_seconds_total', 'query_duration', 'Time requests spent in database queries.'),
+    ('chaospizza_template_render_duration_seconds_total', 'render_duration', 'Time requests spent in templates.'),
+    ('chaospizza_http_response_size_bytes_total', 'response_size', 'Size of response bodies, unless streamed.'),
+)
+
+current_request = ContextVar('current_request', default=None)
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetrics:
+    """Queries and template renders of a single request."""
+
+    __slots__ = ('queries', 'query_duration', 'render_duration', 'rendering')
+
+    def __init__(self):
+        """Start without queries and renders."""
+        self.queries = 0
+        self.query_duration = 0.0
+        self.render_duration = 0.0
+        # Set while a template is rendered, so templates rendered within it are not counted twice.
+        self.rendering = False
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """Add the query and its duration to the current request, installed on every database connection."""
+    request_metrics = current_request.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_metrics.queries += 1
+        request_metrics.query_duration += time.perf_counter() - start
+
+
+def install_execute_wrapper(connection, **kwargs):  # pylint: disable=W0613
+    """
+    Measure all queries of a database connection, whenever it connects.
+
+    The wrapper is inserted first, since connection.execute_wrapper() removes the last wrapper when its block ends, and
+    only once, since a connection object sends connection_created again when it reconnects.
+    """
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, execute_wrapper)
+
+
+def new_totals():
+    """Return the totals of no requests."""
+    totals = dict.fromkeys(COUNTERS, 0)
+    # Requests per duration bucket, not cumulative, the last one counts requests slower than all buckets.
+    totals['buckets'] = [0] * (len(DURATION_BUCKETS) + 1)
+    return totals
+
+
+class ProcessMetrics:
+    """Totals of the requests served by this process, by URL name, method and status code."""
+
+    def __init__(self):
+        """Start without requests."""
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget all requests and write to a new file, as needed in processes forked after measuring requests."""
+        self.pid = os.getpid()
+        self.filename = f'{self.pid}-{uuid4().hex[:8]}.json'
+        self.totals = {}
+        self.flush_timer = None
+
+    def record(self, labels, duration, request_metrics, response_size):
+        """
+        Add a request to the totals.
+
+        :param labels: URL name, method and status code
+        :param duration: seconds until the response was returned
+        :param request_metrics: RequestMetrics of the request
+        :param response_size: bytes of the response body
+        """
+        with self.lock:
+            if os.getpid() != self.pid:
+                self.reset()
+            totals = self.totals.get(labels)
+            if totals is None:
+                totals = self.totals[labels] = new_totals()
+            totals['requests'] += 1
+            totals['duration'] += duration
+            totals['queries'] += request_metrics.queries
+            totals['query_duration'] += request_metrics.query_duration
+            totals['render_duration'] += request_metrics.render_duration
+            totals['response_size'] += response_size
+            totals['buckets'][bisect_left(DURATION_BUCKETS, duration)] += 1
+
+    def schedule_flush(self, directory):
+        """Write the totals to the file of this process within FLUSH_INTERVAL, unless already scheduled."""
+        if not directory:
+            return
+        with self.lock:
+            if self.flush_timer is not None:
+                return
+            self.flush_timer = threading.Timer(FLUSH_INTERVAL, self.flush, args=(directory,))
+            self.flush_timer.daemon = True
+            self.flush_timer.start()
+
+    def flush(self, directory):
+        """Write the totals to the file of this process, replacing it."""
+        with self.lock:
+            self.flush_timer = None
+            path = Path(directory) / self.filename
+            temp_path = path.with_suffix('.tmp')
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                temp_path.write_text(json.dumps([
+                    [*labels, totals] for labels, totals in self.totals.items()
+                ]), encoding='utf-8')
+                os.replace(temp_path, path)
+            except OSError as err:
+                logger.warning('Could not write request metrics to %s: %s', path, err)
+
+    def collect(self, directory):
+        """Return the totals of all processes which wrote to the directory, or of this process without directory."""
+        if not directory:
+            with self.lock:
+                return {
+                    labels: dict(totals, buckets=list(totals['buckets'])) for labels, totals in self.totals.items()
+                }
+        self.flush(directory)
+        merged = {}
+        for path in Path(directory).glob('*.json'):
+            try:
+                entries = json.loads(path.read_text(encoding='utf-8'))
+            except (OSError, ValueError) as err:
+                logger.warning('Could not read request metrics from %s: %s', path, err)
+                continue
+            for *labels, totals in entries:
+                merged_totals = merged.setdefault(tuple(labels), new_totals())
+                for counter in COUNTERS:
+                    merged_totals[counter] += totals[counter]
+                merged_totals['buckets'] = [a + b for a, b in zip(merged_totals['buckets'], totals['buckets'])]
+        return merged
+
+
+def format_labels(labels, **extra):
+    """Return URL name, method, status code and extra labels in the Prometheus text format."""
+    pairs = dict(zip(('view', 'method', 'status'), labels), **extra)
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in pairs.items()
+    )
+
+
+def format_metrics(merged):
+    """Return totals as returned by ProcessMetrics.collect() in the Prometheus text format."""
+    rows = sorted(merged.items())
+    lines = [
+        '# HELP chaospizza_http_request_duration_seconds Time until the response was returned, unless streamed.',
+        '# TYPE chaospizza_http_request_duration_seconds histogram',
+    ]
+    for labels, totals in rows:
+        cumulative = 0
+        for bound, count in zip(DURATION_BUCKETS + ('+Inf',), totals['buckets']):
+            cumulative += count
+            lines.append(f'chaospizza_http_request_duration_seconds_bucket{{{format_labels(labels, le=bound)}}} '
+                         f'{cumulative}')
+        lines.append(f'chaospizza_http_request_duration_seconds_sum{{{format_labels(labels)}}} {totals["duration"]}')
+        lines.append(f'chaospizza_http_request_duration_seconds_count{{{format_labels(labels)}}} {totals["requests"]}')
+    for name, counter, description in METRICS:
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} counter')
+        lines.extend(f'{name}{{{format_labels(labels)}}} {totals[counter]}' for labels, totals in rows)
+    return '\n'.join(lines) + '\n'
+
+
+process_metrics = ProcessMetrics()
@@ -0,0 +1,35 @@
+# pylint: disable=C0111
+import time
+
+from django.template.backends import django
+
+from .registry import current_request
+
+
+class Template(django.Template):
+    """A template which adds its render time to the current request."""
+
+    def render(self, context=None, request=None):
+        """Render the template, measuring it unless it is rendered within another template."""
+        request_metrics = current_request.get()
+        if request_metrics is None or request_metrics.rendering:
+            return super().render(context, request)
+        request_metrics.rendering = True
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            request_metrics.rendering = False
+            request_metrics.render_duration += time.perf_counter() - start
+
+
+class DjangoTemplates(django.DjangoTemplates):
+    """The Django template engine, with render times measured for the request metrics, see registry.py."""
+
+    def from_string(self, template_code):
+        """Compile a template from a string."""
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        """Load a template by name."""
+        return Template(super().get_template(template_name).template, self)
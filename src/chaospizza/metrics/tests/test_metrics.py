@@ -0,0 +1,147 @@
+# pylint: disable=C0111
+# pylint: disable=W0621
+import re
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from chaospizza.orders.models import Order
+from .. import registry
+from ..registry import ProcessMetrics, RequestMetrics, execute_wrapper, format_metrics, process_metrics
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(settings):
+    """Start every test with empty caches and metrics, written to no directory and served with a token."""
+    cache.clear()
+    settings.METRICS_DIR = ''
+    settings.METRICS_TOKEN = 'secret'
+    process_metrics.reset()
+
+
+def scrape(client=None, token='secret'):
+    """Return the samples of the metrics endpoint as dict from metric name with labels to value."""
+    response = (client or Client()).get(reverse('metrics'), headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    return {
+        sample: float(value)
+        for sample, value in re.findall(r'^(\w+\{.*\}) (\S+)$', response.content.decode(), re.MULTILINE)
+    }
+
+
+def sample(metric, view, status='200', method='GET'):
+    return f'{metric}{{view="{view}",method="{method}",status="{status}"}}'
+
+
+@pytest.mark.django_db
+class TestMetricsMiddleware:
+    def test_measures_requests_by_url_name(self):
+        Order.objects.create(coordinator='Bernd', restaurant_name='Hallo Pizza')
+        client = Client()
+        response = client.get(reverse('orders:list_orders'))
+        client.get(reverse('orders:list_orders'))
+        samples = scrape(client)
+        view = 'orders:list_orders'
+        assert samples[sample('chaospizza_http_requests_total', view)] == 2
+        assert samples[sample('chaospizza_http_request_duration_seconds_count', view)] == 2
+        assert samples[sample('chaospizza_http_request_duration_seconds_bucket', view)[:-1] + ',le="+Inf"}'] == 2
+        assert samples[sample('chaospizza_http_request_duration_seconds_sum', view)] > 0
+        assert samples[sample('chaospizza_db_queries_total', view)] > 0
+        assert samples[sample('chaospizza_db_query_duration_seconds_total', view)] > 0
+        assert samples[sample('chaospizza_template_render_duration_seconds_total', view)] > 0
+        assert samples[sample('chaospizza_http_response_size_bytes_total', view)] == 2 * len(response.content)
+
+    def test_measures_async_views_served_by_asgi(self):
+        order = Order.objects.create(coordinator='Bernd', restaurant_name='Hallo Pizza')
+
+        async def scenario():
+            return await AsyncClient().get(order.get_absolute_url())
+
+        assert async_to_sync(scenario)().status_code == 200
+        samples = scrape()
+        assert samples[sample('chaospizza_http_requests_total', 'orders:view_order')] == 1
+        assert samples[sample('chaospizza_db_queries_total', 'orders:view_order')] > 0
+        assert samples[sample('chaospizza_template_render_duration_seconds_total', 'orders:view_order')] > 0
+
+    def test_labels_unknown_urls_as_unresolved(self):
+        assert Client().post('/unknown/url').status_code == 404
+        assert scrape()[sample('chaospizza_http_requests_total', 'unresolved', status='404', method='POST')] == 1
+
+    def test_counts_queries_outside_of_requests_nowhere(self):
+        list(Order.objects.all())
+        assert process_metrics.collect('') == {}
+
+    def test_installs_execute_wrapper_once_per_connection(self):
+        connection.close()
+        connection.ensure_connection()
+        assert connection.execute_wrappers.count(execute_wrapper) == 1
+        with connection.execute_wrapper(lambda execute, *args: execute(*args)):
+            pass
+        assert connection.execute_wrappers[0] is execute_wrapper
+
+    def test_requires_token(self):
+        assert Client().get(reverse('metrics')).status_code == 401
+        assert Client().get(reverse('metrics'), headers={'Authorization': 'Bearer wrong'}).status_code == 401
+        assert scrape(token='secret') is not None
+
+    def test_disabled_without_token_unless_debugging(self, settings):
+        settings.METRICS_TOKEN = ''
+        assert Client().get(reverse('metrics')).status_code == 404
+        settings.DEBUG = True
+        assert Client().get(reverse('metrics')).status_code == 200
+
+
+class TestProcessMetrics:
+    def record(self, metrics, view, duration):
+        request_metrics = RequestMetrics()
+        request_metrics.queries = 3
+        metrics.record((view, 'GET', '200'), duration, request_metrics, 100)
+
+    def test_aggregates_all_processes_writing_to_the_directory(self, tmp_path):
+        worker, other_worker = ProcessMetrics(), ProcessMetrics()
+        self.record(worker, 'orders:list_orders', 0.02)
+        self.record(other_worker, 'orders:list_orders', 0.2)
+        self.record(other_worker, 'orders:view_order', 20)
+        other_worker.flush(tmp_path)
+        merged = worker.collect(tmp_path)
+        assert merged[('orders:list_orders', 'GET', '200')]['requests'] == 2
+        assert merged[('orders:list_orders', 'GET', '200')]['queries'] == 6
+        assert merged[('orders:list_orders', 'GET', '200')]['buckets'] == [0, 0, 1, 0, 0, 1, 0, 0, 0, 0, 0, 0]
+        assert merged[('orders:view_order', 'GET', '200')]['buckets'][-1] == 1
+
+    def test_writes_once_within_flush_interval(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(registry, 'FLUSH_INTERVAL', 0.01)
+        worker = ProcessMetrics()
+        self.record(worker, 'orders:list_orders', 0.02)
+        worker.schedule_flush(tmp_path)
+        timer = worker.flush_timer
+        self.record(worker, 'orders:list_orders', 0.02)
+        worker.schedule_flush(tmp_path)
+        assert worker.flush_timer is timer
+        timer.join()
+        assert worker.flush_timer is None
+        assert ProcessMetrics().collect(tmp_path)[('orders:list_orders', 'GET', '200')]['requests'] == 2
+
+    def test_starts_over_in_forked_processes(self, monkeypatch, tmp_path):
+        worker = ProcessMetrics()
+        self.record(worker, 'orders:list_orders', 0.02)
+        filename = worker.filename
+        monkeypatch.setattr(registry.os, 'getpid', lambda: worker.pid + 1)
+        self.record(worker, 'orders:view_order', 0.02)
+        assert worker.filename != filename
+        assert list(worker.collect(tmp_path)) == [('orders:view_order', 'GET', '200')]
+
+    def test_formats_cumulative_histogram_and_escaped_labels(self):
+        worker = ProcessMetrics()
+        self.record(worker, 'say "hi"\\', 0.02)
+        text = format_metrics(worker.collect(''))
+        labels = r'view="say \"hi\"\\",method="GET",status="200"'
+        assert f'chaospizza_http_request_duration_seconds_bucket{{{labels},le="0.01"}} 0\n' in text
+        assert f'chaospizza_http_request_duration_seconds_bucket{{{labels},le="0.025"}} 1\n' in text
+        assert f'chaospizza_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1\n' in text
+        assert f'chaospizza_http_requests_total{{{labels}}} 1\n' in text
@@ -0,0 +1,8 @@
+# pylint: disable=C0111
+from django.urls import re_path
+from .views import metrics
+
+
+urlpatterns = [
+    re_path(r'^metrics$', metrics, name='metrics'),
+]
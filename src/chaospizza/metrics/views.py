@@ -0,0 +1,25 @@
+# pylint: disable=C0111
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import never_cache
+
+from .registry import CONTENT_TYPE, format_metrics, process_metrics
+
+
+@never_cache
+def metrics(request):
+    """
+    Show the request metrics of all worker processes in the Prometheus text format.
+
+    The metrics reveal traffic, errors and timings of every view, so without METRICS_TOKEN they are only served with
+    DEBUG enabled, e.g. by the development server.
+    """
+    if not settings.METRICS_TOKEN and not settings.DEBUG:
+        raise Http404('Request metrics are disabled, set METRICS_TOKEN to enable them.')
+    expected = f'Bearer {settings.METRICS_TOKEN}'
+    if settings.METRICS_TOKEN and not constant_time_compare(request.headers.get('Authorization', ''), expected):
+        response = HttpResponse('Missing or wrong bearer token.\n', status=401, content_type='text/plain')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    return HttpResponse(format_metrics(process_metrics.collect(settings.METRICS_DIR)), content_type=CONTENT_TYPE)
@@ -13,6 +13,7 @@ class OrderStateChangeInline(admin.TabularInline):  # noqa
 
 class OrderAdmin(admin.ModelAdmin):  # noqa
     list_fields = ('coordinator', 'restaurant_name')
+    readonly_fields = ('item_count', 'participant_count', 'total_price', 'last_state_change_at', 'updated_at')
     inlines = [
         OrderItemInline,
         OrderStateChangeInline,
@@ -0,0 +1,89 @@
+# pylint: disable=C0111
+"""
+Compact archive of finished orders.
+
+The archive_orders command moves finished orders out of the live tables. Every order is stored as a single
+ArchivedOrder row, which contains the order with its items and history as JSON. Archived orders are turned back into
+unsaved model instances when their page is requested, see ViewOrder.
+"""
+from decimal import Decimal
+from itertools import groupby
+from operator import attrgetter
+
+from django.apps import apps
+from django.utils.dateparse import parse_datetime
+
+ORDER_FIELDS = (
+    'id', 'slug', 'coordinator', 'restaurant_name', 'restaurant_url', 'state', 'created_at', 'item_count',
+    'participant_count', 'total_price', 'last_state_change_at', 'version', 'updated_at',
+)
+ITEM_FIELDS = ('id', 'slug', 'participant', 'description', 'price', 'amount')
+STATE_CHANGE_FIELDS = ('created_at', 'old_state', 'new_state', 'reason')
+DATETIME_FIELDS = ('created_at', 'last_state_change_at', 'updated_at')
+DECIMAL_FIELDS = ('total_price', 'price')
+
+
+def fields_to_json(instance, fields):
+    """Return the given fields of a model instance as dict, which is encoded by DjangoJSONEncoder."""
+    return {field: getattr(instance, field) for field in fields}
+
+
+def order_to_json(order):
+    """Return the archived representation of an order whose items and history have been prefetched."""
+    return dict(
+        fields_to_json(order, ORDER_FIELDS),
+        items=[fields_to_json(item, ITEM_FIELDS) for item in order.items.all()],
+        history=[fields_to_json(change, STATE_CHANGE_FIELDS) for change in order.history.all()],
+    )
+
+
+def fields_from_json(data, fields):
+    """Return the given fields of an archived object with their original types."""
+    values = {field: data[field] for field in fields}
+    for field in DATETIME_FIELDS:
+        if values.get(field) is not None:
+            values[field] = parse_datetime(values[field])
+    for field in DECIMAL_FIELDS:
+        if field in values:
+            values[field] = Decimal(values[field])
+    return values
+
+
+def load_order(archived_order):
+    """
+    Return an unsaved Order instance of an archived order and its items, as shown by ViewOrder.
+
+    The history is available as order.history.all(), the items are sorted by participant and annotated like the
+    result of ViewOrder.aget_order_items().
+
+    :return: order, items
+    """
+    order_model = apps.get_model('orders', 'Order')
+    order = order_model(**fields_from_json(archived_order.data, ORDER_FIELDS))
+    order._state.adding = False  # pylint: disable=W0212
+    order._prefetched_objects_cache = {  # pylint: disable=W0212
+        'history': [
+            apps.get_model('orders', 'OrderStateChange')(order=order, **fields_from_json(change, STATE_CHANGE_FIELDS))
+            for change in archived_order.data['history']
+        ],
+    }
+    items = sorted(
+        (
+            apps.get_model('orders', 'OrderItem')(order=order, **fields_from_json(item, ITEM_FIELDS))
+            for item in archived_order.data['items']
+        ),
+        key=attrgetter('participant', 'id'),
+    )
+    order_total = Decimal('0')
+    for _, group in groupby(items, key=attrgetter('participant')):
+        participant_items = list(group)
+        participant_total = Decimal('0')
+        for item in participant_items:
+            item.line_total = item.price * item.amount
+            participant_total += item.line_total
+        for item in participant_items:
+            item.participant_total = participant_total
+        order_total += participant_total
+    for item in items:
+        item.order_total = order_total
+    return order, items
@@ -0,0 +1,94 @@
+# pylint: disable=C0111
+"""
+Versioned cache for rendered order pages.
+
+Every order has a version which is incremented whenever its items or its state change. The current version of each
+order is kept in the cache, and rendered pages are stored under keys containing that version. Changing an order only
+updates its version key, stale pages are never read again and simply expire.
+
+The order list is keyed by a generation token instead, which is replaced whenever any order changes.
+
+Writers update the keys right away and once more after their transaction has been committed, readers only add keys
+which do not exist yet. This way a reader which loaded an order before a concurrent write has been committed can not
+overwrite a newer version.
+
+The reader functions have async variants, prefixed with ``a``, for the async views.
+"""
+from hashlib import md5
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+LIST_GENERATION_KEY = 'orders:list-generation'
+
+
+def order_version_key(order_slug):
+    """Return the cache key of the current version of the given order."""
+    return f'orders:version:{order_slug}'
+
+
+def get_order_version(order_slug):
+    """Return the cached version of the given order, or None if it is unknown."""
+    return cache.get(order_version_key(order_slug))
+
+
+async def aget_order_version(order_slug):
+    """Return the cached version of the given order, or None if it is unknown."""
+    return await cache.aget(order_version_key(order_slug))
+
+
+def remember_order_version(order):
+    """Cache the version of an order which has just been loaded from the database."""
+    cache.add(order_version_key(order.slug), order.version)
+
+
+async def aremember_order_version(order):
+    """Cache the version of an order which has just been loaded from the database."""
+    await cache.aadd(order_version_key(order.slug), order.version)
+
+
+def invalidate_order(order):
+    """Publish the new version of a changed order and start a new generation of the order list."""
+    version_key = order_version_key(order.slug)
+    version = order.version
+    cache.delete_many([version_key, LIST_GENERATION_KEY])
+
+    def publish():
+        cache.set_many({version_key: version, LIST_GENERATION_KEY: uuid4().hex})
+
+    transaction.on_commit(publish)
+
+
+def invalidate_order_list():
+    """Start a new generation of the order list."""
+    cache.delete(LIST_GENERATION_KEY)
+
+
+def get_list_generation():
+    """Return the current generation token of the order list."""
+    generation = cache.get(LIST_GENERATION_KEY)
+    if generation is None:
+        cache.add(LIST_GENERATION_KEY, uuid4().hex)
+        generation = cache.get(LIST_GENERATION_KEY)
+    return generation
+
+
+async def aget_list_generation():
+    """Return the current generation token of the order list."""
+    generation = await cache.aget(LIST_GENERATION_KEY)
+    if generation is None:
+        await cache.aadd(LIST_GENERATION_KEY, uuid4().hex)
+        generation = await cache.aget(LIST_GENERATION_KEY)
+    return generation
+
+
+def order_detail_key(order_slug, version, username):
+    """Return the cache key of the order page body, as shown to the given user."""
+    user_hash = md5((username or '').encode('utf-8'), usedforsecurity=False).hexdigest()
+    return f'orders:detail:{order_slug}:{version}:{user_hash}'
+
+
+def order_list_key(generation, state_filter, cursor):
+    """Return the cache key of the order list page body."""
+    return f'orders:list:{generation}:{state_filter or ""}:{cursor or ""}'
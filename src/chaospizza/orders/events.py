@@ -0,0 +1,157 @@
+# pylint: disable=C0111
+"""
+Fan-out of order changes to the event streams of all processes.
+
+Every change of an order is published with the order's new version. On PostgreSQL, changes are sent with NOTIFY
+within the changing transaction, so they are only delivered once committed, and each process runs a single thread
+which LISTENs for them. Other databases have no such mechanism, there the thread polls the versions of all orders
+which have subscribers instead.
+
+Subscriptions are cheap: they are a queue per event stream, the database is only used by the one broker thread.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+
+CHANNEL = 'chaospizza_order_events'
+
+logger = logging.getLogger(__name__)
+
+
+def publish_order_change(order, event):
+    """
+    Announce a change of the given order to all subscribers.
+
+    On PostgreSQL this runs a pg_notify() query right away, within the current transaction, which PostgreSQL only
+    delivers to the listeners once the transaction is committed. Other databases are polled, see OrderEventBroker.
+
+    :param order: changed order, with its new version
+    :param event: kind of the change, 'order', 'items' or 'state'
+    """
+    if connection.vendor != 'postgresql':
+        return
+    payload = json.dumps({'slug': order.slug, 'version': order.version, 'state': order.state, 'event': event})
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, payload])
+
+
+class Subscription:
+    """Queue of change events of a single order, consumed by one event stream."""
+
+    def __init__(self, order_slug):
+        """Create an empty queue, bound to the event loop which is currently running."""
+        self.order_slug = order_slug
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def put(self, event):
+        """Pass an event from the broker thread to the consuming event loop."""
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+    async def get(self, timeout):
+        """Wait for the next event, return None if there was none within timeout seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class OrderEventBroker:
+    """Receive order changes in a background thread and pass them to the subscriptions of this process."""
+
+    def __init__(self, background=True):
+        """
+        Create a broker without subscriptions.
+
+        :param background: start the thread which receives changes with the first subscription
+        """
+        self.lock = threading.Lock()
+        self.subscriptions = defaultdict(set)
+        self.versions = {}
+        self.background = background
+        self.thread = None
+
+    def subscribe(self, order_slug):
+        """Return a new subscription to the changes of the given order, must be called within an event loop."""
+        subscription = Subscription(order_slug)
+        with self.lock:
+            self.subscriptions[order_slug].add(subscription)
+            if self.background and (self.thread is None or not self.thread.is_alive()):
+                self.thread = threading.Thread(target=self.run, name='order-events', daemon=True)
+                self.thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Stop passing events to the given subscription."""
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.order_slug, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscriptions.pop(subscription.order_slug, None)
+                self.versions.pop(subscription.order_slug, None)
+
+    def deliver(self, event):
+        """Pass a change event to all subscriptions of its order."""
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(event['slug'], ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    def run(self):
+        """Receive changes until the process exits, reconnecting after database errors."""
+        while True:
+            try:
+                if connections['default'].vendor == 'postgresql':
+                    self.listen()
+                else:
+                    self.poll()
+            except Exception:  # pylint: disable=W0703
+                logger.exception('Order event broker failed, restarting')
+                time.sleep(settings.ORDER_EVENTS_POLL_INTERVAL)
+            finally:
+                connections['default'].close()
+
+    def listen(self):
+        """Receive changes sent by publish_order_change() using LISTEN on a dedicated connection."""
+        database = connections['default']
+        with database.cursor() as cursor:
+            cursor.execute(f'LISTEN {CHANNEL}')
+        while True:
+            if select.select([database.connection], [], [], 30) == ([], [], []):
+                continue
+            database.connection.poll()
+            while database.connection.notifies:
+                notify = database.connection.notifies.pop(0)
+                self.deliver(json.loads(notify.payload))
+
+    def poll(self):
+        """Detect changes by comparing the versions of all subscribed orders periodically."""
+        while True:
+            close_old_connections()
+            self.poll_once()
+            time.sleep(settings.ORDER_EVENTS_POLL_INTERVAL)
+
+    def poll_once(self):
+        """Load the versions of all subscribed orders with a single query and deliver an event for each change."""
+        from .models import Order  # pylint: disable=C0415
+        with self.lock:
+            order_slugs = list(self.subscriptions)
+        if not order_slugs:
+            return
+        changes = Order.objects.filter(slug__in=order_slugs).values_list('slug', 'version', 'state')
+        for order_slug, version, state in changes:
+            with self.lock:
+                if order_slug not in self.subscriptions or self.versions.get(order_slug) == version:
+                    continue
+                self.versions[order_slug] = version
+            self.deliver({'slug': order_slug, 'version': version, 'state': state, 'event': 'order'})
+
+
+broker = OrderEventBroker()
@@ -0,0 +1,87 @@
+# pylint: disable=C0111
+import json
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from ... import archive, cache as order_cache
+from ...models import ArchivedOrder, Order, FINISHED_STATES
+
+
+class Command(BaseCommand):
+    """Move finished orders which have not changed for a while to the archive."""
+
+    help = 'Move delivered and canceled orders older than the given number of days to the archive, in small batches.'
+
+    def add_arguments(self, parser):  # noqa
+        parser.add_argument(
+            '--older-than', type=int, required=True, metavar='DAYS',
+            help='Archive finished orders which have not changed for this many days.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Number of orders archived per transaction (default: 100).'
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help='Seconds to wait between two batches, to spread the load of large runs (default: 0).'
+        )
+        parser.add_argument(
+            '--export', metavar='FILE',
+            help='Also append every archived order as JSON line to this file.'
+        )
+
+    def handle(self, *args, **options):  # noqa
+        if options['older_than'] < 0:
+            raise CommandError('--older-than must not be negative.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        cutoff = timezone.now() - timedelta(days=options['older_than'])
+        archived = 0
+        started = time.monotonic()
+        with open(options['export'], 'a', encoding='utf-8') if options['export'] else nullcontext() as export:
+            while True:
+                batch = self.archive_batch(cutoff, options['batch_size'])
+                if export is not None:
+                    for archived_order in batch:
+                        export.write(json.dumps(archived_order.data, cls=DjangoJSONEncoder) + '\n')
+                archived += len(batch)
+                if len(batch) < options['batch_size']:
+                    break
+                if options['pause']:
+                    time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} orders in {time.monotonic() - started:.1f}s.'
+        ))
+
+    @staticmethod
+    def archive_batch(cutoff, batch_size):
+        """
+        Move up to batch_size finished orders last changed before cutoff to the archive, within one short transaction.
+
+        Orders locked by a concurrent request are skipped and archived by a later run, so the command never waits for
+        locks held by the application, and it never holds more than one batch of rows locked itself.
+
+        :return: list of the created ArchivedOrder instances
+        """
+        with transaction.atomic():
+            orders = list(
+                Order.objects.filter(state__in=FINISHED_STATES, updated_at__lt=cutoff)
+                .order_by('updated_at', 'id')
+                .select_for_update(skip_locked=True)
+                .prefetch_related('items', 'history')[:batch_size]
+            )
+            if not orders:
+                return []
+            archived_orders = ArchivedOrder.objects.bulk_create([
+                ArchivedOrder(id=order.id, slug=order.slug, data=archive.order_to_json(order)) for order in orders
+            ])
+            # Deletes the items, history, tombstones and search documents of the orders as well.
+            Order.objects.filter(id__in=[order.id for order in orders]).delete()
+            order_cache.invalidate_order_list()
+        return archived_orders
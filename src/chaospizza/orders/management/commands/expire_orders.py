@@ -0,0 +1,73 @@
+# pylint: disable=C0111
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from ...models import Order
+
+
+class Command(BaseCommand):
+    """Switch preparing orders whose preparation time has expired to ordering."""
+
+    help = 'Move preparing orders with an expired preparation time to ordering, once or periodically.'
+
+    def add_arguments(self, parser):  # noqa
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running and check for expired orders periodically.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help='Seconds to wait between two checks when running with --loop (default: 5).'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Number of expired orders loaded per query (default: 100).'
+        )
+
+    def handle(self, *args, **options):  # noqa
+        if not options['loop']:
+            self.report(self.expire_orders(timezone.now(), options['batch_size']))
+            return
+        try:
+            while True:
+                # A failed pass, e.g. while the database restarts, must not stop orders from expiring for good.
+                try:
+                    expired = self.expire_orders(timezone.now(), options['batch_size'])
+                except DatabaseError as err:
+                    self.stderr.write(f'Could not expire orders, trying again: {err}')
+                    close_old_connections()
+                else:
+                    if expired:
+                        self.report(expired)
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+    def report(self, expired):
+        """Write the number of expired orders to stdout."""
+        self.stdout.write(self.style.SUCCESS(f'Moved {expired} expired orders to ordering.'))
+
+    @staticmethod
+    def expire_orders(current_time, batch_size):
+        """
+        Switch all orders which are expired at current_time to ordering.
+
+        Expired orders are found by the partial index on preparation_expires_at, so every query only touches expired
+        orders, however many orders exist.
+
+        :return: number of orders switched to ordering
+        """
+        expired = 0
+        while True:
+            batch = list(
+                Order.objects.filter(state='preparing', preparation_expires_at__lt=current_time)
+                .order_by('preparation_expires_at')[:batch_size]
+            )
+            for order in batch:
+                if order.ordering_when_expired(current_time):
+                    expired += 1
+            if len(batch) < batch_size:
+                return expired
@@ -0,0 +1,81 @@
+# pylint: disable=C0111
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+
+from ... import cache as order_cache
+from ...models import SUMMARY_FIELDS, Order, OrderItem, OrderStateChange
+
+
+class Command(BaseCommand):
+    """Recalculate the summary columns of all orders from their items and history."""
+
+    help = 'Recalculate item_count, participant_count, total_price and last_state_change_at of all orders.'
+
+    def add_arguments(self, parser):  # noqa
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of orders updated per transaction (default: 1000).'
+        )
+
+    def handle(self, *args, **options):  # noqa
+        batch_size = options['batch_size']
+        last_id = 0
+        updated = 0
+        changed = 0
+        while True:
+            with transaction.atomic():
+                orders = list(
+                    Order.objects.select_for_update().filter(id__gt=last_id).order_by('id')[:batch_size]
+                )
+                if not orders:
+                    break
+                changed += self.rebuild(orders)
+            last_id = orders[-1].id
+            updated += len(orders)
+        order_cache.invalidate_order_list()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt summary of {updated} orders, {changed} of them changed.'))
+
+    @staticmethod
+    def rebuild(orders):
+        """
+        Recalculate and store the summary columns of the given, locked orders.
+
+        Like Order.update_summary(), orders whose summary changed get a new version, so their cached pages and ETags
+        are replaced.
+        """
+        order_ids = [order.id for order in orders]
+        item_summaries = {
+            summary.pop('order_id'): summary
+            for summary in OrderItem.objects.filter(order_id__in=order_ids).values('order_id').annotate(
+                item_count=Count('id'),
+                participant_count=Count('participant', distinct=True),
+                total_price=Sum(F('price') * F('amount'), output_field=Order._meta.get_field('total_price')),
+            )
+        }
+        last_state_changes = dict(
+            OrderStateChange.objects.filter(order_id__in=order_ids).values('order_id').annotate(
+                last_state_change_at=Max('created_at')
+            ).values_list('order_id', 'last_state_change_at')
+        )
+        empty = {'item_count': 0, 'participant_count': 0, 'total_price': Decimal('0')}
+        now = timezone.now()
+        changed = []
+        for order in orders:
+            summary = dict(item_summaries.get(order.id, empty), last_state_change_at=last_state_changes.get(order.id))
+            # SQLite calculates the sum with floats
+            summary['total_price'] = summary['total_price'].quantize(Decimal('0.01'))
+            if all(getattr(order, name) == value for name, value in summary.items()):
+                continue
+            for name, value in summary.items():
+                setattr(order, name, value)
+            order.version += 1
+            order.updated_at = now
+            changed.append(order)
+        Order.objects.bulk_update(changed, [*SUMMARY_FIELDS, 'version', 'updated_at'])
+        for order in changed:
+            order_cache.invalidate_order(order)
+        return len(changed)
@@ -0,0 +1,223 @@
+# pylint: disable=C0111
+import random
+import time
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ... import cache as order_cache, search as order_search, suggestions as order_suggestions
+from ...models import Order
+
+RESTAURANTS = (
+    ('Hallo Pizza', 'https://www.hallopizza.de/'),
+    ('Pizza Hut', 'https://www.pizzahut.de/'),
+    ('Pizzeria Da Toni', ''),
+    ('Call a Pizza', 'https://www.call-a-pizza.de/'),
+    ('Pizza Max', ''),
+    ('Domino\'s', 'https://www.dominos.de/'),
+    ('Asia Wok', ''),
+    ('Burger Bude', ''),
+    ('Döner Palast', ''),
+    ('Sushi Circle', ''),
+)
+DISHES = (
+    ('Pizza Margherita', '5.50'), ('Pizza Salami', '6.50'), ('Pizza Funghi', '6.50'), ('Pizza Tonno', '7.00'),
+    ('Pizza Hawaii', '7.00'), ('Pizza Diavolo', '7.50'), ('Pizza Quattro Formaggi', '8.00'), ('Pizza Spinaci', '7.00'),
+    ('Pizza Vegetaria', '7.50'), ('Pizza Calzone', '8.50'), ('Pizzabrötchen', '3.50'), ('Spaghetti Bolognese', '6.90'),
+    ('Lasagne', '7.90'), ('Salat Mista', '5.50'), ('Tiramisu', '3.90'), ('Cheeseburger', '6.50'),
+    ('Pommes Frites', '2.90'), ('Currywurst', '4.50'), ('Döner Kebab', '5.50'), ('Falafel Teller', '7.50'),
+    ('Gebratene Nudeln', '6.90'), ('Sushi Box', '11.90'), ('Frühlingsrollen', '3.50'), ('Club Mate', '2.00'),
+)
+FIRST_NAMES = (
+    'Anna', 'Bernd', 'Chris', 'Detlef', 'Eva', 'Felix', 'Gabi', 'Hugo', 'Ines', 'Jan', 'Kevin', 'Lena', 'Max',
+    'Nina', 'Olaf', 'Paula', 'Quentin', 'Rita', 'Sven', 'Tina', 'Uwe', 'Vera', 'Willi', 'Xenia', 'Yannik', 'Zoe',
+)
+CANCEL_REASONS = ('Restaurant closed', 'Not enough participants', 'Nobody wants to order', 'Delivery too slow')
+# Orders created within this time before now are still in progress, older ones have been delivered or canceled.
+ACTIVE_PERIOD = timedelta(hours=3)
+# Columns of the rows generated for items and state changes, which are inserted without creating model instances.
+ITEM_COLUMNS = ('order_id', 'slug', 'participant', 'description', 'price', 'amount', 'version')
+STATE_CHANGE_COLUMNS = ('order_id', 'created_at', 'old_state', 'new_state', 'reason', 'version')
+
+
+class OrderGenerator:
+    """
+    Generate random, but consistent orders with their items and history.
+
+    All random choices are made by a random number generator with a fixed seed, so the same seed generates the same
+    orders, apart from their slugs, which are unique. Orders are generated as unsaved Order instances, their items
+    and history as tuples of the values of ITEM_COLUMNS and STATE_CHANGE_COLUMNS, without the order_id.
+    """
+
+    def __init__(self, seed, count, days):
+        """
+        Prepare the menus and participants.
+
+        :param seed: seed of the random number generator
+        :param count: number of orders which will be generated
+        :param days: orders are spread evenly over this many days until now
+        """
+        self.random = random.Random(seed)
+        self.count = count
+        self.end = timezone.now()
+        self.start = self.end - timedelta(days=days)
+        self.menus = {
+            name: [
+                (dish, (Decimal(price) + Decimal(self.random.randint(-5, 10)) / 10).quantize(Decimal('0.01')))
+                for dish, price in self.random.sample(DISHES, 12)
+            ]
+            for name, _ in RESTAURANTS
+        }
+        self.participants = [f'{name} {letter}.' for name in FIRST_NAMES for letter in 'ABCDEFGHIJKLMNOPQRST']
+
+    def generate(self, number):
+        """
+        Generate the unsaved order with the given number, with its items and history.
+
+        :return: order, items, history
+        """
+        created_at = self.start + (self.end - self.start) * (number + self.random.random()) / self.count
+        restaurant_name, restaurant_url = self.random.choice(RESTAURANTS)
+        coordinator = self.random.choice(self.participants)
+        participants = self.random.sample(
+            self.participants, min(len(self.participants), 1 + int(self.random.expovariate(1 / 4)))
+        )
+        if coordinator not in participants:
+            participants[0] = coordinator
+        items = []
+        changed_at = created_at
+        for participant in participants:
+            for description, price in self.random.sample(self.menus[restaurant_name], self.random.choice((1, 1, 1, 2))):
+                changed_at = min(changed_at + timedelta(seconds=self.random.randint(10, 300)), self.end)
+                items.append((
+                    str(uuid4()), participant, description, price, self.random.choice((1, 1, 1, 1, 2)), len(items) + 1,
+                ))
+        history = []
+        for old_state, new_state in self.transitions(created_at):
+            changed_at = min(changed_at + timedelta(minutes=self.random.randint(1, 45)), self.end)
+            history.append((
+                changed_at, old_state, new_state,
+                self.random.choice(CANCEL_REASONS) if new_state == 'canceled' else None, len(items) + len(history) + 1,
+            ))
+        order = Order(
+            slug=str(uuid4()), coordinator=coordinator, restaurant_name=restaurant_name, restaurant_url=restaurant_url,
+            state=history[-1][2] if history else 'preparing', created_at=created_at,
+            item_count=len(items), participant_count=len(participants),
+            total_price=sum((price * amount for _, _, _, price, amount, _ in items), Decimal('0')),
+            last_state_change_at=history[-1][0] if history else None,
+            version=len(items) + len(history), updated_at=changed_at,
+        )
+        return order, items, history
+
+    def transitions(self, created_at):
+        """Return the state changes of an order created at the given time, as (old_state, new_state) pairs."""
+        path = [('preparing', 'ordering'), ('ordering', 'ordered'), ('ordered', 'delivered')]
+        if created_at > self.end - ACTIVE_PERIOD:
+            return path[:self.random.choice((0, 0, 1, 2))]
+        if self.random.random() < 0.08:
+            cancel_from = self.random.choice(('preparing', 'preparing', 'ordering'))
+            return path[:0 if cancel_from == 'preparing' else 1] + [(cancel_from, 'canceled')]
+        return path
+
+
+class Command(BaseCommand):
+    """Create many realistic orders for load and scale tests."""
+
+    help = (
+        'Create the given number of orders with items and history, in a realistic mix of states, spread over the '
+        'given number of days. Orders are generated from a fixed seed and inserted in batches.'
+    )
+
+    def add_arguments(self, parser):  # noqa
+        parser.add_argument('count', type=int, help='Number of orders to create.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random data (default: 0).')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='Spread the orders evenly over this many days until now (default: 365).'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of orders inserted per transaction (default: 1000).'
+        )
+
+    def handle(self, *args, **options):  # noqa
+        if options['count'] < 1:
+            raise CommandError('count must be positive.')
+        if options['days'] < 1:
+            raise CommandError('--days must be positive.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        generator = OrderGenerator(options['seed'], options['count'], options['days'])
+        # Counted over all orders and added at the end, bounded by the number of restaurants and dishes.
+        popularity = {name: Counter() for name, _ in RESTAURANTS}
+        prices = {name: {} for name, _ in RESTAURANTS}
+        started = time.monotonic()
+        totals = Counter()
+        for start in range(0, options['count'], options['batch_size']):
+            batch = [generator.generate(number) for number in range(
+                start, min(start + options['batch_size'], options['count'])
+            )]
+            totals.update(self.insert_batch(batch))
+            for order, items, _ in batch:
+                popularity[order.restaurant_name].update(item[2] for item in items)
+                prices[order.restaurant_name].update((item[2], item[3]) for item in items)
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{start + len(batch)} orders...')
+        with transaction.atomic():
+            for restaurant_name, counts in popularity.items():
+                order_suggestions.update_popularity(restaurant_name, counts, prices[restaurant_name])
+        order_cache.invalidate_order_list()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {totals["orders"]} orders with {totals["items"]} items and {totals["history"]} state changes '
+            f'in {elapsed:.1f}s ({totals["orders"] / elapsed:.0f} orders/s).'
+        ))
+
+    @staticmethod
+    def insert_batch(batch):
+        """
+        Insert a batch of generated orders with their items, history and search documents in one transaction.
+
+        Only the orders are created by bulk_create(), which sets their ids. It also sets created_at to the current time,
+        so the generated times are restored by UPDATEs afterwards. All other rows are inserted with executemany(),
+        since building model instances and SQL for millions of rows takes much longer than inserting.
+
+        :return: number of inserted orders, items and state changes
+        """
+        ops = connection.ops
+        with transaction.atomic():
+            created_at = [order.created_at for order, _, _ in batch]
+            orders = Order.objects.bulk_create([order for order, _, _ in batch])
+            for order, value in zip(orders, created_at):
+                order.created_at = value
+            items, history, documents = [], [], []
+            for order, order_items, order_history in batch:
+                items.extend(
+                    (order.id, slug, participant, description, ops.adapt_decimalfield_value(price), amount, version)
+                    for slug, participant, description, price, amount, version in order_items
+                )
+                history.extend(
+                    (order.id, ops.adapt_datetimefield_value(created_at), old_state, new_state, reason, version)
+                    for created_at, old_state, new_state, reason, version in order_history
+                )
+                documents.append((order.id, order_search.document_text(order, [item[2] for item in order_items])))
+            with connection.cursor() as cursor:
+                cursor.executemany('UPDATE orders_order SET created_at = %s WHERE id = %s', [
+                    (ops.adapt_datetimefield_value(order.created_at), order.id) for order in orders
+                ])
+                for table, columns, rows in (
+                    ('orders_orderitem', ITEM_COLUMNS, items),
+                    ('orders_orderstatechange', STATE_CHANGE_COLUMNS, history),
+                    (order_search.TABLE, ('order_id', 'text'), documents),
+                ):
+                    if rows:
+                        cursor.executemany(
+                            f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join(["%s"] * len(columns))})',
+                            rows
+                        )
+        return {'orders': len(orders), 'items': len(items), 'history': len(history)}
@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 06:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):  # noqa
+
+    dependencies = [
+        ('orders', '0002_coordinator_and_restaurant_not_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('state__in', ('preparing', 'ordering', 'ordered'))), fields=['-created_at', '-id'], name='order_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('state__in', ('delivered', 'canceled'))), fields=['-created_at', '-id'], name='order_finished_created_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):  # noqa
+
+    dependencies = [
+        ('orders', '0003_order_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='order',
+            options={'ordering': ('created_at', 'id')},
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2 on 2026-10-18 06:47
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Sum
+
+
+def fill_order_summary(apps, schema_editor):  # noqa
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    OrderStateChange = apps.get_model('orders', 'OrderStateChange')
+    price_field = models.DecimalField(max_digits=9, decimal_places=2)
+    summaries = OrderItem.objects.values('order_id').annotate(
+        item_count=Count('id'),
+        participant_count=Count('participant', distinct=True),
+        total_price=Sum(F('price') * F('amount'), output_field=price_field),
+    )
+    for summary in summaries.iterator():
+        # SQLite calculates the sum with floats, quantized like Order.update_summary() does
+        summary['total_price'] = summary['total_price'].quantize(Decimal('0.01'))
+        Order.objects.filter(id=summary.pop('order_id')).update(**summary)
+    state_changes = OrderStateChange.objects.values('order_id').annotate(last_state_change_at=Max('created_at'))
+    for state_change in state_changes.iterator():
+        Order.objects.filter(id=state_change.pop('order_id')).update(**state_change)
+
+
+class Migration(migrations.Migration):  # noqa
+
+    dependencies = [
+        ('orders', '0004_order_ordering_without_join'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='last_state_change_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='participant_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), editable=False, max_digits=9),
+        ),
+        migrations.RunPython(fill_order_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-18 06:50
+
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F
+
+
+def fill_preparation_expires_at(apps, schema_editor):  # noqa
+    Order = apps.get_model('orders', 'Order')
+    Order.objects.filter(preparation_expires_after__isnull=False).update(
+        preparation_expires_at=ExpressionWrapper(
+            F('created_at') + F('preparation_expires_after'),
+            output_field=models.DateTimeField(),
+        )
+    )
+
+
+class Migration(migrations.Migration):  # noqa
+
+    dependencies = [
+        ('orders', '0006_state_change_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='preparation_expires_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='preparation_expires_after',
+            field=models.DurationField(blank=True, help_text='How long the order is allowed to be prepared, e.g. 00:30:00 for half an hour.', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('state', 'preparing')), fields=['preparation_expires_at'], name='order_preparation_expiry_idx'),
+        ),
+        migrations.RunPython(fill_preparation_expires_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 06:56
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import django.utils.timezone
+
+
+def fill_updated_at(apps, schema_editor):  # noqa
+    Order = apps.get_model('orders', 'Order')
+    Order.objects.update(updated_at=Coalesce('last_state_change_at', 'created_at'))
+
+
+class Migration(migrations.Migration):  # noqa
+
+    dependencies = [
+        ('orders', '0008_order_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2 on 2026-10-18 07:08
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def fill_versions(apps, schema_editor):  # noqa
+    Order = apps.get_model('orders', 'Order')
+    order_version = Subquery(Order.objects.filter(id=OuterRef('order_id')).values('version')[:1])
+    apps.get_model('orders', 'OrderItem').objects.update(version=order_version)
+    apps.get_model('orders', 'OrderStateChange').objects.update(version=order_version)
+
+
+class Migration(migrations.Migration):  # noqa
+
+    dependencies = [
+        ('orders', '0009_order_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedOrderItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField()),
+                ('version', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='orderstatechange',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_versions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['order', 'version'], name='orderitem_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderstatechange',
+            index=models.Index(fields=['order', 'version'], name='orderstatechange_version_idx'),
+        ),
+        migrations.AddField(
+            model_name='deletedorderitem',
+            name='order',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, related_name='deleted_items', to='orders.order'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='deletedorderitem',
+            index=models.Index(fields=['order', 'version'], name='deletedorderitem_version_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2 on 2026-10-18 07:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):  # noqa
+
+    dependencies = [
+        ('menus', '0001_initial'),
+        ('orders', '0010_order_item_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='restaurant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='menus.restaurant'),
+        ),
+    ]
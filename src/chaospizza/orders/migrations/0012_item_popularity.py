@@ -0,0 +1,82 @@
+# Generated by Django 4.2 on 2026-10-18 07:17
+
+from django.db import migrations, models
+
+SQLITE_SEARCH_INDEX = [
+    "CREATE VIRTUAL TABLE orders_itempopularity_fts USING fts5("
+    "description, content='orders_itempopularity', content_rowid='id', prefix='1 2 3')",
+    "CREATE TRIGGER orders_itempopularity_fts_insert AFTER INSERT ON orders_itempopularity BEGIN "
+    "INSERT INTO orders_itempopularity_fts (rowid, description) VALUES (new.id, new.description); END",
+    "CREATE TRIGGER orders_itempopularity_fts_delete AFTER DELETE ON orders_itempopularity BEGIN "
+    "INSERT INTO orders_itempopularity_fts (orders_itempopularity_fts, rowid, description) "
+    "VALUES ('delete', old.id, old.description); END",
+    "CREATE TRIGGER orders_itempopularity_fts_update AFTER UPDATE OF description ON orders_itempopularity BEGIN "
+    "INSERT INTO orders_itempopularity_fts (orders_itempopularity_fts, rowid, description) "
+    "VALUES ('delete', old.id, old.description); "
+    "INSERT INTO orders_itempopularity_fts (rowid, description) VALUES (new.id, new.description); END",
+]
+POSTGRESQL_SEARCH_INDEX = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    # Matches the UPPER(description::text) LIKE UPPER(...) queries of the icontains lookup.
+    'CREATE INDEX orders_itempopularity_description_trgm ON orders_itempopularity '
+    'USING gin (UPPER(description) gin_trgm_ops)',
+]
+
+
+def create_search_index(apps, schema_editor):  # noqa
+    statements = {
+        'sqlite': SQLITE_SEARCH_INDEX,
+        'postgresql': POSTGRESQL_SEARCH_INDEX,
+    }.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):  # noqa
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE orders_itempopularity_fts')
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX orders_itempopularity_description_trgm')
+
+
+def fill_popularity(apps, schema_editor):  # noqa
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    ItemPopularity = apps.get_model('orders', 'ItemPopularity')
+    popularity = {}
+    items = OrderItem.objects.order_by('id').values_list('order__restaurant_name', 'description', 'price')
+    for restaurant_name, description, price in items.iterator():
+        key = (' '.join(restaurant_name.lower().split()), description)
+        popularity[key] = (popularity.get(key, (0, None))[0] + 1, price)
+    ItemPopularity.objects.bulk_create(
+        (
+            ItemPopularity(restaurant_key=key, description=description, popularity=count, last_price=price)
+            for (key, description), (count, price) in popularity.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):  # noqa
+
+    dependencies = [
+        ('orders', '0011_order_restaurant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemPopularity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('restaurant_key', models.CharField(max_length=250)),
+                ('description', models.CharField(max_length=250)),
+                ('popularity', models.PositiveIntegerField(default=0)),
+                ('last_price', models.DecimalField(decimal_places=2, max_digits=5)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['restaurant_key', '-popularity'], name='itempopularity_rank_idx')],
+                'unique_together': {('restaurant_key', 'description')},
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(fill_popularity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 4.2 on 2026-10-18 07:19
+
+from itertools import groupby
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+SQLITE_SEARCH_INDEX = [
+    "CREATE VIRTUAL TABLE orders_ordersearchdocument_fts USING fts5("
+    "text, content='orders_ordersearchdocument', content_rowid='order_id')",
+    "CREATE TRIGGER orders_ordersearchdocument_fts_insert AFTER INSERT ON orders_ordersearchdocument BEGIN "
+    "INSERT INTO orders_ordersearchdocument_fts (rowid, text) VALUES (new.order_id, new.text); END",
+    "CREATE TRIGGER orders_ordersearchdocument_fts_delete AFTER DELETE ON orders_ordersearchdocument BEGIN "
+    "INSERT INTO orders_ordersearchdocument_fts (orders_ordersearchdocument_fts, rowid, text) "
+    "VALUES ('delete', old.order_id, old.text); END",
+    "CREATE TRIGGER orders_ordersearchdocument_fts_update AFTER UPDATE OF text ON orders_ordersearchdocument BEGIN "
+    "INSERT INTO orders_ordersearchdocument_fts (orders_ordersearchdocument_fts, rowid, text) "
+    "VALUES ('delete', old.order_id, old.text); "
+    "INSERT INTO orders_ordersearchdocument_fts (rowid, text) VALUES (new.order_id, new.text); END",
+]
+POSTGRESQL_SEARCH_INDEX = [
+    "ALTER TABLE orders_ordersearchdocument "
+    "ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (to_tsvector('simple', text)) STORED",
+    'CREATE INDEX orders_ordersearchdocument_vector ON orders_ordersearchdocument USING gin (search_vector)',
+]
+
+
+def create_search_index(apps, schema_editor):  # noqa
+    statements = {
+        'sqlite': SQLITE_SEARCH_INDEX,
+        'postgresql': POSTGRESQL_SEARCH_INDEX,
+    }.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):  # noqa
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE orders_ordersearchdocument_fts')
+
+
+def fill_documents(apps, schema_editor):  # noqa
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    OrderSearchDocument = apps.get_model('orders', 'OrderSearchDocument')
+    # Orders and items are both read in order of the order id, so only the items of one order are kept in memory.
+    items = groupby(
+        OrderItem.objects.order_by('order_id').values_list('order_id', 'description').iterator(),
+        key=lambda item: item[0],
+    )
+    order_id, descriptions = next(items, (None, ()))
+    documents = []
+    for order in Order.objects.order_by('id').iterator():
+        while order_id is not None and order_id < order.id:
+            order_id, descriptions = next(items, (None, ()))
+        order_descriptions = sorted({description for _, description in descriptions}) if order_id == order.id else []
+        documents.append(OrderSearchDocument(order_id=order.id, text='\n'.join(
+            [order.restaurant_name, order.coordinator, order.created_at.strftime('%B %Y')] + order_descriptions
+        )))
+        if len(documents) == 1000:
+            OrderSearchDocument.objects.bulk_create(documents)
+            documents = []
+    OrderSearchDocument.objects.bulk_create(documents)
+
+
+class Migration(migrations.Migration):  # noqa
+
+    dependencies = [
+        ('orders', '0012_item_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSearchDocument',
+            fields=[
+                ('order', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document',
+                    serialize=False, to='orders.order'
+                )),
+                ('text', models.TextField()),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(fill_documents, migrations.RunPython.noop),
+    ]
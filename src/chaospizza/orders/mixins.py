@@ -1,6 +1,28 @@
 # pylint: disable=C0111
+from asgiref.sync import sync_to_async
+
+from .models import Order, FINISHED_STATES
+
+# Number of orders whose items are remembered in the session, the least recently joined orders are forgotten first.
+SESSION_ORDER_LIMIT = 20
+
+
 class UserSessionMixin:
-    """View mixin to retrieve and manipulate order-related session state."""
+    """
+    View mixin to retrieve and manipulate order-related session state.
+
+    The session stores the coordinated order, and the ids of the items the user added to each order they joined, as
+    order_ids = {order_id: [order_item_id, ...]}. Orders are dropped from order_ids once they are finished, and at most
+    SESSION_ORDER_LIMIT orders are kept, so sessions stay small for users who have joined many orders.
+    """
+
+    async def aload_session(self):
+        """
+        Load the session data in a worker thread.
+
+        Async views must call this before reading from the session, since loading it may require database access.
+        """
+        await sync_to_async(self.request.session.keys)()
 
     @property
     def username(self):
@@ -31,18 +53,39 @@ class UserSessionMixin:
         return self.is_coordinator and self.request.session.get('order_id', -1) == order_id
 
     def remove_order_from_session(self):
-        """Disable order coordination for the current session."""
+        """Disable order coordination for the current session, and forget the items of the coordinated order."""
+        order_id = self.request.session.pop('order_id')
         del self.request.session['is_coordinator']
-        del self.request.session['order_id']
+        self.request.session.pop('order_slug', None)
+        order_ids = self.request.session.get('order_ids', {})
+        if str(order_id) in order_ids:
+            del order_ids[str(order_id)]
+            self.request.session['order_ids'] = order_ids
 
     def add_order_item_to_session(self, order_id, order_item_id):
         """Store the given order_id/order_item_id in the session so we know what we are allowed to edit."""
-        order_ids = self.request.session.setdefault('order_ids', {})
-        item_ids = order_ids.setdefault(order_id, [])
-        item_ids.append(order_item_id)
+        self.add_order_items_to_session(order_id, [order_item_id])
+
+    def add_order_items_to_session(self, order_id, order_item_ids):
+        """
+        Store several order_item_ids of the given order_id in the session with a single session write.
+
+        Other orders of the session which have been finished since are dropped, see SESSION_ORDER_LIMIT.
+        """
+        order_ids = self.request.session.get('order_ids', {})
+        # Re-inserting the order moves it to the end, so the dict is ordered by when the orders were last joined.
+        item_ids = order_ids.pop(order_id, [])
+        order_ids[order_id] = item_ids + [
+            item_id for item_id in dict.fromkeys(order_item_ids) if item_id not in item_ids
+        ]
+        other_ids = list(order_ids)[:-1]
+        if other_ids:
+            finished = Order.objects.filter(id__in=other_ids, state__in=FINISHED_STATES).values_list('id', flat=True)
+            for finished_id in finished:
+                order_ids.pop(str(finished_id), None)
+        self.request.session['order_ids'] = dict(list(order_ids.items())[-SESSION_ORDER_LIMIT:])
 
     def user_can_edit_order_item(self, order_id, order_item_id):
         """Determine if the current user is allowed to edit the given order_id/order_item_id."""
-        order_ids = self.request.session.setdefault('order_ids', {})
-        item_ids = order_ids.setdefault(order_id, [])
-        return order_item_id in item_ids
+        # Only reads the session, so that checking does not mark the session as modified and save it again.
+        return order_item_id in self.request.session.get('order_ids', {}).get(order_id, ())
@@ -3,8 +3,18 @@
 from decimal import Decimal
 from uuid import uuid4
 import datetime
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce
 from django.urls import reverse
+from django.utils import timezone
+
+from . import cache as order_cache
+from . import events as order_events
+from . import search as order_search
+from . import suggestions as order_suggestions
 
 ORDER_STATES = (
     ('preparing', 'Order is prepared, order items can be modified.'),
@@ -13,6 +23,10 @@ ORDER_STATES = (
     ('delivered', 'Delivery has arrived.'),
     ('canceled', 'Order has been canceled due to some reason.'),
 )
+ACTIVE_STATES = ('preparing', 'ordering', 'ordered')
+FINISHED_STATES = ('delivered', 'canceled')
+# Columns of Order which summarize its items and history, see Order.update_summary()
+SUMMARY_FIELDS = ('item_count', 'participant_count', 'total_price', 'last_state_change_at')
 
 
 class Order(models.Model):
@@ -23,35 +37,96 @@ class Order(models.Model):
     """
 
     class Meta:  # noqa
-        ordering = ('history__created_at', )
+        ordering = ('created_at', 'id')
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+            # Keyset pagination of the order list, see pagination.py
+            models.Index(
+                fields=['-created_at', '-id'], name='order_active_created_idx',
+                condition=models.Q(state__in=ACTIVE_STATES),
+            ),
+            models.Index(
+                fields=['-created_at', '-id'], name='order_finished_created_idx',
+                condition=models.Q(state__in=FINISHED_STATES),
+            ),
+            # Lookup of expired orders by the expire_orders command
+            models.Index(
+                fields=['preparation_expires_at'], name='order_preparation_expiry_idx',
+                condition=models.Q(state='preparing'),
+            ),
+        ]
 
     slug = models.SlugField(max_length=50)
     coordinator = models.CharField(max_length=100)
     restaurant_name = models.CharField(max_length=250)
     restaurant_url = models.URLField(blank=True)
+    # Restaurant of the menus app the order has been created from, if any
+    restaurant = models.ForeignKey(
+        'menus.Restaurant', null=True, blank=True, related_name='orders', on_delete=models.SET_NULL
+    )
     state = models.CharField(max_length=16, choices=ORDER_STATES, default='preparing')
     # TODO remove this and always generate from state changes?
     created_at = models.DateTimeField(auto_now_add=True)
     preparation_expires_after = models.DurationField(
         null=True,
         blank=True,
-        help_text='How long the order is allowed to be prepared.'
+        help_text='How long the order is allowed to be prepared, e.g. 00:30:00 for half an hour.'
     )
+    # created_at + preparation_expires_after, stored so that expired orders can be found using an index.
+    preparation_expires_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Summary of the order items and history, maintained by OrderItem.save()/delete() and state changes so that
+    # pages can show them without touching the orders_orderitem table. Use the rebuild_order_summaries command
+    # after modifying order items behind the model's back.
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+    participant_count = models.PositiveIntegerField(default=0, editable=False)
+    total_price = models.DecimalField(max_digits=9, decimal_places=2, default=Decimal('0'), editable=False)
+    last_state_change_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Incremented whenever the order, its items or its state change, see cache.py
+    version = models.PositiveIntegerField(default=0, editable=False)
+    # Time of the last version increment, used as Last-Modified of the order pages
+    updated_at = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
 
     def get_absolute_url(self):
         """Return public url to view single order."""
         return reverse('orders:view_order', kwargs={'order_slug': self.slug})
 
+    def clean(self):
+        """Ensure that the preparation expiry time is positive."""
+        if self.preparation_expires_after is not None and self.preparation_expires_after <= datetime.timedelta(0):
+            raise ValidationError({'preparation_expires_after': 'Preparation expiry time must be positive.'})
+
     def save(self, *args, **kwargs):
         """Generate order slug based on coordinator and restaurant name."""
         if self.preparation_expires_after and self.preparation_expires_after <= datetime.timedelta(0):
             raise ValueError(
                 f"Preparation expiry time must be positive but is: {self.preparation_expires_after}"
             )
+        if self.preparation_expires_after:
+            self.preparation_expires_at = (self.created_at or timezone.now()) + self.preparation_expires_after
+        else:
+            self.preparation_expires_at = None
         # We could have used an UUIDField here, instead, but this would break the existing URLs.
         if not self.slug:
             self.slug = str(uuid4())
-        super().save(*args, **kwargs)
+        self.updated_at = timezone.now()
+        with transaction.atomic():
+            if self.pk is None:
+                super().save(*args, **kwargs)
+                descriptions = []
+            else:
+                self.version = F('version') + 1
+                if kwargs.get('update_fields') is None and not self._state.adding:
+                    # The summary of this instance may be stale, e.g. in the admin, and is only written by the items
+                    kwargs['update_fields'] = [
+                        field.name for field in self._meta.concrete_fields
+                        if not field.primary_key and field.name not in SUMMARY_FIELDS
+                    ]
+                super().save(*args, **kwargs)
+                self.refresh_from_db(fields=['version', *SUMMARY_FIELDS])
+                descriptions = self.items.values_list('description', flat=True)
+            order_search.update_document(self, descriptions)
+        order_cache.invalidate_order(self)
+        order_events.publish_order_change(self, 'order')
 
     def __expect_states(self, expected_state):
         if self.state not in expected_state:
@@ -60,16 +135,143 @@ class Order(models.Model):
             )
 
     def __update_state(self, new_state, reason=None):
-        log_entry = OrderStateChange(
-            order=self,
-            old_state=self.state,
-            new_state=new_state,
-            reason=reason
+        """
+        Switch from the current state to new_state, unless another request changed the state in the meantime.
+
+        The state column is only updated if it still contains the state this instance has seen (compare-and-swap), and
+        the history entry is written within the same transaction.
+
+        :return: True if the state has been changed, False if the order has been changed concurrently.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            changed = Order.objects.filter(pk=self.pk, state=self.state).update(
+                state=new_state,
+                last_state_change_at=now,
+                version=F('version') + 1,
+                updated_at=now,
+            )
+            if not changed:
+                self.refresh_from_db(fields=['state', 'last_state_change_at', 'version', 'updated_at'])
+                return False
+            self.refresh_from_db(fields=['version'])
+            # TODO signal?
+            OrderStateChange.objects.create(
+                order=self,
+                created_at=now,
+                old_state=self.state,
+                new_state=new_state,
+                reason=reason,
+                version=self.version,
+            )
+            self.state = new_state
+            self.last_state_change_at = now
+            self.updated_at = now
+            order_cache.invalidate_order(self)
+            order_events.publish_order_change(self, 'state')
+        return True
+
+    def lock(self):
+        """
+        Lock the order's row until the end of the current transaction.
+
+        The current version is loaded into this instance, the current state is returned.
+        """
+        state, self.version = Order.objects.select_for_update().filter(pk=self.pk).values_list(
+            'state', 'version'
+        ).get()
+        return state
+
+    def add_items(self, items):
+        """
+        Add several new order items to this order with a single INSERT.
+
+        The order's state is checked once for all items, on the locked row, instead of once per item like
+        OrderItem.save() does.
+
+        :param items: unsaved OrderItem instances
+        :return: the saved items, including their primary keys
+        """
+        return self.change_items(create=items)
+
+    def change_items(self, create=(), update=(), delete=()):
+        """
+        Add, change and delete several order items of this order within a single transaction.
+
+        Like add_items(), the order's state is checked once on the locked row, every kind of change is written with a
+        single query and the summary is updated once.
+
+        All created and updated items, and the tombstones of the deleted ones, are stamped with the new order version.
+
+        :param create: unsaved OrderItem instances
+        :param update: changed OrderItem instances of this order, their description, price and amount are saved
+        :param delete: OrderItem instances of this order
+        :return: the created items, including their primary keys
+        """
+        with transaction.atomic():
+            state = self.lock()
+            if state != 'preparing':
+                raise ValueError(f'Can only change order items when order is preparing, but order is {state}')
+            version = self.version + 1
+            for item in create:
+                item.order = self
+                item.version = version
+                # We could have used an UUIDField here, instead, but this would break the existing URLs.
+                if not item.slug:
+                    item.slug = str(uuid4())
+            created = OrderItem.objects.bulk_create(create) if create else []
+            for item in update:
+                item.version = version
+            if update:
+                previous = self.items.filter(id__in=[item.id for item in update]).values_list('description', flat=True)
+                removed = list(previous)
+                OrderItem.objects.bulk_update(update, ['description', 'price', 'amount', 'version'])
+            else:
+                removed = []
+            order_suggestions.record_items(
+                self.restaurant_name,
+                added=[(item.description, item.price) for item in list(create) + list(update)],
+                removed=removed + [item.description for item in delete],
+            )
+            if delete:
+                DeletedOrderItem.objects.bulk_create(
+                    DeletedOrderItem(order=self, slug=item.slug, version=version) for item in delete
+                )
+                self.items.filter(id__in=[item.id for item in delete]).delete()
+            self.update_summary()
+        return created
+
+    def update_summary(self):
+        """
+        Recalculate item_count, participant_count and total_price from the order items and store them.
+
+        The order's version is incremented as well. Must be called within a transaction after the order has been locked,
+        otherwise concurrent item changes may get lost.
+        """
+        summary = self.items.aggregate(
+            item_count=Count('id'),
+            participant_count=Count('participant', distinct=True),
+            total_price=Coalesce(
+                Sum(F('price') * F('amount'), output_field=self._meta.get_field('total_price')),
+                Value(Decimal('0')),
+                output_field=self._meta.get_field('total_price'),
+            ),
         )
-        self.state = new_state
-        self.save()
-        # TODO signal?
-        log_entry.save()
+        # SQLite calculates the sum with floats
+        summary['total_price'] = summary['total_price'].quantize(Decimal('0.01'))
+        self.version += 1
+        self.updated_at = timezone.now()
+        Order.objects.filter(pk=self.pk).update(version=self.version, updated_at=self.updated_at, **summary)
+        for name, value in summary.items():
+            setattr(self, name, value)
+        order_search.update_document(self, self.items.values_list('description', flat=True))
+        order_cache.invalidate_order(self)
+        order_events.publish_order_change(self, 'items')
+
+    @property
+    def is_active(self):
+        """Return True if the order has not been delivered or canceled yet."""
+        return self.state in ACTIVE_STATES
 
     @property
     def is_preparing(self):
@@ -80,30 +282,32 @@ class Order(models.Model):
         """
         Return true when preparation_time is set and expired, false otherwise.
 
-        :param current_time: to calculate if preparation time is expired, usually obtained by datetime.now()
+        :param current_time: to calculate if preparation time is expired, usually obtained by timezone.now()
         """
-        print(self.created_at)
-        print(self.preparation_expires_after)
-        print(current_time)
-        return self.preparation_expires_after and current_time > self.created_at + self.preparation_expires_after
+        return self.preparation_expires_at is not None and current_time > self.preparation_expires_at
 
     def ordering_when_expired(self, current_time):
         """
         Set order state to ordering if preparation_time is set and expired.
 
-        :param current_time: to calculate if preparation time is expired, usually obtained by datetime.now()
+        Return True if the state has been changed.
+
+        :param current_time: to calculate if preparation time is expired, usually obtained by timezone.now()
         """
         if self.is_preparation_time_expired(current_time):
-            self.ordering()
+            return self.ordering()
+        return False
 
     def ordering(self):
         """
         Set order state to ordering.
 
         Adding new items is not allowed afterwards.
+
+        Return False without changing anything if another request changed the order's state first.
         """
         self.__expect_states(['preparing'])
-        self.__update_state('ordering')
+        return self.__update_state('ordering')
 
     @property
     def is_ordering(self):
@@ -111,9 +315,13 @@ class Order(models.Model):
         return self.state == 'ordering'
 
     def ordered(self):
-        """Set order state to ordered."""
+        """
+        Set order state to ordered.
+
+        Return False without changing anything if another request changed the order's state first.
+        """
         self.__expect_states(['ordering'])
-        self.__update_state('ordered')
+        return self.__update_state('ordered')
 
     @property
     def is_ordered(self):
@@ -121,9 +329,13 @@ class Order(models.Model):
         return self.state == 'ordered'
 
     def delivered(self):
-        """Set order state to final state delivered."""
+        """
+        Set order state to final state delivered.
+
+        Return False without changing anything if another request changed the order's state first.
+        """
         self.__expect_states(['ordered'])
-        self.__update_state('delivered')
+        return self.__update_state('delivered')
 
     @property
     def is_delivered(self):
@@ -131,22 +343,21 @@ class Order(models.Model):
         return self.state == 'delivered'
 
     def cancel(self, reason):
-        """Set order state to final state canceled."""
+        """
+        Set order state to final state canceled.
+
+        Return False without changing anything if another request changed the order's state first.
+        """
         if not reason:
             raise ValueError('need reason for cancellation')
         self.__expect_states(['preparing', 'ordering', 'ordered'])
-        self.__update_state('canceled', reason)
+        return self.__update_state('canceled', reason)
 
     @property
     def is_canceled(self):
         """Return True if the order has state cancelled."""
         return self.state == 'canceled'
 
-    @property
-    def total_price(self):
-        """Calculate total order price based on all order items."""
-        return sum(record.total_price for record in self.items.all())
-
 
 class OrderItem(models.Model):
     """
@@ -157,6 +368,9 @@ class OrderItem(models.Model):
 
     class Meta:  # noqa
         unique_together = ('order', 'participant', 'description')
+        indexes = [
+            models.Index(fields=['order', 'version'], name='orderitem_version_idx'),
+        ]
 
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
     slug = models.SlugField(max_length=50)
@@ -164,25 +378,41 @@ class OrderItem(models.Model):
     description = models.CharField(max_length=250)
     price = models.DecimalField(max_digits=5, decimal_places=2)
     amount = models.PositiveIntegerField(default=1)
+    # Version of the order which contains the last change of this item, see Order.version
+    version = models.PositiveIntegerField(default=0, editable=False)
 
     def save(self, *args, **kwargs):
-        """Prevent record from being saved when associated order is not preparing."""
-        if not self.order.is_preparing:
-            raise ValueError(
-                f'Can only save order item when order is preparing, but order is {self.order.state}'
-            )
+        """
+        Prevent record from being saved when associated order is not preparing.
+
+        The state is checked on the locked row, so a concurrent state change can not slip in between check and save.
+        """
         # We could have used an UUIDField here, instead, but this would break the existing URLs.
         if not self.slug:
             self.slug = str(uuid4())
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            state = self.order.lock()
+            if state != 'preparing':
+                raise ValueError(f'Can only save order item when order is preparing, but order is {state}')
+            self.version = self.order.version + 1
+            previous = OrderItem.objects.filter(pk=self.pk).values_list('description', flat=True) if self.pk else []
+            order_suggestions.record_items(
+                self.order.restaurant_name, added=[(self.description, self.price)], removed=list(previous)
+            )
+            super().save(*args, **kwargs)
+            self.order.update_summary()
 
     def delete(self, *args, **kwargs):
-        """Prevent record from being delete when associated order is not preparing."""
-        if not self.order.is_preparing:
-            raise ValueError(
-                f'Can only delete order item when order is preparing, but order is {self.order.state}'
-            )
-        super().delete(*args, **kwargs)
+        """Prevent record from being delete when associated order is not preparing, checked like in save()."""
+        with transaction.atomic():
+            state = self.order.lock()
+            if state != 'preparing':
+                raise ValueError(f'Can only delete order item when order is preparing, but order is {state}')
+            DeletedOrderItem.objects.create(order=self.order, slug=self.slug, version=self.order.version + 1)
+            order_suggestions.record_items(self.order.restaurant_name, removed=[self.description])
+            result = super().delete(*args, **kwargs)
+            self.order.update_summary()
+        return result
 
     @property
     def total_price(self):
@@ -198,7 +428,72 @@ class OrderStateChange(models.Model):
     """
 
     order = models.ForeignKey(Order, related_name='history', on_delete=models.CASCADE)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     old_state = models.CharField(max_length=16, choices=ORDER_STATES)
     new_state = models.CharField(max_length=16, choices=ORDER_STATES)
     reason = models.CharField(max_length=1000, null=True)
+    # Version of the order after this state change, see Order.version
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:  # noqa
+        indexes = [
+            models.Index(fields=['order', 'version'], name='orderstatechange_version_idx'),
+        ]
+
+
+class DeletedOrderItem(models.Model):
+    """
+    Tombstone of a deleted order item.
+
+    Lets clients which synchronize an order by its version learn about deleted items.
+    """
+
+    class Meta:  # noqa
+        indexes = [
+            models.Index(fields=['order', 'version'], name='deletedorderitem_version_idx'),
+        ]
+
+    order = models.ForeignKey(Order, related_name='deleted_items', on_delete=models.CASCADE)
+    slug = models.SlugField(max_length=50)
+    # Version of the order which deleted the item
+    version = models.PositiveIntegerField()
+
+
+class ItemPopularity(models.Model):
+    """
+    How often a description has been ordered from a restaurant, used for type-ahead suggestions.
+
+    Maintained by Order.change_items() and OrderItem.save()/delete(), see suggestions.py.
+    """
+
+    class Meta:  # noqa
+        unique_together = ('restaurant_key', 'description')
+        indexes = [
+            models.Index(fields=['restaurant_key', '-popularity'], name='itempopularity_rank_idx'),
+        ]
+
+    # Normalized restaurant name of the orders, see suggestions.restaurant_key()
+    restaurant_key = models.CharField(max_length=250)
+    description = models.CharField(max_length=250)
+    popularity = models.PositiveIntegerField(default=0)
+    # Price of the latest order item with this description
+    last_price = models.DecimalField(max_digits=5, decimal_places=2)
+
+
+class OrderSearchDocument(models.Model):
+    """Text of an order which is searched by the order search, see search.py."""
+
+    order = models.OneToOneField(Order, primary_key=True, related_name='search_document', on_delete=models.CASCADE)
+    text = models.TextField()
+
+
+class ArchivedOrder(models.Model):
+    """
+    Finished order which has been moved out of the live tables by the archive_orders command, see archive.py.
+
+    The id of the order is kept, its items and history are stored together with the order in data.
+    """
+
+    slug = models.SlugField(max_length=50, unique=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
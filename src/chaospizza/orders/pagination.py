@@ -0,0 +1,73 @@
+# pylint: disable=C0111
+"""
+Keyset (cursor) pagination for order querysets.
+
+Pages are ordered by ``(created_at, id)`` descending. Instead of an OFFSET the
+next page starts right after the last order of the previous page, so fetching
+any page costs one index range scan of ``page_size + 1`` rows, no matter how
+many orders exist.
+"""
+import datetime
+
+from django.db.models import Q
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor string can not be decoded."""
+
+
+def encode_cursor(order):
+    """Return an opaque, URL-safe cursor pointing at the given order."""
+    micros = (order.created_at - EPOCH) // datetime.timedelta(microseconds=1)
+    return f'{micros}-{order.id}'
+
+
+def decode_cursor(value):
+    """
+    Decode a cursor created by encode_cursor().
+
+    :param value: cursor string from the query string
+    :return: tuple of (created_at, id)
+    """
+    try:
+        micros, order_id = value.split('-')
+        created_at = EPOCH + datetime.timedelta(microseconds=int(micros))
+        return created_at, int(order_id)
+    except (AttributeError, ValueError, OverflowError) as err:
+        raise InvalidCursor(f'Invalid cursor: {value!r}') from err
+
+
+def keyset_page(queryset, cursor=None, page_size=20):
+    """
+    Return one page of the queryset, newest first, starting after the given cursor.
+
+    :param queryset: Order queryset, may already be filtered
+    :param cursor: cursor string of the last order on the previous page, or None for the first page
+    :param page_size: maximum number of orders on this page
+    :return: tuple of (list of orders, cursor of the next page or None)
+    """
+    return _split_page(list(_page_queryset(queryset, cursor, page_size)), page_size)
+
+
+async def akeyset_page(queryset, cursor=None, page_size=20):
+    """Return one page of the queryset like keyset_page(), using the async ORM API."""
+    return _split_page([order async for order in _page_queryset(queryset, cursor, page_size)], page_size)
+
+
+def _page_queryset(queryset, cursor, page_size):
+    """Return the queryset of the page after cursor, including one more order to detect a next page."""
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor:
+        created_at, order_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=order_id))
+    return queryset[:page_size + 1]
+
+
+def _split_page(orders, page_size):
+    """Cut off the extra order loaded by _page_queryset() and return it as cursor of the next page."""
+    if len(orders) > page_size:
+        orders = orders[:page_size]
+        return orders, encode_cursor(orders[-1])
+    return orders, None
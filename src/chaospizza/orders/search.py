@@ -0,0 +1,88 @@
+# pylint: disable=C0111
+"""
+Full-text search of orders by restaurant, coordinator, item descriptions and month.
+
+Every order has a search document in the OrderSearchDocument table, containing its restaurant name, its coordinator,
+the month it has been created in and the distinct descriptions of its items. The document is written by Order.save()
+and whenever the items change, so searching never touches the orders or their items.
+
+- PostgreSQL keeps a generated tsvector column of every document, with a GIN index.
+- SQLite keeps an FTS5 table of the documents, kept up to date by triggers.
+- Other databases fall back to matching every word anywhere in the documents, without ranking.
+
+Every word of the query must match the start of a word of the document. Results are ranked by relevance, newer orders
+first if their relevance is equal. The search indexes are created by migration 0013_order_search_document.
+"""
+import re
+
+from django.apps import apps
+from django.db import connection
+
+from .suggestions import fts_query
+
+TABLE = 'orders_ordersearchdocument'
+FTS_TABLE = 'orders_ordersearchdocument_fts'
+
+
+def document_text(order, descriptions):
+    """Return the search document of the given order and the descriptions of its items."""
+    return '\n'.join(
+        [order.restaurant_name, order.coordinator, order.created_at.strftime('%B %Y')] + sorted(set(descriptions))
+    )
+
+
+def update_document(order, descriptions):
+    """
+    Store the search document of the given order.
+
+    :param order: saved order
+    :param descriptions: descriptions of all items of the order
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TABLE} (order_id, text) VALUES (%s, %s) '
+            f'ON CONFLICT (order_id) DO UPDATE SET text = excluded.text',
+            [order.pk, document_text(order, descriptions)]
+        )
+
+
+def query_words(text):
+    """Return the lowercased words of a search query."""
+    return re.findall(r'\w+', text.lower())
+
+
+def search_order_ids(text, offset, limit):
+    """Return the ids of the orders matching the given query, best matches first."""
+    words = query_words(text)
+    if not words:
+        return []
+    if connection.vendor == 'postgresql':
+        sql = (
+            f"SELECT order_id FROM {TABLE}, to_tsquery('simple', %s) query WHERE search_vector @@ query "
+            f'ORDER BY ts_rank(search_vector, query) DESC, order_id DESC LIMIT %s OFFSET %s'
+        )
+        params = [' & '.join(f'{word}:*' for word in words), limit, offset]
+    elif connection.vendor == 'sqlite':
+        sql = f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rank, rowid DESC LIMIT %s OFFSET %s'
+        params = [fts_query(words), limit, offset]
+    else:
+        sql = (
+            f'SELECT order_id FROM {TABLE} WHERE {" AND ".join(["LOWER(text) LIKE %s"] * len(words))} '
+            f'ORDER BY order_id DESC LIMIT %s OFFSET %s'
+        )
+        params = [f'%{word}%' for word in words] + [limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_orders(text, page, page_size):
+    """
+    Return one page of the orders matching the given query, best matches first, with two queries.
+
+    :param page: number of the page, starting at 1
+    :return: orders of the page, and whether there is a next page
+    """
+    order_ids = search_order_ids(text, (page - 1) * page_size, page_size + 1)
+    orders = apps.get_model('orders', 'Order').objects.in_bulk(order_ids[:page_size]) if order_ids else {}
+    return [orders[order_id] for order_id in order_ids[:page_size] if order_id in orders], len(order_ids) > page_size
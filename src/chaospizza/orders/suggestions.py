@@ -0,0 +1,107 @@
+# pylint: disable=C0111
+"""
+Type-ahead suggestions for the descriptions of order items.
+
+Every description ever ordered from a restaurant is counted in the ItemPopularity table, which is updated
+incrementally whenever order items are added, changed or deleted. Suggestions are looked up in that table only, ranked
+by popularity, so the order items themselves are never scanned.
+
+Restaurants are matched by their normalized name, descriptions by the words typed so far:
+
+- PostgreSQL uses a trigram GIN index on the descriptions and matches every word anywhere in a description.
+- SQLite uses an FTS5 table, kept up to date by triggers, and matches every word as prefix of a word of a description.
+- Other databases match the typed text as prefix of the descriptions of the restaurant.
+
+The search indexes are created by migration 0012_item_popularity.
+"""
+from collections import Counter
+
+from django.apps import apps
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+TABLE = 'orders_itempopularity'
+FTS_TABLE = 'orders_itempopularity_fts'
+
+
+def restaurant_key(restaurant_name):
+    """Return the normalized restaurant name, so that differently typed names of a restaurant share suggestions."""
+    return ' '.join(restaurant_name.lower().split())
+
+
+def record_items(restaurant_name, added=(), removed=()):
+    """
+    Count the descriptions of added order items and stop counting the descriptions of removed ones.
+
+    Must be called within the transaction which changes the order items.
+
+    :param restaurant_name: restaurant name of the order
+    :param added: (description, price) pairs of added or changed order items
+    :param removed: descriptions of deleted order items, and the previous descriptions of changed ones
+    """
+    counts = Counter(description for description, _ in added)
+    counts.subtract(removed)
+    update_popularity(restaurant_name, counts, dict(added))
+
+
+def update_popularity(restaurant_name, counts, prices):
+    """
+    Add the given counts to the popularity of descriptions ordered from a restaurant.
+
+    :param counts: mapping of descriptions to the number of added (positive) or removed (negative) order items
+    :param prices: mapping of descriptions to their latest price, required for descriptions with positive counts
+    """
+    key = restaurant_key(restaurant_name)
+    increments = [
+        (key, description, count, prices[description])
+        for description, count in counts.items() if count >= 0 and description in prices
+    ]
+    if increments:
+        with connection.cursor() as cursor:
+            # Concurrent orders from the same restaurant may add the same description, so rows are upserted.
+            cursor.execute(
+                f'INSERT INTO {TABLE} (restaurant_key, description, popularity, last_price) '
+                f'VALUES {", ".join(["(%s, %s, %s, %s)"] * len(increments))} '
+                f'ON CONFLICT (restaurant_key, description) DO UPDATE SET '
+                f'popularity = {TABLE}.popularity + excluded.popularity, last_price = excluded.last_price',
+                [value for row in increments for value in row]
+            )
+    decrements = {}
+    for description, count in counts.items():
+        if count < 0:
+            decrements.setdefault(-count, []).append(description)
+    if decrements:
+        with connection.cursor() as cursor:
+            for count, descriptions in decrements.items():
+                cursor.execute(
+                    f'UPDATE {TABLE} SET popularity = CASE WHEN popularity > %s THEN popularity - %s ELSE 0 END '
+                    f'WHERE restaurant_key = %s AND description IN ({", ".join(["%s"] * len(descriptions))})',
+                    [count, count, key] + descriptions
+                )
+
+
+def fts_query(words):
+    """Return an FTS5 query matching descriptions which contain a word starting with each of the given words."""
+    return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+def suggest(restaurant_name, text, limit=10):
+    """
+    Return the most popular descriptions ordered from the given restaurant which match the given text.
+
+    :return: list of dicts with description and last_price, the price of the latest order item
+    """
+    queryset = apps.get_model('orders', 'ItemPopularity').objects.filter(
+        restaurant_key=restaurant_key(restaurant_name), popularity__gt=0
+    )
+    words = [word for word in text.split() if any(char.isalnum() for char in word)]
+    if words and connection.vendor == 'postgresql':
+        for word in words:
+            queryset = queryset.filter(description__icontains=word)
+    elif words and connection.vendor == 'sqlite':
+        queryset = queryset.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [fts_query(words)])
+        )
+    elif words:
+        queryset = queryset.filter(description__istartswith=' '.join(words))
+    return list(queryset.order_by('-popularity', 'description').values('description', 'last_price')[:limit])
@@ -0,0 +1,259 @@
+# pylint: disable=C0111
+# pylint: disable=W0621
+import json
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Order, OrderItem
+
+
+pytestmark = pytest.mark.django_db
+
+
+class ApiClient:  # noqa
+    """Wrap a django test client instance and call the JSON API."""
+    def __init__(self, client=None):
+        self.client = client or Client()
+
+    def list_orders(self, **params):
+        return self.client.get(reverse('orders:api_list_orders'), data=params)
+
+    def view_order(self, order_slug):
+        return self.client.get(reverse('orders:api_view_order', kwargs={'order_slug': order_slug}))
+
+    def order_changes(self, order_slug, **params):
+        return self.client.get(reverse('orders:api_order_changes', kwargs={'order_slug': order_slug}), data=params)
+
+    def change_items(self, order_slug, **data):
+        return self.client.post(
+            reverse('orders:api_order_items', kwargs={'order_slug': order_slug}),
+            data=json.dumps(data), content_type='application/json'
+        )
+
+    def update_state(self, order_slug, **data):
+        return self.client.post(
+            reverse('orders:api_order_state', kwargs={'order_slug': order_slug}),
+            data=json.dumps(data), content_type='application/json'
+        )
+
+
+@pytest.fixture
+def coordinator():
+    return ApiClient()
+
+
+@pytest.fixture
+def order(coordinator):
+    coordinator.client.post(reverse('orders:create_order'), data={
+        'coordinator': 'Bernd', 'restaurant_name': 'Hallo Pizza'
+    })
+    return Order.objects.get()
+
+
+@pytest.fixture
+def participant():
+    return ApiClient()
+
+
+def order_queries(call):
+    with CaptureQueriesContext(connection) as context:
+        response = call()
+    return response, [query['sql'] for query in context.captured_queries if '"orders_' in query['sql']]
+
+
+class TestListOrders:
+    def test_orders_are_paginated(self, monkeypatch):
+        monkeypatch.setattr('chaospizza.orders.views.api.ListOrdersApi.page_size', 2)
+        for name in ('A', 'B', 'C'):
+            Order.objects.create(coordinator='Bernd', restaurant_name=name)
+        first = ApiClient().list_orders().json()
+        assert [order['restaurant_name'] for order in first['orders']] == ['C', 'B']
+        second = ApiClient().list_orders(cursor=first['next_cursor']).json()
+        assert [order['restaurant_name'] for order in second['orders']] == ['A']
+        assert second['next_cursor'] is None
+
+    def test_state_filter(self, order):
+        Order.objects.create(coordinator='Lisa', restaurant_name='Pizza Hut').ordering()
+        Order.objects.create(coordinator='Kevin', restaurant_name='Asia').cancel('closed')
+        response = ApiClient().list_orders(state='finished')
+        assert [order['restaurant_name'] for order in response.json()['orders']] == ['Asia']
+
+    def test_one_query_per_page(self, order):
+        response, queries = order_queries(ApiClient().list_orders)
+        assert response.status_code == 200
+        assert len(queries) == 1
+
+    def test_response_is_compact(self, order):
+        content = ApiClient().list_orders().content.decode()
+        assert ', ' not in content and ': ' not in content
+        assert json.loads(content)['orders'][0]['total_price'] == '0.00'
+
+    @pytest.mark.parametrize('params', [{'state': 'foo'}, {'cursor': 'foo'}])
+    def test_invalid_parameters(self, params):
+        response = ApiClient().list_orders(**params)
+        assert response.status_code == 400
+        assert 'error' in response.json()
+
+
+class TestViewOrder:
+    def test_order_with_items_and_history(self, coordinator, participant, order):
+        participant.change_items(order.slug, participant='Kevin', create=[
+            {'description': 'Pizza Salami', 'price': '5.60', 'amount': 2},
+        ])
+        coordinator.update_state(order.slug, state='ordering')
+        response, queries = order_queries(lambda: ApiClient().view_order(order.slug))
+        data = response.json()
+        assert len(queries) == 3
+        assert (data['state'], data['item_count'], data['total_price']) == ('ordering', 1, '11.20')
+        assert [(item['participant'], item['description']) for item in data['items']] == [('Kevin', 'Pizza Salami')]
+        assert [(change['old_state'], change['new_state']) for change in data['history']] == [('preparing', 'ordering')]
+
+    def test_unknown_order(self):
+        response = ApiClient().view_order('foo')
+        assert response.status_code == 404
+        assert response.json() == {'error': 'Order not found'}
+
+
+class TestOrderChanges:
+    def test_unchanged_order(self, order):
+        response, queries = order_queries(lambda: ApiClient().order_changes(order.slug, since=order.version))
+        assert response.content == f'{{"version":{order.version}}}'.encode()
+        assert len(queries) == 1
+
+    def test_changes_since_version(self, coordinator, participant, order):
+        created = participant.change_items(order.slug, participant='Kevin', create=[
+            {'description': 'Pizza Salami', 'price': '5.60'},
+            {'description': 'Cola', 'price': '2.00'},
+            {'description': 'Salad', 'price': '4.00'},
+        ]).json()['created']
+        since = Order.objects.get(id=order.id).version
+        participant.change_items(order.slug, update=[{'slug': created[0]['slug'], 'amount': 2}])
+        participant.change_items(order.slug, delete=[created[1]['slug']])
+        coordinator.update_state(order.slug, state='ordering')
+        data = ApiClient().order_changes(order.slug, since=since).json()
+        assert data['version'] == data['order']['version'] == since + 3
+        assert [(item['description'], item['amount']) for item in data['items']] == [('Pizza Salami', 2)]
+        assert data['deleted'] == [created[1]['slug']]
+        assert [change['new_state'] for change in data['history']] == ['ordering']
+        assert ApiClient().order_changes(order.slug, since=since + 2).json()['items'] == []
+
+    def test_single_item_changes_are_versioned(self, order):
+        since = order.version
+        item = OrderItem.objects.create(order=order, participant='Kevin', description='Pizza Salami', price='5.60')
+        data = ApiClient().order_changes(order.slug, since=since).json()
+        assert [change['slug'] for change in data['items']] == [item.slug]
+        item.delete()
+        data = ApiClient().order_changes(order.slug, since=data['version']).json()
+        assert (data['items'], data['deleted']) == ([], [item.slug])
+
+    @pytest.mark.parametrize('params', [{}, {'since': 'foo'}])
+    def test_invalid_since(self, order, params):
+        assert ApiClient().order_changes(order.slug, **params).status_code == 400
+
+
+class TestOrderItems:
+    def test_create_several_items(self, participant, order):
+        response = participant.change_items(order.slug, participant='Kevin', create=[
+            {'description': 'Pizza Salami', 'price': '5.60'},
+            {'description': 'Cola', 'price': '2.00', 'amount': 3},
+        ])
+        assert response.status_code == 200
+        data = response.json()
+        assert [item['description'] for item in data['created']] == ['Pizza Salami', 'Cola']
+        assert (data['order']['item_count'], data['order']['total_price']) == (2, '11.60')
+        assert participant.client.session['username'] == 'Kevin'
+
+    def test_update_and_delete_own_items(self, participant, order):
+        created = participant.change_items(order.slug, participant='Kevin', create=[
+            {'description': 'Pizza Salami', 'price': '5.60'},
+            {'description': 'Cola', 'price': '2.00'},
+        ]).json()['created']
+        response = participant.change_items(
+            order.slug,
+            update=[{'slug': created[0]['slug'], 'amount': 2}],
+            delete=[created[1]['slug']],
+        )
+        assert response.status_code == 200
+        assert response.json()['deleted'] == [created[1]['slug']]
+        assert [(item.description, item.amount) for item in order.items.all()] == [('Pizza Salami', 2)]
+        assert Order.objects.get(id=order.id).total_price == Decimal('11.20')
+
+    def test_items_of_others_can_not_be_changed(self, participant, order):
+        created = participant.change_items(order.slug, participant='Kevin', create=[
+            {'description': 'Pizza Salami', 'price': '5.60'},
+        ]).json()['created']
+        response = ApiClient().change_items(order.slug, delete=[created[0]['slug']])
+        assert response.status_code == 403
+        assert order.items.count() == 1
+
+    def test_invalid_item_changes_nothing(self, participant, order):
+        response = participant.change_items(order.slug, participant='Kevin', create=[
+            {'description': 'Pizza Salami', 'price': '5.60'},
+            {'description': 'Cola', 'price': 'free'},
+        ])
+        assert response.status_code == 400
+        assert 'price' in response.json()['errors']
+        assert not order.items.exists()
+
+    def test_duplicate_item(self, participant, order):
+        response = participant.change_items(order.slug, participant='Kevin', create=[
+            {'description': 'Pizza Salami', 'price': '5.60'},
+            {'description': 'Pizza Salami', 'price': '5.60'},
+        ])
+        assert response.status_code == 409
+        assert not order.items.exists()
+
+    def test_order_must_be_preparing(self, participant, order):
+        order.ordering()
+        response = participant.change_items(order.slug, participant='Kevin', create=[
+            {'description': 'Pizza Salami', 'price': '5.60'},
+        ])
+        assert response.status_code == 409
+
+    @pytest.mark.parametrize('data', [{'create': {}}, {'delete': [1]}, {'create': [{'price': '1'}]}])
+    def test_invalid_request(self, participant, order, data):
+        response = participant.change_items(order.slug, participant='Kevin', **data)
+        assert response.status_code == 400
+
+    def test_invalid_json(self, participant, order):
+        response = participant.client.post(
+            reverse('orders:api_order_items', kwargs={'order_slug': order.slug}),
+            data='{', content_type='application/json'
+        )
+        assert response.status_code == 400
+
+    def test_method_not_allowed(self, participant, order):
+        response = participant.client.get(reverse('orders:api_order_items', kwargs={'order_slug': order.slug}))
+        assert response.status_code == 405
+        assert response.json()['allowed'] == 'POST, OPTIONS'
+
+
+class TestOrderState:
+    def test_coordinator_changes_state(self, coordinator, order):
+        response = coordinator.update_state(order.slug, state='ordering')
+        assert response.status_code == 200
+        assert response.json()['state'] == 'ordering'
+        assert Order.objects.get(id=order.id).state == 'ordering'
+
+    def test_participant_can_not_change_state(self, participant, order):
+        response = participant.update_state(order.slug, state='ordering')
+        assert response.status_code == 403
+
+    def test_invalid_transition(self, coordinator, order):
+        response = coordinator.update_state(order.slug, state='delivered')
+        assert response.status_code == 409
+        assert response.json()['order']['state'] == 'preparing'
+
+    def test_cancel_needs_reason(self, coordinator, order):
+        assert coordinator.update_state(order.slug, state='canceled').status_code == 400
+        response = coordinator.update_state(order.slug, state='canceled', reason='Closed')
+        assert response.json()['state'] == 'canceled'
+        assert not coordinator.client.session.get('is_coordinator')
+
+    def test_unknown_state(self, coordinator, order):
+        assert coordinator.update_state(order.slug, state='eaten').status_code == 400
@@ -0,0 +1,244 @@
+# pylint: disable=C0111
+# pylint: disable=W0621
+from decimal import Decimal
+from io import StringIO
+
+import datetime
+import json
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import cache as order_cache
+from ..management.commands import expire_orders as expire_orders_command, seed_orders as seed_orders_command
+from ..models import ArchivedOrder, ItemPopularity, Order, OrderItem
+from ..search import search_orders
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def order():
+    """Return a new, empty Order record, saved to DB."""
+    record = Order(coordinator='Bernd', restaurant_name='Hallo Pizza')
+    record.save()
+    return record
+
+
+@pytest.fixture
+def another_order():
+    """Return a new, empty Order record, saved to DB."""
+    record = Order(coordinator='Bernd', restaurant_name='Pizza Hut')
+    record.save()
+    return record
+
+
+class TestRebuildOrderSummaries:
+    def test_summary_is_rebuilt_from_items_and_history(self, order):
+        order.items.create(participant='Kevin', description='Test1', price=Decimal('7.20'), amount=2)
+        order.items.create(participant='Bernd', description='Test1', price=Decimal('5.00'), amount=1)
+        order.ordering()
+        Order.objects.filter(id=order.id).update(
+            item_count=0, participant_count=0, total_price=Decimal('0'), last_state_change_at=None
+        )
+        call_command('rebuild_order_summaries', stdout=StringIO())
+        stored = Order.objects.get(id=order.id)
+        assert (stored.item_count, stored.participant_count, stored.total_price) == (2, 2, Decimal('19.40'))
+        assert stored.last_state_change_at == order.history.get().created_at
+
+    def test_summary_of_orders_without_items_is_reset(self, order):
+        Order.objects.filter(id=order.id).update(item_count=5, participant_count=3, total_price=Decimal('9.99'))
+        call_command('rebuild_order_summaries', '--batch-size=1', stdout=StringIO())
+        stored = Order.objects.get(id=order.id)
+        assert (stored.item_count, stored.participant_count, stored.total_price) == (0, 0, Decimal('0'))
+
+    def test_changed_orders_get_a_new_version(self, order, another_order):
+        order.items.create(participant='Kevin', description='Test1', price=Decimal('0.10'), amount=3)
+        Order.objects.filter(id=order.id).update(total_price=Decimal('9.99'))
+        order.refresh_from_db()
+        another_order.refresh_from_db()
+        cache.set(order_cache.order_version_key(order.slug), order.version)
+        stdout = StringIO()
+        call_command('rebuild_order_summaries', stdout=stdout)
+        assert 'Rebuilt summary of 2 orders, 1 of them changed.' in stdout.getvalue()
+        stored = Order.objects.get(id=order.id)
+        assert stored.total_price == Decimal('0.30')
+        assert stored.version == order.version + 1
+        assert stored.updated_at > order.updated_at
+        assert cache.get(order_cache.order_version_key(order.slug)) is None
+        unchanged = Order.objects.get(id=another_order.id)
+        assert (unchanged.version, unchanged.updated_at) == (another_order.version, another_order.updated_at)
+
+
+class TestExpireOrders:
+    @staticmethod
+    def create_order(expires_after, created_ago):
+        record = Order(coordinator='Bernd', restaurant_name='Hallo Pizza', preparation_expires_after=expires_after)
+        record.save()
+        created_at = timezone.now() - created_ago
+        Order.objects.filter(id=record.id).update(
+            created_at=created_at,
+            preparation_expires_at=created_at + expires_after if expires_after else None,
+        )
+        return record
+
+    def test_expired_orders_are_switched_to_ordering(self):
+        expired = [
+            self.create_order(datetime.timedelta(minutes=10), datetime.timedelta(minutes=20)) for _ in range(5)
+        ]
+        call_command('expire_orders', '--batch-size=2', stdout=StringIO())
+        for order in expired:
+            assert Order.objects.get(id=order.id).is_ordering is True
+            assert order.history.get().new_state == 'ordering'
+
+    def test_orders_which_are_not_expired_are_kept(self):
+        pending = self.create_order(datetime.timedelta(minutes=30), datetime.timedelta(minutes=20))
+        unlimited = self.create_order(None, datetime.timedelta(days=20))
+        call_command('expire_orders', stdout=StringIO())
+        assert Order.objects.get(id=pending.id).is_preparing is True
+        assert Order.objects.get(id=unlimited.id).is_preparing is True
+
+    def test_orders_in_other_states_are_ignored(self):
+        order = self.create_order(datetime.timedelta(minutes=10), datetime.timedelta(minutes=20))
+        order.cancel(reason='Nope')
+        call_command('expire_orders', stdout=StringIO())
+        assert Order.objects.get(id=order.id).is_canceled is True
+
+    def test_number_of_expired_orders_is_reported(self):
+        self.create_order(datetime.timedelta(minutes=10), datetime.timedelta(minutes=20))
+        stdout = StringIO()
+        call_command('expire_orders', stdout=stdout)
+        assert 'Moved 1 expired orders' in stdout.getvalue()
+
+    def test_loop_keeps_going_after_database_errors(self, monkeypatch):
+        passes = iter([OperationalError('database is locked'), 1, KeyboardInterrupt()])
+
+        def expire_orders(current_time, batch_size):  # pylint: disable=W0613
+            result = next(passes)
+            if isinstance(result, BaseException):
+                raise result
+            return result
+
+        monkeypatch.setattr(expire_orders_command.Command, 'expire_orders', staticmethod(expire_orders))
+        monkeypatch.setattr(expire_orders_command.time, 'sleep', lambda seconds: None)
+        stdout, stderr = StringIO(), StringIO()
+        call_command('expire_orders', '--loop', stdout=stdout, stderr=stderr)
+        assert 'Could not expire orders, trying again: database is locked' in stderr.getvalue()
+        assert 'Moved 1 expired orders' in stdout.getvalue()
+
+
+class TestArchiveOrders:
+    @staticmethod
+    def create_order(state, updated_ago):
+        record = Order(coordinator='Bernd', restaurant_name='Hallo Pizza')
+        record.save()
+        record.items.create(participant='Kevin', description='Salami', price=Decimal('7.20'), amount=2)
+        record.items.create(participant='Bernd', description='Tonno', price=Decimal('5.00'), amount=1)
+        if state == 'canceled':
+            record.cancel(reason='Nope')
+        elif state == 'delivered':
+            record.ordering()
+            record.ordered()
+            record.delivered()
+        Order.objects.filter(id=record.id).update(updated_at=timezone.now() - updated_ago)
+        return record
+
+    def test_only_old_finished_orders_are_archived(self):
+        delivered = self.create_order('delivered', datetime.timedelta(days=40))
+        canceled = self.create_order('canceled', datetime.timedelta(days=40))
+        recent = self.create_order('delivered', datetime.timedelta(days=5))
+        active = self.create_order('preparing', datetime.timedelta(days=40))
+        stdout = StringIO()
+        call_command('archive_orders', '--older-than=30', '--batch-size=1', stdout=stdout)
+        assert 'Archived 2 orders' in stdout.getvalue()
+        assert set(ArchivedOrder.objects.values_list('id', flat=True)) == {delivered.id, canceled.id}
+        assert set(Order.objects.values_list('id', flat=True)) == {recent.id, active.id}
+        assert not OrderItem.objects.filter(order_id__in=[delivered.id, canceled.id]).exists()
+
+    def test_archived_order_is_shown(self, client):
+        order = self.create_order('delivered', datetime.timedelta(days=40))
+        call_command('archive_orders', '--older-than=30', stdout=StringIO())
+        response = client.get(reverse('orders:view_order', kwargs={'order_slug': order.slug}))
+        assert response.status_code == 200
+        shown = response.context['order']
+        assert (shown.id, shown.coordinator, shown.is_delivered) == (order.id, 'Bernd', True)
+        assert [participant['name'] for participant in response.context['participants']] == ['Bernd', 'Kevin']
+        assert response.context['participants'][1]['total'] == Decimal('14.40')
+        assert response.context['order_total'] == Decimal('19.40')
+        assert [change.new_state for change in shown.history.all()] == ['ordering', 'ordered', 'delivered']
+
+    def test_archived_orders_are_exported(self, tmp_path):
+        order = self.create_order('canceled', datetime.timedelta(days=40))
+        export = tmp_path / 'archive.jsonl'
+        call_command('archive_orders', '--older-than=30', f'--export={export}', stdout=StringIO())
+        lines = export.read_text(encoding='utf-8').splitlines()
+        assert len(lines) == 1
+        data = json.loads(lines[0])
+        assert (data['slug'], data['state'], data['history'][0]['reason']) == (order.slug, 'canceled', 'Nope')
+        assert sorted(item['description'] for item in data['items']) == ['Salami', 'Tonno']
+
+
+class TestSeedOrders:
+    @staticmethod
+    def seed(*args):
+        call_command('seed_orders', *args, stdout=StringIO())
+        return list(Order.objects.order_by('id').prefetch_related('items', 'history'))
+
+    def test_orders_are_consistent(self):
+        orders = self.seed('200', '--batch-size=30')
+        assert len(orders) == 200
+        for order in orders:
+            items = list(order.items.all())
+            history = list(order.history.all())
+            assert order.item_count == len(items)
+            assert order.participant_count == len({item.participant for item in items})
+            assert order.total_price == sum(item.price * item.amount for item in items)
+            assert order.version == max([item.version for item in items] + [change.version for change in history])
+            assert order.state == (history[-1].new_state if history else 'preparing')
+            assert order.created_at <= order.updated_at <= timezone.now()
+        states = {order.state for order in orders}
+        assert {'delivered', 'canceled'} <= states
+
+    def test_orders_keep_generated_creation_times_without_affecting_other_orders(self, monkeypatch):
+        generate = seed_orders_command.OrderGenerator.generate
+        others = []
+
+        def generate_next_to_other_orders(generator, number):
+            others.append(Order.objects.create(coordinator='Bernd', restaurant_name='Hallo Pizza'))
+            return generate(generator, number)
+
+        monkeypatch.setattr(seed_orders_command.OrderGenerator, 'generate', generate_next_to_other_orders)
+        started = timezone.now()
+        orders = self.seed('20', '--batch-size=5', '--days=100')
+        generated = [order for order in orders if order.id not in {other.id for other in others}]
+        assert min(order.created_at for order in generated) < started - datetime.timedelta(days=90)
+        assert all(Order.objects.get(id=other.id).created_at >= started for other in others)
+
+    def test_same_seed_creates_same_orders(self):
+        def contents(orders):
+            return [
+                (order.restaurant_name, order.coordinator, order.state, order.total_price,
+                 [(item.participant, item.description) for item in order.items.all()])
+                for order in orders
+            ]
+        first = contents(self.seed('50', '--seed=7'))
+        Order.objects.all().delete()
+        assert contents(self.seed('50', '--seed=7')) == first
+        Order.objects.all().delete()
+        assert contents(self.seed('50', '--seed=8')) != first
+
+    def test_orders_are_searchable_and_suggested(self):
+        order = self.seed('20')[0]
+        item = order.items.first()
+        orders, _ = search_orders(f'{order.restaurant_name} {item.description}', 1, 50)
+        assert order in orders
+        popularity = ItemPopularity.objects.get(
+            restaurant_key=order.restaurant_name.lower(), description=item.description
+        )
+        assert popularity.popularity == OrderItem.objects.filter(
+            description=item.description, order__restaurant_name=order.restaurant_name
+        ).count()
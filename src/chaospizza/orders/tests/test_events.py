@@ -0,0 +1,100 @@
+# pylint: disable=C0111
+import json
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from .. import events
+from ..events import OrderEventBroker
+from ..models import Order
+
+
+@pytest.fixture
+def order():
+    return Order.objects.create(coordinator='Bernd', restaurant_name='Hallo Pizza')
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = OrderEventBroker(background=False)
+    monkeypatch.setattr(events, 'broker', broker)
+    return broker
+
+
+def parse_event(chunk):
+    return dict(line.split(': ', 1) for line in chunk.strip().split('\n') if not line.startswith(':'))
+
+
+@pytest.mark.django_db
+class TestOrderEventBroker:
+    def test_poll_delivers_changed_orders(self, broker, order):
+        async def scenario():
+            subscription = broker.subscribe(order.slug)
+            await sync_to_async(broker.poll_once)()
+            first = await subscription.get(1)
+            await sync_to_async(broker.poll_once)()
+            unchanged = await subscription.get(0.01)
+            await sync_to_async(order.ordering)()
+            await sync_to_async(broker.poll_once)()
+            changed = await subscription.get(1)
+            return first, unchanged, changed
+
+        first, unchanged, changed = async_to_sync(scenario)()
+        assert first['version'] == order.version - 1
+        assert unchanged is None
+        assert changed == {'slug': order.slug, 'version': order.version, 'state': 'ordering', 'event': 'order'}
+
+    def test_unsubscribe_stops_polling(self, broker, order):
+        async def scenario():
+            subscription = broker.subscribe(order.slug)
+            broker.unsubscribe(subscription)
+            await sync_to_async(broker.poll_once)()
+            return await subscription.get(0.01)
+
+        assert async_to_sync(scenario)() is None
+        assert not broker.subscriptions
+
+
+@pytest.mark.django_db
+class TestOrderEvents:
+    def test_wsgi_sends_current_version_only(self, order):
+        response = Client().get(reverse('orders:order_events', kwargs={'order_slug': order.slug}))
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'text/event-stream'
+        assert response.content.decode().startswith('retry: ')
+        event = parse_event(response.content.decode().split('\n\n', 1)[1])
+        assert event['id'] == str(order.version)
+        assert event['event'] == 'order'
+        assert json.loads(event['data']) == {'version': order.version, 'state': 'preparing'}
+
+    def test_known_version_is_not_sent_again(self, order):
+        response = Client().get(
+            reverse('orders:order_events', kwargs={'order_slug': order.slug}),
+            HTTP_LAST_EVENT_ID=str(order.version)
+        )
+        assert response.content.decode() == 'retry: 3000\n\n'
+
+    def test_unknown_order(self, broker):
+        response = Client().get(reverse('orders:order_events', kwargs={'order_slug': 'foo'}))
+        assert response.status_code == 404
+
+    def test_asgi_streams_changes(self, broker, order):
+        async def scenario():
+            response = await AsyncClient().get(reverse('orders:order_events', kwargs={'order_slug': order.slug}))
+            stream = aiter(response.streaming_content)
+            first = (await anext(stream)).decode()
+            await sync_to_async(order.ordering)()
+            await sync_to_async(broker.poll_once)()
+            changed = (await anext(stream)).decode()
+            await stream.aclose()
+            return first, changed
+
+        first, changed = async_to_sync(scenario)()
+        assert parse_event(first.split('\n\n', 1)[1])['id'] == str(order.version - 1)
+        event = parse_event(changed)
+        assert event['id'] == str(order.version)
+        assert json.loads(event['data']) == {'version': order.version, 'state': 'ordering'}
+        assert not broker.subscriptions
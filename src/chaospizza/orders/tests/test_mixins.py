@@ -2,7 +2,7 @@
 # pylint: disable=R0903
 import pytest
 from ..models import Order
-from ..mixins import UserSessionMixin
+from ..mixins import SESSION_ORDER_LIMIT, UserSessionMixin
 
 
 class DummyRequest:
@@ -62,14 +62,53 @@ class TestUserSessionMixin:
         view.remove_order_from_session()
         assert view.user_can_edit_order(order1.id) is False
 
+    @pytest.mark.django_db
     def test_user_is_allowed_to_edit_own_order_items(self, view):
         view.add_order_item_to_session(1, 1)
         view.add_order_item_to_session(2, 4)
         assert view.user_can_edit_order_item(1, 1) is True
         assert view.user_can_edit_order_item(2, 4) is True
 
+    @pytest.mark.django_db
     def test_user_is_not_allowed_to_edit_other_order_items(self, view):
         view.add_order_item_to_session(1, 10)
         view.add_order_item_to_session(2, 10)
         assert view.user_can_edit_order_item(1, 1) is False
         assert view.user_can_edit_order_item(2, 4) is False
+
+    def test_checking_order_items_does_not_change_the_session(self, view):
+        view.add_order_item_to_session(1, 10)
+        session = dict(view.request.session)
+        assert view.user_can_edit_order_item(2, 4) is False
+        assert view.request.session == session
+
+    def test_order_items_are_stored_once(self, view):
+        view.add_order_items_to_session('1', ['1', '2'])
+        view.add_order_items_to_session('1', ['2', '3', '3'])
+        assert view.request.session['order_ids'] == {'1': ['1', '2', '3']}
+
+    @pytest.mark.django_db
+    def test_finished_orders_are_dropped(self, view):
+        finished = Order.objects.create(coordinator='Hugo', restaurant_name='Hallo Pizza')
+        active = Order.objects.create(coordinator='Detlef', restaurant_name='Pizza Hut')
+        view.add_order_item_to_session(str(finished.id), '1')
+        view.add_order_item_to_session(str(active.id), '2')
+        finished.cancel(reason='Nope')
+        view.add_order_item_to_session('0', '3')
+        assert view.request.session['order_ids'] == {str(active.id): ['2'], '0': ['3']}
+
+    @pytest.mark.django_db
+    def test_only_recently_joined_orders_are_kept(self, view):
+        for order_id in range(SESSION_ORDER_LIMIT + 5):
+            view.add_order_item_to_session(str(order_id), '1')
+        view.add_order_item_to_session('5', '2')
+        order_ids = view.request.session['order_ids']
+        assert len(order_ids) == SESSION_ORDER_LIMIT
+        assert list(order_ids)[-1] == '5'
+        assert '4' not in order_ids and str(SESSION_ORDER_LIMIT + 4) in order_ids
+
+    def test_items_of_coordinated_order_are_dropped_after_disable(self, view, order1):
+        view.add_order_to_session(order1)
+        view.add_order_item_to_session(str(order1.id), '10')
+        view.remove_order_from_session()
+        assert view.request.session == {'order_ids': {}}
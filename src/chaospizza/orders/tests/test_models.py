@@ -4,9 +4,11 @@
 from decimal import Decimal
 
 import datetime
+import threading
+import time
 import pytest
 from django.core.exceptions import ValidationError
-from django.db import transaction, IntegrityError
+from django.db import connection, transaction, IntegrityError, OperationalError
 from django.utils import timezone
 
 from ..models import Order, OrderItem
@@ -93,6 +95,20 @@ class TestOrderPreparationExpiry:
         with pytest.raises(ValueError):
             record.save()
 
+    def test_preparation_expiry_is_validated(self):
+        record = Order(
+            coordinator='Bernd',
+            restaurant_name='Hallo Pizza',
+            preparation_expires_after=datetime.timedelta(0)
+        )
+        with pytest.raises(ValidationError):
+            record.full_clean(exclude=['slug'])
+
+    def test_preparation_expiry_time_is_stored(self):
+        order = self.create_order(datetime.timedelta(minutes=10))
+        assert order.preparation_expires_at - order.created_at < datetime.timedelta(minutes=10, seconds=1)
+        assert order.preparation_expires_at > order.created_at
+
     def test_order_determines_if_not_expired(self):
         expire_after = datetime.timedelta(minutes=10)
         order = self.create_order(expire_after)
@@ -142,6 +158,129 @@ class TestOrderStateSwitching:
         assert len(state_changes) == 3
 
 
+class TestOrderStateCompareAndSwap:
+    def test_state_change_reports_success(self, order):
+        assert order.ordering() is True
+
+    def test_stale_instance_loses_state_change(self, order):
+        stale = Order.objects.get(id=order.id)
+        assert order.ordering() is True
+        assert stale.cancel(reason='Too slow') is False
+        assert stale.is_ordering is True
+        assert Order.objects.get(id=order.id).is_ordering is True
+        assert order.history.count() == 1
+
+    def test_state_change_does_not_overwrite_other_columns(self, order):
+        stale = Order.objects.get(id=order.id)
+        order.items.create(participant='Kevin', description='Test', price=Decimal('7.20'), amount=1)
+        stale.ordering()
+        assert Order.objects.get(id=order.id).item_count == 1
+
+    def test_saving_stale_instance_keeps_summary(self, order):
+        stale = Order.objects.get(id=order.id)
+        order.items.create(participant='Kevin', description='Test', price=Decimal('7.20'), amount=1)
+        stale.restaurant_name = 'Pizza Hut'
+        stale.save()
+        stored = Order.objects.get(id=order.id)
+        assert (stored.restaurant_name, stored.item_count, stored.total_price) == ('Pizza Hut', 1, Decimal('7.20'))
+        assert (stale.item_count, stale.total_price) == (1, Decimal('7.20'))
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConcurrentStateChanges:
+    """Fire many concurrent state changes at the same order, exactly one of them may win."""
+
+    @staticmethod
+    def retry_when_locked(func):
+        """
+        Call func until SQLite stops complaining about locked tables.
+
+        SQLite's shared in-memory test database raises instead of waiting for concurrent writers, unlike PostgreSQL.
+        """
+        for _ in range(100):
+            try:
+                return func()
+            except OperationalError as err:
+                if 'locked' not in str(err):
+                    raise
+                time.sleep(0.01)
+        raise AssertionError('database stayed locked')
+
+    @classmethod
+    def run_concurrently(cls, order_id, transitions):
+        barrier = threading.Barrier(len(transitions))
+        results = [None] * len(transitions)
+        errors = []
+
+        def run(index, transition):
+            try:
+                record = cls.retry_when_locked(lambda: Order.objects.get(id=order_id))
+                barrier.wait()
+                results[index] = cls.retry_when_locked(lambda: transition(record))
+            except Exception as err:  # pylint: disable=W0703
+                errors.append(err)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=item) for item in enumerate(transitions)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        return results
+
+    def test_only_one_of_many_identical_state_changes_wins(self):
+        order = Order.objects.create(coordinator='Bernd', restaurant_name='Hallo Pizza')
+        results = self.run_concurrently(order.id, [Order.ordering] * 8)
+        assert results.count(True) == 1
+        assert results.count(False) == 7
+        assert order.history.count() == 1
+        assert Order.objects.get(id=order.id).is_ordering is True
+
+    def test_only_one_of_many_competing_state_changes_wins(self):
+        order = Order.objects.create(coordinator='Bernd', restaurant_name='Hallo Pizza')
+        results = self.run_concurrently(
+            order.id,
+            [Order.ordering, lambda record: record.cancel(reason='Nope')] * 4
+        )
+        assert results.count(True) == 1
+        history = order.history.get()
+        assert history.old_state == 'preparing'
+        assert Order.objects.get(id=order.id).state == history.new_state
+
+    @staticmethod
+    def unless_rejected(change):
+        """Return a function calling change, which returns False when the order is no longer preparing."""
+        def run(record):
+            try:
+                change(record)
+            except ValueError:
+                return False
+            return True
+        return run
+
+    def test_item_changes_racing_a_state_change_never_follow_it(self):
+        order = Order.objects.create(coordinator='Bernd', restaurant_name='Hallo Pizza')
+        for number in range(4):
+            OrderItem.objects.create(order=order, participant=f'Old {number}', description='Pizza', price=Decimal('5'))
+        changes = [Order.ordering]
+        for number in range(4):
+            changes.append(self.unless_rejected(lambda record, number=number: OrderItem(
+                order=record, participant=f'New {number}', description='Pizza', price=Decimal('5')
+            ).save()))
+            changes.append(self.unless_rejected(
+                lambda record, number=number: record.items.get(participant=f'Old {number}').delete()
+            ))
+        self.run_concurrently(order.id, changes)
+        history = order.history.get()
+        assert history.new_state == 'ordering'
+        assert all(item.version < history.version for item in order.items.all())
+        assert all(deleted.version < history.version for deleted in order.deleted_items.all())
+        order.refresh_from_db()
+        assert order.item_count == order.items.count()
+
+
 class TestOrderCancellation:
     def test_order_cancellation_requires_reason(self, order):
         with pytest.raises(ValueError):
@@ -252,6 +391,39 @@ class TestOrderItemCreation:
         assert order.items.count() == 1
 
 
+class TestOrderSummary:
+    def test_new_order_has_empty_summary(self, order):
+        assert order.item_count == 0
+        assert order.participant_count == 0
+        assert order.total_price == Decimal('0')
+        assert order.last_state_change_at is None
+
+    def test_summary_is_updated_when_items_are_added(self, order):
+        order.items.create(participant='Kevin', description='Test1', price=Decimal('7.20'), amount=1)
+        order.items.create(participant='Kevin', description='Test2', price=Decimal('1.50'), amount=2)
+        order.items.create(participant='Bernd', description='Test1', price=Decimal('5.00'), amount=1)
+        stored = Order.objects.get(id=order.id)
+        assert (stored.item_count, stored.participant_count, stored.total_price) == (3, 2, Decimal('15.20'))
+        assert (order.item_count, order.participant_count, order.total_price) == (3, 2, Decimal('15.20'))
+
+    def test_summary_is_updated_when_items_are_changed(self, order):
+        item = order.items.create(participant='Kevin', description='Test1', price=Decimal('7.20'), amount=1)
+        item.amount = 3
+        item.save()
+        assert Order.objects.get(id=order.id).total_price == Decimal('21.60')
+
+    def test_summary_is_updated_when_items_are_deleted(self, order):
+        order.items.create(participant='Kevin', description='Test1', price=Decimal('7.20'), amount=1)
+        item = order.items.create(participant='Bernd', description='Test1', price=Decimal('5.00'), amount=1)
+        item.delete()
+        stored = Order.objects.get(id=order.id)
+        assert (stored.item_count, stored.participant_count, stored.total_price) == (1, 1, Decimal('7.20'))
+
+    def test_last_state_change_is_stored(self, order):
+        order.ordering()
+        assert Order.objects.get(id=order.id).last_state_change_at == order.history.get().created_at
+
+
 class TestItemPriceCalculation:
     def test_order_total_price_sums_all_orderitem_total_prices(self, order):
         order.items.create(participant='Kevin', description='Test1', price=Decimal('7.21'), amount=1)
@@ -260,6 +432,10 @@ class TestItemPriceCalculation:
         order.items.create(participant='Kevin', description='Test4', price=Decimal('7.24'), amount=2)
         assert order.total_price == Decimal('36.14')
 
+    def test_order_total_price_is_stored(self, order):
+        order.items.create(participant='Kevin', description='Test1', price=Decimal('7.21'), amount=3)
+        assert Order.objects.get(id=order.id).total_price == Decimal('21.63')
+
     def test_orderitem_total_price_multiplies_price_and_amount(self):
         item = OrderItem(price=Decimal('7.2'), amount=3)
         assert item.total_price == Decimal('21.6')
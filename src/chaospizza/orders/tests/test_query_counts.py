@@ -0,0 +1,137 @@
+# pylint: disable=C0111
+"""
+Query-count budgets of the order views.
+
+Every view is requested against a small and a large data set, with an empty cache so the pages are rendered from the
+database. The number of queries must not depend on the number of orders or items, and must stay within the budget
+recorded in QUERY_BUDGETS. When a change adds a query on purpose, raise its budget in the same commit.
+"""
+from decimal import Decimal
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Order, OrderItem
+
+pytestmark = pytest.mark.django_db
+
+# Number of orders besides the measured one, and number of items added by other participants to each order.
+SMALL = (1, 1)
+LARGE = (15, 25)
+
+# Counted with database sessions, including the savepoints of atomic blocks within the test transaction. The pg_notify()
+# queries which announce changes on PostgreSQL are not counted, see events.publish_order_change(), so the budgets hold
+# on every database.
+QUERY_BUDGETS = {
+    'list_orders': 4,
+    'view_order': 4,
+    'create_orderitem_form': 2,
+    'create_orderitem': 15,
+    'update_orderitem_form': 3,
+    'update_orderitem': 14,
+    'delete_orderitem': 13,
+    'update_state': 7,
+    'cancel_order': 10,
+}
+
+
+def add_items(order, participant_count):
+    """Add one item of each of participant_count other participants to the given order."""
+    order.change_items(create=[
+        OrderItem(participant=f'Participant {number}', description='Pizza Tonno', price=Decimal('6.50'), amount=1)
+        for number in range(participant_count)
+    ])
+
+
+class Scenario:
+    """A coordinator client with one own order and item, surrounded by orders and items of other users."""
+
+    def __init__(self, size):
+        order_count, item_count = size
+        self.client = Client()
+        self.client.post(reverse('orders:create_order'), data={'coordinator': 'Bernd', 'restaurant_name': 'Pizza'})
+        self.order = Order.objects.get(coordinator='Bernd')
+        self.client.post(reverse('orders:create_orderitem', kwargs={'order_slug': self.order.slug}), data={
+            'participant': 'Bernd',
+            'items-TOTAL_FORMS': '1',
+            'items-INITIAL_FORMS': '0',
+            'items-0-description': 'Pizza Salami',
+            'items-0-price': '5.60',
+            'items-0-amount': '1',
+        })
+        self.item = self.order.items.get()
+        add_items(self.order, item_count)
+        for number in range(order_count):
+            other = Order.objects.create(coordinator=f'Coordinator {number}', restaurant_name=f'Restaurant {number}')
+            add_items(other, item_count)
+
+    def item_url(self, name):
+        return reverse(name, kwargs={'order_slug': self.order.slug, 'item_slug': self.item.slug})
+
+    def request(self, view):
+        order_kwargs = {'order_slug': self.order.slug}
+        item_data = {'participant': 'Bernd', 'description': 'Pizza Funghi', 'price': '6.10', 'amount': '2'}
+        return {
+            'list_orders': lambda: self.client.get(reverse('orders:list_orders')),
+            'view_order': lambda: self.client.get(self.order.get_absolute_url()),
+            'create_orderitem_form': lambda: self.client.get(reverse('orders:create_orderitem', kwargs=order_kwargs)),
+            'create_orderitem': lambda: self.client.post(reverse('orders:create_orderitem', kwargs=order_kwargs), data={
+                'participant': 'Bernd',
+                'items-TOTAL_FORMS': '1',
+                'items-INITIAL_FORMS': '0',
+                'items-0-description': 'Pizza Funghi',
+                'items-0-price': '6.10',
+                'items-0-amount': '1',
+            }),
+            'update_orderitem_form': lambda: self.client.get(self.item_url('orders:update_orderitem')),
+            'update_orderitem': lambda: self.client.post(self.item_url('orders:update_orderitem'), data=item_data),
+            'delete_orderitem': lambda: self.client.post(self.item_url('orders:delete_orderitem')),
+            'update_state': lambda: self.client.post(
+                reverse('orders:update_state', kwargs=order_kwargs), data={'new_state': 'ordering'}
+            ),
+            'cancel_order': lambda: self.client.post(
+                reverse('orders:cancel_order', kwargs=order_kwargs), data={'reason': 'Closed'}
+            ),
+        }[view]()
+
+    def assert_succeeded(self, view, response):
+        """Assert that the view did its job, so a failing write does not pass as a view running fewer queries."""
+        if view in ('list_orders', 'view_order', 'create_orderitem_form', 'update_orderitem_form'):
+            assert response.status_code == 200
+            return
+        assert response.status_code == 302
+        assert response['Location'] == self.order.get_absolute_url()
+        order = Order.objects.get(id=self.order.id)
+        if view == 'create_orderitem':
+            assert order.items.filter(participant='Bernd', description='Pizza Funghi').exists()
+        elif view == 'update_orderitem':
+            item = order.items.get(id=self.item.id)
+            assert (item.description, item.price, item.amount) == ('Pizza Funghi', Decimal('6.10'), 2)
+        elif view == 'delete_orderitem':
+            assert not order.items.filter(id=self.item.id).exists()
+        elif view == 'update_state':
+            assert order.state == 'ordering'
+        elif view == 'cancel_order':
+            assert order.state == 'canceled'
+
+    def count_queries(self, view):
+        """Request the given view with an empty cache and return the number of queries it ran."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.request(view)
+        self.assert_succeeded(view, response)
+        return len([query for query in context.captured_queries if 'pg_notify(' not in query['sql']])
+
+
+class TestQueryCounts:
+    @pytest.mark.parametrize('view', sorted(QUERY_BUDGETS))
+    def test_queries_do_not_grow_with_orders_and_items(self, view):
+        small = Scenario(SMALL).count_queries(view)
+        Order.objects.all().delete()
+        large = Scenario(LARGE).count_queries(view)
+        assert large == small, f'{view} ran {small} queries for {SMALL}, but {large} for {LARGE} orders and items'
+        assert large <= QUERY_BUDGETS[view], f'{view} ran {large} queries, budget is {QUERY_BUDGETS[view]}'
@@ -0,0 +1,77 @@
+# pylint: disable=C0111
+# pylint: disable=W0621
+from decimal import Decimal
+
+import pytest
+from django.test import Client
+from django.urls import reverse
+
+from ..models import Order, OrderItem, OrderSearchDocument
+from ..search import search_orders
+
+
+pytestmark = pytest.mark.django_db
+
+
+def create_order(coordinator, restaurant_name, *descriptions):
+    order = Order.objects.create(coordinator=coordinator, restaurant_name=restaurant_name)
+    if descriptions:
+        order.add_items([
+            OrderItem(participant=coordinator, description=description, price=Decimal('5.60'))
+            for description in descriptions
+        ])
+    return order
+
+
+def search(text, page=1, page_size=10):
+    orders, has_next = search_orders(text, page, page_size)
+    return [order.restaurant_name for order in orders], has_next
+
+
+class TestSearchOrders:
+    def test_document_is_maintained(self):
+        order = create_order('Bernd', 'Thai Garden', 'Tom Kha', 'Pad Thai')
+        assert OrderSearchDocument.objects.get(order=order).text == '\n'.join(
+            ['Thai Garden', 'Bernd', order.created_at.strftime('%B %Y'), 'Pad Thai', 'Tom Kha']
+        )
+        order.coordinator = 'Kevin'
+        order.save()
+        order.items.filter(description='Tom Kha').get().delete()
+        assert OrderSearchDocument.objects.get(order=order).text.split('\n')[1::2] == ['Kevin', 'Pad Thai']
+
+    def test_matches_restaurant_coordinator_items_and_month(self):
+        thai = create_order('Bernd', 'Thai Garden', 'Pad Thai')
+        create_order('Kevin', 'Hallo Pizza', 'Pizza Salami')
+        assert search('thai') == (['Thai Garden'], False)
+        assert search('kev') == (['Hallo Pizza'], False)
+        assert search('salami') == (['Hallo Pizza'], False)
+        assert search(f'thai {thai.created_at:%B}') == (['Thai Garden'], False)
+        assert search('thai salami') == ([], False)
+        assert search('"*') == ([], False)
+
+    def test_ranking_and_pagination(self):
+        create_order('Bernd', 'Pizza Hut')
+        create_order('Kevin', 'Hallo Pizza', 'Pizza Salami', 'Pizza Funghi', 'Pizzabrötchen')
+        create_order('Lisa', 'Asia', 'Fried Rice')
+        assert search('pizza') == (['Hallo Pizza', 'Pizza Hut'], False)
+        assert search('pizza', page=1, page_size=1) == (['Hallo Pizza'], True)
+        assert search('pizza', page=2, page_size=1) == (['Pizza Hut'], False)
+
+    def test_deleted_orders_are_not_found(self):
+        create_order('Bernd', 'Thai Garden').delete()
+        assert search('thai') == ([], False)
+
+
+class TestSearchViews:
+    def test_search_page(self):
+        create_order('Bernd', 'Thai Garden')
+        response = Client().get(reverse('orders:search_orders'), {'q': 'thai'})
+        assert [order.restaurant_name for order in response.context['order_list']] == ['Thai Garden']
+        assert Client().get(reverse('orders:search_orders'), {'q': 'thai', 'page': '0'}).status_code == 404
+
+    def test_api(self):
+        create_order('Bernd', 'Thai Garden')
+        response = Client().get(reverse('orders:api_search_orders'), {'q': 'thai'})
+        assert [order['restaurant_name'] for order in response.json()['orders']] == ['Thai Garden']
+        assert response.json()['next_page'] is None
+        assert Client().get(reverse('orders:api_search_orders')).status_code == 400
@@ -0,0 +1,75 @@
+# pylint: disable=C0111
+# pylint: disable=W0621
+from decimal import Decimal
+
+import pytest
+from django.test import Client
+from django.urls import reverse
+
+from ..models import Order, OrderItem, ItemPopularity
+from ..suggestions import suggest, restaurant_key
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def order():
+    return Order.objects.create(coordinator='Bernd', restaurant_name='Hallo Pizza')
+
+
+def add_items(order, participant, *descriptions):
+    return order.add_items([
+        OrderItem(participant=participant, description=description, price=Decimal('5.60'))
+        for description in descriptions
+    ])
+
+
+def popularity():
+    return {item.description: item.popularity for item in ItemPopularity.objects.all()}
+
+
+class TestPopularity:
+    def test_restaurant_key(self):
+        assert restaurant_key('  Hallo   PIZZA ') == 'hallo pizza'
+
+    def test_items_are_counted(self, order):
+        add_items(order, 'Bernd', 'Pizza Salami', 'Cola')
+        add_items(order, 'Kevin', 'Pizza Salami')
+        OrderItem.objects.create(order=order, participant='Lisa', description='Cola', price=Decimal('2.50'))
+        assert popularity() == {'Pizza Salami': 2, 'Cola': 2}
+        assert ItemPopularity.objects.get(description='Cola').last_price == Decimal('2.50')
+
+    def test_changed_and_deleted_items_are_counted(self, order):
+        salami, cola = add_items(order, 'Bernd', 'Pizza Salami', 'Cola')
+        salami.description = 'Pizza Tonno'
+        order.change_items(update=[salami], delete=[cola])
+        assert popularity() == {'Pizza Salami': 0, 'Pizza Tonno': 1, 'Cola': 0}
+        item = order.items.get()
+        item.description = 'Pizza Salami'
+        item.save()
+        item.delete()
+        assert popularity() == {'Pizza Salami': 0, 'Pizza Tonno': 0, 'Cola': 0}
+
+
+class TestSuggest:
+    def test_most_popular_matches_first(self, order):
+        add_items(order, 'Bernd', 'Pizza Salami', 'Pizza Funghi', 'Salat')
+        add_items(order, 'Kevin', 'Pizza Funghi')
+        other = Order.objects.create(coordinator='Lisa', restaurant_name='Pizza Hut')
+        add_items(other, 'Lisa', 'Pizza Hawaii')
+        assert [item['description'] for item in suggest('hallo pizza', 'piz')] == ['Pizza Funghi', 'Pizza Salami']
+        assert [item['description'] for item in suggest('Hallo Pizza', 'sal')] == ['Pizza Salami', 'Salat']
+        assert [item['description'] for item in suggest('Hallo Pizza', 'pi sal')] == ['Pizza Salami']
+        assert len(suggest('Hallo Pizza', '')) == 3
+
+    @pytest.mark.parametrize('text', ['"', '-', 'pizza"*', 'AND OR NOT'])
+    def test_special_characters(self, order, text):
+        add_items(order, 'Bernd', 'Pizza Salami')
+        assert isinstance(suggest('Hallo Pizza', text), list)
+
+    def test_api(self, order):
+        add_items(order, 'Bernd', 'Pizza Salami')
+        response = Client().get(reverse('orders:api_item_suggestions', kwargs={'order_slug': order.slug}), {'q': 'sa'})
+        assert response.json() == {'suggestions': [{'description': 'Pizza Salami', 'price': '5.60'}]}
+        assert 'max-age=60' in response['Cache-Control']
@@ -11,10 +11,24 @@ Thus, all tests defined here only test the interface of the view layer (URLs + p
 output), but not the template rendering itself.
 """
 from decimal import Decimal
+import datetime
 import pytest
 
+from django.core.cache import cache
+from django.db import connection
 from django.urls import reverse
-from django.test import Client
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ..models import Order
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache, the database is rolled back after each test but the cache is not."""
+    cache.clear()
 
 
 class OrderClient:  # noqa
@@ -22,10 +36,11 @@ class OrderClient:  # noqa
     def __init__(self, client):
         self.client = client
 
-    def list_orders(self):
-        return self.client.get(reverse('orders:list_orders'))
+    def list_orders(self, **params):
+        return self.client.get(reverse('orders:list_orders'), data=params)
 
-    def announce_order(self, coordinator=None, restaurant_name=None, restaurant_url=None):
+    def announce_order(self, coordinator=None, restaurant_name=None, restaurant_url=None,
+                       preparation_expires_after=None):
         if not coordinator and not restaurant_name:
             return self.client.get(reverse('orders:create_order'))
         data = {
@@ -34,6 +49,8 @@ class OrderClient:  # noqa
         }
         if restaurant_url:
             data['restaurant_url'] = restaurant_url
+        if preparation_expires_after:
+            data['preparation_expires_after'] = preparation_expires_after
         return self.client.post(
             reverse('orders:create_order'),
             data=data,
@@ -58,8 +75,22 @@ class OrderClient:  # noqa
         url = reverse('orders:create_orderitem', kwargs={'order_slug': order_slug})
         if not data:
             return self.client.get(url)
+        item = {key: value for key, value in data.items() if key != 'participant'}
+        return self.add_order_items(order_slug, data['participant'], [item])
+
+    def add_order_items(self, order_slug, participant, items):
+        data = {
+            'participant': participant,
+            'items-TOTAL_FORMS': str(len(items)),
+            'items-INITIAL_FORMS': '0',
+            'items-MIN_NUM_FORMS': '1',
+            'items-MAX_NUM_FORMS': '1000',
+        }
+        for index, item in enumerate(items):
+            for key, value in item.items():
+                data[f'items-{index}-{key}'] = value
         return self.client.post(
-            url,
+            reverse('orders:create_orderitem', kwargs={'order_slug': order_slug}),
             data=data,
             follow=True
         )
@@ -107,6 +138,16 @@ class TestOrderAnnouncement:
         assert user['is_coordinator'] is True
         assert user['coordinated_order_slug'] == order.slug
 
+    def test_new_user_can_announce_order_with_preparation_expiry(self, client):
+        view_order_response = client.announce_order('Bernd', 'Hallo Pizza', preparation_expires_after='00:30:00')
+        order = view_order_response.context['order']
+        assert order.preparation_expires_after == datetime.timedelta(minutes=30)
+        assert order.preparation_expires_at is not None
+
+    def test_preparation_expiry_must_be_positive(self, client):
+        response = client.announce_order('Bernd', 'Hallo Pizza', preparation_expires_after='-00:30:00')
+        assert 'preparation_expires_after' in response.context['form'].errors
+
     def test_order_is_listed_after_announcement(self, client):
         client.announce_order('Bernd', 'Hallo Pizza', 'https://www.hallopizza.de/')
 
@@ -144,6 +185,431 @@ class TestOrderAnnouncement:
         assert second_announce_response.context['form'].initial['coordinator'] == 'Bernd'
 
 
+@pytest.mark.django_db
+class TestOrderList:
+    @pytest.fixture
+    def client(self):
+        return OrderClient(Client())
+
+    @staticmethod
+    def create_orders(count, state, start):
+        """Create orders in the given state, one minute apart, beginning at start."""
+        orders = []
+        for i in range(count):
+            order = Order.objects.create(coordinator=f'Bernd {i}', restaurant_name='Hallo Pizza', state=state)
+            Order.objects.filter(id=order.id).update(created_at=start + datetime.timedelta(minutes=i))
+            orders.append(order)
+        return orders
+
+    @pytest.fixture
+    def now(self):
+        return timezone.now()
+
+    def test_active_orders_are_shown_first_on_page_one(self, client, now):
+        self.create_orders(3, 'delivered', now)
+        active = self.create_orders(2, 'preparing', now - datetime.timedelta(days=1))
+        orders = client.list_orders().context['order_list']
+        assert [order.id for order in orders[:2]] == [active[1].id, active[0].id]
+        assert len(orders) == 5
+
+    def test_finished_orders_are_paginated_without_gaps_or_duplicates(self, client, now):
+        finished = self.create_orders(45, 'delivered', now) + self.create_orders(5, 'canceled', now)
+        self.create_orders(2, 'ordering', now)
+        seen = []
+        response = client.list_orders()
+        seen += [order.id for order in response.context['order_list'] if not order.is_active]
+        while response.context['next_cursor']:
+            response = client.list_orders(cursor=response.context['next_cursor'])
+            assert all(not order.is_active for order in response.context['order_list'])
+            seen += [order.id for order in response.context['order_list']]
+        assert sorted(seen) == sorted(order.id for order in finished)
+
+    def test_pages_are_limited_to_page_size(self, client, now):
+        self.create_orders(25, 'delivered', now)
+        response = client.list_orders(state='finished')
+        assert len(response.context['order_list']) == 20
+        response = client.list_orders(state='finished', cursor=response.context['next_cursor'])
+        assert len(response.context['order_list']) == 5
+        assert response.context['next_cursor'] is None
+
+    def test_active_filter_excludes_finished_orders(self, client, now):
+        self.create_orders(2, 'delivered', now)
+        self.create_orders(1, 'canceled', now)
+        active = self.create_orders(3, 'ordered', now)
+        response = client.list_orders(state='active')
+        assert response.context['state_filter'] == 'active'
+        assert {order.id for order in response.context['order_list']} == {order.id for order in active}
+
+    def test_finished_filter_excludes_active_orders(self, client, now):
+        finished = self.create_orders(2, 'delivered', now)
+        self.create_orders(3, 'preparing', now)
+        response = client.list_orders(state='finished')
+        assert {order.id for order in response.context['order_list']} == {order.id for order in finished}
+
+    def test_invalid_cursor_returns_not_found(self, client):
+        assert client.list_orders(cursor='yolo').status_code == 404
+
+
+@pytest.mark.django_db
+class TestOrderLookupQueries:
+    """Order lookups must only query the orders_order table, without joining the history."""
+
+    @pytest.fixture
+    def coordinator_client(self):
+        return OrderClient(Client())
+
+    @pytest.fixture
+    def coordinator_order(self, coordinator_client):
+        announce_response = coordinator_client.announce_order('Bernd', 'Hallo Pizza')
+        return announce_response.context['order']
+
+    @pytest.fixture
+    def order_item(self, coordinator_client, coordinator_order):
+        response = coordinator_client.add_order_item(coordinator_order.slug, data={
+            'participant': 'Bernd',
+            'description': 'Pizza Salami',
+            'price': '5.60',
+            'amount': '1',
+        })
+        return response.context['order'].items.get()
+
+    @staticmethod
+    def assert_order_lookups_without_join(call):
+        with CaptureQueriesContext(connection) as context:
+            call()
+        lookups = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT') and 'FROM "orders_order"' in query['sql']
+            and '"orders_order"."slug" =' in query['sql']
+        ]
+        assert lookups
+        for sql in lookups:
+            assert 'JOIN' not in sql
+            assert 'orders_orderstatechange' not in sql
+
+    def test_default_ordering_does_not_join(self):
+        assert 'JOIN' not in str(Order.objects.all().query)
+
+    def test_default_ordering_does_not_duplicate_orders(self, coordinator_order):
+        order = Order.objects.get(id=coordinator_order.id)
+        order.ordering()
+        order.ordered()
+        assert Order.objects.filter(id=order.id).count() == len(list(Order.objects.filter(id=order.id))) == 1
+
+    def test_view_order(self, coordinator_client, coordinator_order):
+        cache.clear()
+        self.assert_order_lookups_without_join(
+            lambda: coordinator_client.client.get(coordinator_order.get_absolute_url())
+        )
+
+    def test_update_order_state(self, coordinator_client, coordinator_order):
+        self.assert_order_lookups_without_join(
+            lambda: coordinator_client.update_order_state(coordinator_order.slug, 'ordering')
+        )
+
+    def test_cancel_order(self, coordinator_client, coordinator_order):
+        self.assert_order_lookups_without_join(
+            lambda: coordinator_client.cancel_order(coordinator_order.slug, reason='Fuck off')
+        )
+
+    def test_create_order_item(self, coordinator_client, coordinator_order):
+        self.assert_order_lookups_without_join(
+            lambda: coordinator_client.add_order_item(coordinator_order.slug)
+        )
+
+    def test_update_order_item(self, coordinator_client, coordinator_order, order_item):
+        self.assert_order_lookups_without_join(
+            lambda: coordinator_client.update_order_item(coordinator_order.slug, order_item.slug)
+        )
+
+    def test_delete_order_item(self, coordinator_client, coordinator_order, order_item):
+        self.assert_order_lookups_without_join(
+            lambda: coordinator_client.delete_order_item(coordinator_order.slug, order_item.slug, get=True)
+        )
+
+
+@pytest.mark.django_db
+class TestOrderPageCache:
+    @pytest.fixture
+    def coordinator_client(self):
+        return OrderClient(Client())
+
+    @pytest.fixture
+    def coordinator_order(self, coordinator_client):
+        return coordinator_client.announce_order('Bernd', 'Hallo Pizza').context['order']
+
+    @staticmethod
+    def order_queries(call):
+        with CaptureQueriesContext(connection) as context:
+            response = call()
+        return response, [query['sql'] for query in context.captured_queries if '"orders_' in query['sql']]
+
+    def test_unchanged_order_is_served_from_cache(self, coordinator_client, coordinator_order):
+        coordinator_client.client.get(coordinator_order.get_absolute_url())
+        response, queries = self.order_queries(
+            lambda: coordinator_client.client.get(coordinator_order.get_absolute_url())
+        )
+        assert response.status_code == 200
+        assert queries == []
+        assert response.context['order'] == coordinator_order
+        assert 'orders/order_detail_body.html' not in [template.name for template in response.templates]
+        assert b'Hallo Pizza' in response.content
+
+    def test_changed_order_is_rendered_again(self, coordinator_client, coordinator_order):
+        coordinator_client.client.get(coordinator_order.get_absolute_url())
+        coordinator_client.add_order_item(coordinator_order.slug, data={
+            'participant': 'Bernd',
+            'description': 'Pizza Salami',
+            'price': '5.60',
+            'amount': '1',
+        })
+        response = coordinator_client.client.get(coordinator_order.get_absolute_url())
+        assert response.context['order_total'] == Decimal('5.60')
+        assert b'Pizza Salami' in response.content
+
+    def test_cached_order_depends_on_user(self, coordinator_client, coordinator_order):
+        coordinator_client.client.get(coordinator_order.get_absolute_url())
+        response, queries = self.order_queries(lambda: Client().get(coordinator_order.get_absolute_url()))
+        assert queries
+        assert response.context['order'] == coordinator_order
+
+    def test_unchanged_order_list_is_served_from_cache(self, coordinator_client, coordinator_order):
+        coordinator_client.list_orders()
+        response, queries = self.order_queries(coordinator_client.list_orders)
+        assert queries == []
+        assert response.context['order_list'] == [coordinator_order]
+
+    def test_changed_order_list_is_rendered_again(self, coordinator_client, coordinator_order):
+        coordinator_client.list_orders()
+        OrderClient(Client()).announce_order('Lisa', 'Pizza Hut')
+        response = coordinator_client.list_orders()
+        assert [order.restaurant_name for order in response.context['order_list']] == ['Pizza Hut', 'Hallo Pizza']
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+    @pytest.fixture
+    def coordinator_client(self):
+        return OrderClient(Client())
+
+    @pytest.fixture
+    def coordinator_order(self, coordinator_client):
+        return coordinator_client.announce_order('Bernd', 'Hallo Pizza').context['order']
+
+    def test_order_has_validators(self, coordinator_client, coordinator_order):
+        coordinator_client.client.get(coordinator_order.get_absolute_url())
+        response = coordinator_client.client.get(coordinator_order.get_absolute_url())
+        assert response.status_code == 200
+        assert response.headers['ETag'].startswith('"')
+        assert 'Last-Modified' in response.headers
+        assert 'private' in response.headers['Cache-Control']
+        assert 'no-cache' in response.headers['Cache-Control']
+
+    def test_unchanged_order_is_not_modified(self, coordinator_client, coordinator_order):
+        etag = coordinator_client.client.get(coordinator_order.get_absolute_url()).headers['ETag']
+        with CaptureQueriesContext(connection) as context:
+            response = coordinator_client.client.get(coordinator_order.get_absolute_url(), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+        assert not response.content
+        assert not [query for query in context.captured_queries if '"orders_' in query['sql']]
+
+    def test_unchanged_order_is_not_modified_since(self, coordinator_client, coordinator_order):
+        last_modified = coordinator_client.client.get(coordinator_order.get_absolute_url()).headers['Last-Modified']
+        response = coordinator_client.client.get(
+            coordinator_order.get_absolute_url(), HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        assert response.status_code == 304
+
+    def test_changed_order_is_modified(self, coordinator_client, coordinator_order):
+        etag = coordinator_client.client.get(coordinator_order.get_absolute_url()).headers['ETag']
+        coordinator_client.add_order_item(coordinator_order.slug, data={
+            'participant': 'Bernd',
+            'description': 'Pizza Salami',
+            'price': '5.60',
+            'amount': '1',
+        })
+        response = coordinator_client.client.get(coordinator_order.get_absolute_url(), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    def test_validators_depend_on_session(self, coordinator_client, coordinator_order):
+        etag = coordinator_client.client.get(coordinator_order.get_absolute_url()).headers['ETag']
+        response = Client().get(coordinator_order.get_absolute_url(), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    def test_page_with_messages_has_no_validators(self, coordinator_client, coordinator_order):
+        response = coordinator_client.update_order_state(coordinator_order.slug, 'ordering')
+        assert list(response.context['messages'])
+        assert 'ETag' not in response.headers
+
+    def test_unchanged_order_list_is_not_modified(self, coordinator_client, coordinator_order):
+        etag = coordinator_client.list_orders().headers['ETag']
+        response = coordinator_client.client.get(reverse('orders:list_orders'), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+    def test_changed_order_list_is_modified(self, coordinator_client, coordinator_order):
+        etag = coordinator_client.list_orders().headers['ETag']
+        OrderClient(Client()).announce_order('Lisa', 'Pizza Hut')
+        response = coordinator_client.client.get(reverse('orders:list_orders'), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+
+    def test_order_list_validators_depend_on_filter(self, coordinator_client, coordinator_order):
+        etag = coordinator_client.list_orders().headers['ETag']
+        response = coordinator_client.client.get(
+            reverse('orders:list_orders'), data={'state': 'active'}, HTTP_IF_NONE_MATCH=etag
+        )
+        assert response.status_code == 200
+
+
+@pytest.mark.django_db
+class TestAsyncReadViews:
+    """Call the async views the way an ASGI server does, with a session stored in the database."""
+
+    @pytest.fixture
+    def coordinator_client(self):
+        return OrderClient(Client())
+
+    @pytest.fixture
+    def coordinator_order(self, coordinator_client):
+        order = coordinator_client.announce_order('Bernd', 'Hallo Pizza').context['order']
+        coordinator_client.add_order_item(order.slug, data={
+            'participant': 'Bernd',
+            'description': 'Pizza Salami',
+            'price': '5.60',
+            'amount': '1',
+        })
+        return order
+
+    @pytest.fixture
+    def async_client(self, coordinator_client):
+        client = AsyncClient()
+        client.cookies = coordinator_client.client.cookies
+        return client
+
+    @staticmethod
+    def get(client, url):
+        async def request():
+            return await client.get(url)
+        return async_to_sync(request)()
+
+    def test_list_orders(self, async_client, coordinator_order):
+        response = self.get(async_client, reverse('orders:list_orders'))
+        assert response.status_code == 200
+        assert response.context['order_list'] == [coordinator_order]
+        assert b'Hallo Pizza' in response.content
+
+    def test_view_order(self, async_client, coordinator_order):
+        response = self.get(async_client, coordinator_order.get_absolute_url())
+        assert response.status_code == 200
+        assert response.context['order_total'] == Decimal('5.60')
+        assert response.context['chaospizza_user']['is_coordinator']
+        assert b'Pizza Salami' in response.content
+        assert b'Coordination' in response.content
+
+    def test_view_unknown_order(self, async_client):
+        response = self.get(async_client, reverse('orders:view_order', kwargs={'order_slug': 'foo'}))
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+class TestSessionStores:
+    """Count the session queries of the pages which every participant loads, for each DJANGO_SESSION_STORE."""
+
+    @pytest.fixture(params=['db', 'cached_db', 'cache', 'signed_cookies'])
+    def session_store(self, request, settings):
+        settings.SESSION_ENGINE = f'django.contrib.sessions.backends.{request.param}'
+        return request.param
+
+    @pytest.fixture
+    def client(self, session_store):  # pylint: disable=W0613
+        return OrderClient(Client())
+
+    @pytest.fixture
+    def order(self, client):
+        order = client.announce_order('Bernd', 'Hallo Pizza').context['order']
+        client.add_order_item(order.slug, data={
+            'participant': 'Bernd',
+            'description': 'Pizza Salami',
+            'price': '5.60',
+            'amount': '1',
+        })
+        return order
+
+    @staticmethod
+    def session_queries(call):
+        with CaptureQueriesContext(connection) as context:
+            response = call()
+        assert response.status_code == 200
+        return [query['sql'] for query in context.captured_queries if 'django_session' in query['sql']]
+
+    @pytest.mark.parametrize('page', ['list', 'order', 'edit_item'])
+    def test_reading_pages_does_not_save_the_session(self, client, order, session_store, page):
+        url = {
+            'list': reverse('orders:list_orders'),
+            'order': order.get_absolute_url(),
+            'edit_item': reverse('orders:update_orderitem', kwargs={
+                'order_slug': order.slug, 'item_slug': order.items.get().slug,
+            }),
+        }[page]
+        client.client.get(url)
+        queries = self.session_queries(lambda: client.client.get(url))
+        assert len(queries) == (1 if session_store == 'db' else 0)
+        assert all(sql.startswith('SELECT') for sql in queries)
+
+    def test_session_survives_requests(self, client, order):
+        response = client.client.get(order.get_absolute_url())
+        assert response.context['chaospizza_user'] == {
+            'name': 'Bernd', 'is_coordinator': True, 'coordinated_order_slug': order.slug,
+        }
+        response = client.update_order_item(order.slug, order.items.get().slug)
+        assert response.status_code == 200
+
+    def test_messages_are_stored_in_a_cookie(self, client, order):
+        response = client.update_order_state(order.slug, 'ordering')
+        assert [str(message) for message in response.context['messages']]
+        assert 'messages' not in client.client.session
+
+
+@pytest.mark.django_db
+class TestOrderDetail:
+    @pytest.fixture
+    def client(self):
+        return OrderClient(Client())
+
+    @pytest.fixture
+    def order(self):
+        order = Order.objects.create(coordinator='Bernd', restaurant_name='Hallo Pizza')
+        order.items.create(participant='Kevin', description='Salami', price=Decimal('7.20'), amount=2)
+        order.items.create(participant='Bernd', description='Margherita', price=Decimal('5.50'), amount=1)
+        order.items.create(participant='Kevin', description='Cola', price=Decimal('2.00'), amount=1)
+        return order
+
+    def test_items_are_grouped_by_participant_with_subtotals(self, client, order):
+        participants = client.client.get(order.get_absolute_url()).context['participants']
+        assert [participant['name'] for participant in participants] == ['Bernd', 'Kevin']
+        assert [item.description for item in participants[1]['items']] == ['Salami', 'Cola']
+        assert [item.line_total for item in participants[1]['items']] == [Decimal('14.40'), Decimal('2.00')]
+        assert participants[0]['total'] == Decimal('5.50')
+        assert participants[1]['total'] == Decimal('16.40')
+
+    def test_order_total_is_calculated(self, client, order):
+        assert client.client.get(order.get_absolute_url()).context['order_total'] == Decimal('21.90')
+
+    def test_order_without_items_has_no_participants(self, client):
+        order = Order.objects.create(coordinator='Bernd', restaurant_name='Hallo Pizza')
+        response = client.client.get(order.get_absolute_url())
+        assert response.context['participants'] == []
+        assert response.context['order_total'] == Decimal('0')
+
+    def test_items_and_totals_are_loaded_with_one_query(self, client, order):
+        with CaptureQueriesContext(connection) as context:
+            client.client.get(order.get_absolute_url())
+        item_queries = [query for query in context.captured_queries if 'orders_orderitem' in query['sql']]
+        assert len(item_queries) == 1
+
+
 @pytest.mark.django_db
 class TestOrderCoordination:
     @pytest.fixture
@@ -196,6 +662,13 @@ class TestOrderCoordination:
         response = coordinator_client.update_order_state(coordinator_order.slug, 'delivered')
         assert response.context['order'].is_delivered is True
 
+    def test_repeated_state_change_is_rejected(self, coordinator_client, coordinator_order):
+        coordinator_client.update_order_state(coordinator_order.slug, 'ordering')
+        response = coordinator_client.update_order_state(coordinator_order.slug, 'ordering')
+        assert response.status_code == 200
+        assert response.context['order'].is_ordering is True
+        assert response.context['order'].history.count() == 1
+
     def test_coordinator_can_cancel_coordinated_order(self, coordinator_client, coordinator_order):
         response = coordinator_client.cancel_order(coordinator_order.slug, reason='Fuck off')
         assert response.context['order'].is_canceled is True
@@ -293,6 +766,64 @@ class TestOrderParticipation:
             assert items[0].price == Decimal('15.5')
             assert items[0].amount == 1
 
+        def test_user_can_add_multiple_items_at_once(self, first_user_client, coordinator_order):
+            response = first_user_client.add_order_items(coordinator_order.slug, 'Mercedesfahrer-Bernd', [
+                {'description': 'Abooooow', 'price': '15.5', 'amount': '1'},
+                {'description': 'Cola', 'price': '2.5', 'amount': '2'},
+                {'description': '', 'price': '', 'amount': '1'},
+            ])
+            items = list(response.context['order'].items.order_by('description'))
+            assert [(item.participant, item.description, item.amount) for item in items] == [
+                ('Mercedesfahrer-Bernd', 'Abooooow', 1),
+                ('Mercedesfahrer-Bernd', 'Cola', 2),
+            ]
+            assert all(item.slug for item in items)
+            assert response.context['order'].total_price == Decimal('20.5')
+
+        def test_user_can_edit_all_items_added_at_once(self, first_user_client, coordinator_order):
+            response = first_user_client.add_order_items(coordinator_order.slug, 'Mercedesfahrer-Bernd', [
+                {'description': 'Abooooow', 'price': '15.5', 'amount': '1'},
+                {'description': 'Cola', 'price': '2.5', 'amount': '2'},
+            ])
+            for item in response.context['order'].items.all():
+                response = first_user_client.update_order_item(coordinator_order.slug, item.slug, data={
+                    'description': item.description, 'price': '1', 'amount': '1'
+                })
+            assert response.context['order'].total_price == Decimal('2')
+
+        def test_items_are_inserted_with_one_query(self, first_user_client, coordinator_order):
+            with CaptureQueriesContext(connection) as context:
+                first_user_client.add_order_items(coordinator_order.slug, 'Mercedesfahrer-Bernd', [
+                    {'description': f'Pizza {i}', 'price': '5', 'amount': '1'} for i in range(4)
+                ])
+            inserts = [
+                query for query in context.captured_queries
+                if query['sql'].startswith('INSERT INTO "orders_orderitem"')
+            ]
+            assert len(inserts) == 1
+
+        def test_user_cant_add_the_same_item_twice(self, first_user_client, coordinator_order):
+            response = first_user_client.add_order_items(coordinator_order.slug, 'Mercedesfahrer-Bernd', [
+                {'description': 'Cola', 'price': '2.5', 'amount': '1'},
+                {'description': 'Cola', 'price': '2.5', 'amount': '1'},
+            ])
+            assert response.context['formset'].non_form_errors()
+            first_user_client.add_order_items(coordinator_order.slug, 'Mercedesfahrer-Bernd', [
+                {'description': 'Cola', 'price': '2.5', 'amount': '1'},
+            ])
+            response = first_user_client.add_order_items(coordinator_order.slug, 'Mercedesfahrer-Bernd', [
+                {'description': 'Cola', 'price': '2.5', 'amount': '1'},
+            ])
+            assert response.context['form'].non_field_errors()
+            assert coordinator_order.items.count() == 1
+
+        def test_user_must_add_at_least_one_item(self, first_user_client, coordinator_order):
+            response = first_user_client.add_order_items(coordinator_order.slug, 'Mercedesfahrer-Bernd', [
+                {'description': '', 'price': '', 'amount': '1'},
+            ])
+            assert response.context['formset'].non_form_errors()
+            assert coordinator_order.items.count() == 0
+
         def test_user_can_edit_own_items(self, first_user_client, coordinator_order, first_user_item):
             update_item_response = first_user_client.update_order_item(
                 coordinator_order.slug,
@@ -334,6 +865,21 @@ class TestOrderParticipation:
             items = list(update_item_response.context['order'].items.all())
             assert len(items) == 1
 
+        def test_order_changed_after_check_keeps_item(self, monkeypatch, first_user_client, coordinator_order,
+                                                      first_user_item):
+            # The order leaves preparing after dispatch() checked it, but before the item is written.
+            monkeypatch.setattr(Order, 'lock', lambda order: 'ordering')
+            update_response = first_user_client.update_order_item(coordinator_order.slug, first_user_item.slug, data={
+                'description': 'Ja ok',
+                'price': '5.5',
+                'amount': '10',
+            })
+            assert 'Can not edit order item' in str(list(update_response.context['messages'])[0])
+            delete_response = first_user_client.delete_order_item(coordinator_order.slug, first_user_item.slug)
+            assert 'Can not delete order item' in str(list(delete_response.context['messages'])[0])
+            item = coordinator_order.items.get()
+            assert (item.description, item.amount) == ('Abooooow', 1)
+
     @pytest.mark.django_db
     @pytest.mark.parametrize("states", [
         (['ordering']),
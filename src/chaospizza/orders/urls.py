@@ -1,6 +1,10 @@
 # pylint: disable=C0111
 from django.urls import re_path
-from .views.order import ListOrders, CreateOrder, ViewOrder, UpdateOrderState, CancelOrder
+from .views.api import (
+    ListOrdersApi, SearchOrdersApi, ViewOrderApi, OrderChangesApi, ItemSuggestionsApi, OrderItemsApi, OrderStateApi
+)
+from .views.events import OrderEvents
+from .views.order import ListOrders, SearchOrders, CreateOrder, ViewOrder, UpdateOrderState, CancelOrder
 from .views.orderitem import CreateOrderItem, UpdateOrderItem, DeleteOrderItem
 
 
@@ -10,6 +14,10 @@ urlpatterns = [
         r'^$', ListOrders.as_view(),
         name='list_orders'
     ),
+    re_path(
+        r'^search$', SearchOrders.as_view(),
+        name='search_orders'
+    ),
     re_path(
         r'^create$', CreateOrder.as_view(),
         name='create_order'
@@ -34,8 +42,40 @@ urlpatterns = [
         r'^order/(?P<order_slug>[\w-]+)/cancel', CancelOrder.as_view(),
         name='cancel_order'
     ),
+    re_path(
+        r'^order/(?P<order_slug>[\w-]+)/events$', OrderEvents.as_view(),
+        name='order_events'
+    ),
     re_path(
         r'^order/(?P<order_slug>[\w-]+)/', ViewOrder.as_view(),
         name='view_order'
     ),
+    re_path(
+        r'^api/v1/orders$', ListOrdersApi.as_view(),
+        name='api_list_orders'
+    ),
+    re_path(
+        r'^api/v1/search$', SearchOrdersApi.as_view(),
+        name='api_search_orders'
+    ),
+    re_path(
+        r'^api/v1/orders/(?P<order_slug>[\w-]+)$', ViewOrderApi.as_view(),
+        name='api_view_order'
+    ),
+    re_path(
+        r'^api/v1/orders/(?P<order_slug>[\w-]+)/changes$', OrderChangesApi.as_view(),
+        name='api_order_changes'
+    ),
+    re_path(
+        r'^api/v1/orders/(?P<order_slug>[\w-]+)/suggestions$', ItemSuggestionsApi.as_view(),
+        name='api_item_suggestions'
+    ),
+    re_path(
+        r'^api/v1/orders/(?P<order_slug>[\w-]+)/items$', OrderItemsApi.as_view(),
+        name='api_order_items'
+    ),
+    re_path(
+        r'^api/v1/orders/(?P<order_slug>[\w-]+)/state$', OrderStateApi.as_view(),
+        name='api_order_state'
+    ),
 ]
@@ -0,0 +1,377 @@
+# pylint: disable=C0111
+# pylint: disable=W0201
+"""
+Version 1 of the JSON API of the orders app.
+
+Responses are built from plain dicts by the *_to_json() functions and encoded without whitespace. Writes are allowed
+with the same session based permissions as the HTML views, so clients must keep the session cookie and send the CSRF
+token from the csrftoken cookie in the X-CSRFToken header.
+"""
+import json
+
+from django.db import IntegrityError
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.generic.base import View
+
+from ..mixins import UserSessionMixin
+from ..models import Order, ORDER_STATES, ACTIVE_STATES, FINISHED_STATES
+from ..pagination import keyset_page, InvalidCursor
+from ..search import search_orders
+from ..suggestions import suggest
+from .order import get_page_number
+from .orderitem import CartItemForm, OrderItemParticipantForm
+
+
+class ApiError(Exception):
+    """Raised by API views to respond with an error message and the given HTTP status."""
+
+    def __init__(self, status, message, **details):
+        """Create an error, details are added to the response as they are."""
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.details = details
+
+
+def json_response(data, status=200):
+    """Return a compact JSON response."""
+    return JsonResponse(data, status=status, json_dumps_params={'separators': (',', ':')})
+
+
+def order_to_json(order):
+    """Return the summary of an order as dict."""
+    return {
+        'slug': order.slug,
+        'url': order.get_absolute_url(),
+        'coordinator': order.coordinator,
+        'restaurant_name': order.restaurant_name,
+        'restaurant_url': order.restaurant_url,
+        'state': order.state,
+        'created_at': order.created_at,
+        'preparation_expires_at': order.preparation_expires_at,
+        'item_count': order.item_count,
+        'participant_count': order.participant_count,
+        'total_price': order.total_price,
+        'version': order.version,
+    }
+
+
+def item_to_json(item):
+    """Return an order item as dict."""
+    return {
+        'slug': item.slug,
+        'participant': item.participant,
+        'description': item.description,
+        'price': item.price,
+        'amount': item.amount,
+        'version': item.version,
+    }
+
+
+def state_change_to_json(state_change):
+    """Return an order state change as dict."""
+    return {
+        'created_at': state_change.created_at,
+        'old_state': state_change.old_state,
+        'new_state': state_change.new_state,
+        'reason': state_change.reason,
+        'version': state_change.version,
+    }
+
+
+def form_errors(form):
+    """Return the errors of a form as dict of field name to list of messages."""
+    return {field: [str(error) for error in errors] for field, errors in form.errors.items()}
+
+
+class ApiView(UserSessionMixin, View):
+    """Base class of the API views which turns ApiErrors into JSON responses."""
+
+    def dispatch(self, request, *args, **kwargs):
+        """Handle the request, respond with the error message if it fails."""
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as err:
+            return json_response(dict(err.details, error=err.message), status=err.status)
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        """Respond with a JSON error for unsupported HTTP methods."""
+        response = super().http_method_not_allowed(request, *args, **kwargs)
+        raise ApiError(response.status_code, f'Method {request.method} not allowed', allowed=response['Allow'])
+
+    def get_order(self, queryset=None):
+        """Return the order with the slug from the URL."""
+        queryset = Order.objects.all() if queryset is None else queryset
+        try:
+            return queryset.get(slug=self.kwargs['order_slug'])
+        except Order.DoesNotExist as err:
+            raise ApiError(404, 'Order not found') from err
+
+    def get_json_body(self):
+        """Return the decoded JSON object sent as request body."""
+        try:
+            data = json.loads(self.request.body)
+        except ValueError as err:
+            raise ApiError(400, f'Invalid JSON: {err}') from err
+        if not isinstance(data, dict):
+            raise ApiError(400, 'Expected a JSON object')
+        return data
+
+
+class ListOrdersApi(ApiView):
+    """
+    List orders, newest first, using keyset pagination.
+
+    The ``state`` query parameter restricts the list to ``active`` or ``finished`` orders, the ``cursor`` query
+    parameter selects the page. Every page is fetched with a single query.
+    """
+
+    page_size = 50
+    state_filters = {
+        None: [state for state, _ in ORDER_STATES],
+        'active': ACTIVE_STATES,
+        'finished': FINISHED_STATES,
+    }
+
+    def get(self, request, *args, **kwargs):
+        """Return one page of orders and the cursor of the next page."""
+        state_filter = request.GET.get('state')
+        if state_filter not in self.state_filters:
+            raise ApiError(
+                400, f'Unknown state filter: {state_filter}', choices=[key for key in self.state_filters if key]
+            )
+        try:
+            orders, next_cursor = keyset_page(
+                Order.objects.filter(state__in=self.state_filters[state_filter]),
+                request.GET.get('cursor'),
+                self.page_size,
+            )
+        except InvalidCursor as err:
+            raise ApiError(400, str(err)) from err
+        return json_response({
+            'orders': [order_to_json(order) for order in orders],
+            'next_cursor': next_cursor,
+        })
+
+
+class SearchOrdersApi(ApiView):
+    """
+    Search orders by restaurant, coordinator, item descriptions and month, best matches first, see search.py.
+
+    The ``q`` query parameter contains the search query, the ``page`` query parameter selects the page. Every page is
+    fetched with two queries.
+    """
+
+    page_size = 50
+
+    def get(self, request, *args, **kwargs):
+        """Return one page of matching orders and the number of the next page."""
+        query = request.GET.get('q', '').strip()
+        if not query:
+            raise ApiError(400, 'Expected a search query')
+        try:
+            page = get_page_number(request)
+        except ValueError as err:
+            raise ApiError(400, str(err)) from err
+        orders, has_next = search_orders(query, page, self.page_size)
+        return json_response({
+            'orders': [order_to_json(order) for order in orders],
+            'next_page': page + 1 if has_next else None,
+        })
+
+
+class ViewOrderApi(ApiView):
+    """Show a single order with its items and its history, fetched with three queries."""
+
+    def get(self, request, *args, **kwargs):
+        """Return the order, its items and its state changes."""
+        order = self.get_order(Order.objects.prefetch_related('items', 'history'))
+        return json_response(dict(
+            order_to_json(order),
+            items=[item_to_json(item) for item in sorted(order.items.all(), key=lambda item: item.id)],
+            history=[state_change_to_json(change) for change in order.history.all()],
+        ))
+
+
+class OrderChangesApi(ApiView):
+    """
+    Return what changed in an order since the version given by the ``since`` query parameter.
+
+    Items, deleted items and state changes are stamped with the order version which changed them, so clients can keep
+    a copy of an order up to date by passing the last version they have seen. If nothing changed, the response only
+    contains the current version and costs a single lookup of the order by its slug.
+    """
+
+    def get(self, request, *args, **kwargs):
+        """Return the order summary with all items, deleted item slugs and state changes newer than since."""
+        try:
+            since = int(request.GET['since'])
+        except (KeyError, ValueError) as err:
+            raise ApiError(400, 'Expected since to be an order version') from err
+        order = self.get_order()
+        if order.version <= since:
+            return json_response({'version': order.version})
+        items = order.items.filter(version__gt=since).order_by('id')
+        deleted = order.deleted_items.filter(version__gt=since).order_by('id').values_list('slug', flat=True)
+        history = order.history.filter(version__gt=since).order_by('id')
+        return json_response({
+            'version': order.version,
+            'order': order_to_json(order),
+            'items': [item_to_json(item) for item in items],
+            'deleted': list(deleted),
+            'history': [state_change_to_json(change) for change in history],
+        })
+
+
+class ItemSuggestionsApi(ApiView):
+    """
+    Suggest descriptions for new order items, taken from earlier orders from the same restaurant, most popular first.
+
+    The ``q`` query parameter contains what the participant typed so far, see suggestions.py. Browsers may reuse the
+    suggestions for a minute.
+    """
+
+    limit = 10
+
+    def get(self, request, *args, **kwargs):
+        """Return the matching descriptions with their latest price."""
+        order = self.get_order(Order.objects.only('restaurant_name'))
+        suggestions = suggest(order.restaurant_name, request.GET.get('q', ''), self.limit)
+        response = json_response({
+            'suggestions': [
+                {'description': suggestion['description'], 'price': suggestion['last_price']}
+                for suggestion in suggestions
+            ],
+        })
+        patch_cache_control(response, private=True, max_age=60)
+        return response
+
+
+class OrderItemsApi(ApiView):
+    """
+    Add, change and delete several order items at once.
+
+    Expects a JSON object like::
+
+        {
+            "participant": "Bernd",
+            "create": [{"description": "Pizza Salami", "price": "5.60", "amount": 2}],
+            "update": [{"slug": "...", "amount": 2}],
+            "delete": ["..."]
+        }
+
+    All keys are optional, except participant when items are created, amount defaults to 1. Only items created by the
+    current session can be changed or deleted. All changes are written within one transaction, either all of them
+    succeed or none.
+    """
+
+    def post(self, request, *args, **kwargs):
+        """Apply all changes and return the order summary with the created and updated items."""
+        self.order = self.get_order()
+        data = self.get_json_body()
+        create_rows = self.get_list(data, 'create', dict)
+        update_rows = self.get_list(data, 'update', dict)
+        delete_slugs = self.get_list(data, 'delete', str)
+        create = self.get_created_items(create_rows, data.get('participant'))
+        items = self.get_own_items([row.get('slug') for row in update_rows] + delete_slugs)
+        update = self.get_updated_items(update_rows, items)
+        delete = [items[item_slug] for item_slug in delete_slugs]
+        try:
+            created = self.order.change_items(create=create, update=update, delete=delete)
+        except ValueError as err:
+            raise ApiError(409, str(err)) from err
+        except IntegrityError as err:
+            raise ApiError(409, 'The same item has been added twice') from err
+        if created:
+            self.add_order_items_to_session(str(self.order.id), [str(item.id) for item in created])
+            self.username = created[0].participant
+        return json_response({
+            'order': order_to_json(self.order),
+            'created': [item_to_json(item) for item in created],
+            'updated': [item_to_json(item) for item in update],
+            'deleted': [item.slug for item in delete],
+        })
+
+    @staticmethod
+    def get_list(data, key, item_type):
+        """Return the list stored under key in the request data, which must only contain items of item_type."""
+        values = data.get(key, [])
+        if not isinstance(values, list) or not all(isinstance(value, item_type) for value in values):
+            raise ApiError(400, f'Expected {key} to be a list of {"objects" if item_type is dict else "strings"}')
+        return values
+
+    def get_created_items(self, rows, participant):
+        """Validate the rows of new items and return unsaved OrderItem instances."""
+        if not rows:
+            return []
+        participant_form = OrderItemParticipantForm({'participant': participant})
+        if not participant_form.is_valid():
+            raise ApiError(400, 'Invalid participant', errors=form_errors(participant_form))
+        items = []
+        for index, row in enumerate(rows):
+            form = CartItemForm(dict({'amount': 1}, **row))
+            if not form.is_valid():
+                raise ApiError(400, f'Invalid item create[{index}]', errors=form_errors(form))
+            item = form.save(commit=False)
+            item.participant = participant_form.cleaned_data['participant']
+            items.append(item)
+        return items
+
+    def get_own_items(self, item_slugs):
+        """Load the items with the given slugs with one query, they must have been created by the current session."""
+        items = {item.slug: item for item in self.order.items.filter(slug__in=item_slugs)}
+        for item_slug in item_slugs:
+            if item_slug not in items:
+                raise ApiError(404, f'Order item not found: {item_slug}')
+            if not self.user_can_edit_order_item(str(self.order.id), str(items[item_slug].id)):
+                raise ApiError(403, f'Not allowed to change order item: {item_slug}')
+        return items
+
+    @staticmethod
+    def get_updated_items(rows, items):
+        """Validate the changes of existing items and apply them to the loaded instances."""
+        updated = []
+        for index, row in enumerate(rows):
+            item = items[row['slug']]
+            data = dict(item_to_json(item), **row)
+            form = CartItemForm(data, instance=item)
+            if not form.is_valid():
+                raise ApiError(400, f'Invalid item update[{index}]', errors=form_errors(form))
+            updated.append(form.save(commit=False))
+        return updated
+
+
+class OrderStateApi(ApiView):
+    """
+    Change the state of an order, which is only allowed for its coordinator.
+
+    Expects a JSON object like ``{"state": "ordering"}``, canceling also requires a ``reason``.
+    """
+
+    def post(self, request, *args, **kwargs):
+        """Switch to the requested state and return the order summary."""
+        order = self.get_order()
+        if not self.user_can_edit_order(order.id):
+            raise ApiError(403, 'Operation not allowed')
+        data = self.get_json_body()
+        transitions = {
+            'ordering': order.ordering,
+            'ordered': order.ordered,
+            'delivered': order.delivered,
+            'canceled': lambda: order.cancel(data.get('reason')),
+        }
+        new_state = data.get('state')
+        if new_state not in transitions:
+            raise ApiError(400, f'Unknown state: {new_state}', choices=list(transitions))
+        if new_state == 'canceled' and not data.get('reason'):
+            raise ApiError(400, 'Need reason to cancel order')
+        try:
+            changed = transitions[new_state]()
+        except ValueError as err:
+            raise ApiError(409, str(err), order=order_to_json(order)) from err
+        if not changed:
+            raise ApiError(409, 'Order has been changed in the meantime', order=order_to_json(order))
+        if not order.is_active:
+            self.remove_order_from_session()
+        return json_response(order_to_json(order))
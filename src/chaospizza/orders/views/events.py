@@ -0,0 +1,72 @@
+# pylint: disable=C0111
+import json
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.views.generic.base import View
+
+from .. import events
+from ..models import Order
+
+
+class OrderEvents(View):
+    """
+    Stream changes of a single order as server-sent events.
+
+    Every event carries the new version and state of the order, the version is used as event id. The first event
+    describes the current version, unless the browser already knows it from the Last-Event-ID of a previous stream.
+
+    Streams are only kept open when served by ASGI, where an idle stream costs a queue and a suspended coroutine.
+    Under WSGI every open stream would block a whole worker, so only the first event is sent and the browser reconnects
+    after the retry interval instead, which turns the stream into polling.
+    """
+
+    retry = 3000
+    keepalive = 15
+    # Streams are closed and reopened by the browser after this many seconds, which bounds the lifetime of streams
+    # whose client disconnected without the server noticing.
+    max_age = 300
+
+    async def get(self, request, *args, **kwargs):
+        """Send the current version of the order, followed by all changes if served by ASGI."""
+        order_slug = kwargs['order_slug']
+        # Subscribe before loading the order, so no change can get lost in between.
+        subscription = events.broker.subscribe(order_slug) if isinstance(request, ASGIRequest) else None
+        try:
+            order = await Order.objects.filter(slug=order_slug).values('slug', 'version', 'state').aget()
+        except Order.DoesNotExist as err:
+            if subscription is not None:
+                events.broker.unsubscribe(subscription)
+            raise Http404(f'No order found matching {order_slug}') from err
+        first_event = f'retry: {self.retry}\n\n'
+        if request.headers.get('Last-Event-ID') != str(order['version']):
+            first_event += self.format_event(dict(order, event='order'))
+        if subscription is None:
+            response = HttpResponse(first_event, content_type='text/event-stream')
+        else:
+            response = StreamingHttpResponse(
+                self.stream(subscription, first_event, order['version']), content_type='text/event-stream'
+            )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, subscription, first_event, version):
+        """Yield the first event and then all newer changes, with comments in between to keep the connection open."""
+        try:
+            yield first_event
+            for _ in range(self.max_age // self.keepalive):
+                event = await subscription.get(self.keepalive)
+                if event is None:
+                    yield ': keepalive\n\n'
+                elif event['version'] > version:
+                    version = event['version']
+                    yield self.format_event(event)
+        finally:
+            events.broker.unsubscribe(subscription)
+
+    @staticmethod
+    def format_event(event):
+        """Return a change event in the event stream format."""
+        data = json.dumps({'version': event['version'], 'state': event['state']}, separators=(',', ':'))
+        return f"id: {event['version']}\nevent: {event['event']}\ndata: {data}\n\n"
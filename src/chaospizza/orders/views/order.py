@@ -1,29 +1,240 @@
 # pylint: disable=C0111
 # pylint: disable=W0201
+from decimal import Decimal
+from hashlib import md5
+from itertools import groupby
+from operator import attrgetter
+
+from asgiref.sync import sync_to_async
+from django import forms
+from django.core.cache import cache
+from django.db.models import DecimalField, ExpressionWrapper, F, Max, Sum, Window
+from django.http import Http404
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.shortcuts import redirect
-from django.views.generic.base import View
+from django.views.generic.base import TemplateView, View
 from django.views.generic.list import ListView
 from django.views.generic.edit import CreateView
 from django.views.generic.detail import DetailView, SingleObjectMixin
 from django.contrib import messages
 
+from ...menus import catalog
+from .. import archive, cache as order_cache
 from ..mixins import UserSessionMixin
-from ..models import Order
+from ..models import ArchivedOrder, Order, ACTIVE_STATES, FINISHED_STATES
+from ..pagination import akeyset_page, InvalidCursor
+from ..search import search_orders
+
+
+class ConditionalGetMixin:
+    """
+    View mixin to answer conditional GET requests with 304 Not Modified.
+
+    ETags are built from the version of the shown data and everything a page shows from the session: the user's name,
+    the coordination state and the CSRF cookie used by the page's forms. Responses showing messages get no validators
+    at all, the browser would show the same messages again otherwise.
+    """
 
+    def get_etag(self, *parts):
+        """Return a strong ETag for the given version parts, as shown to the current session."""
+        session = self.request.session
+        variant = (
+            session.get('username'),
+            session.get('is_coordinator', False),
+            session.get('order_slug'),
+            self.request.META.get('CSRF_COOKIE'),
+        )
+        return quote_etag(md5(repr(parts + variant).encode('utf-8'), usedforsecurity=False).hexdigest())
 
-class ListOrders(ListView):
-    """Show orders."""
+    def has_pending_messages(self):
+        """Determine if the response will show messages to the user."""
+        return len(messages.get_messages(self.request)) > 0
+
+    def get_not_modified_response(self, etag, last_modified=None):
+        """Return a 304 response if the client's copy matches the given validators, else None."""
+        if self.has_pending_messages():
+            return None
+        response = get_conditional_response(
+            self.request, etag=etag, last_modified=last_modified and int(last_modified.timestamp())
+        )
+        if response is not None:
+            self.add_validators(response, etag, last_modified)
+        return response
+
+    def add_validators(self, response, etag, last_modified=None):
+        """Add ETag and Last-Modified to the response and make the browser revalidate it on every request."""
+        if self.has_pending_messages():
+            return response
+        response.headers['ETag'] = etag
+        if last_modified:
+            response.headers['Last-Modified'] = http_date(last_modified.timestamp())
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class ListOrders(ConditionalGetMixin, UserSessionMixin, ListView):
+    """
+    Show orders, newest first, using keyset pagination.
+
+    The ``state`` query parameter restricts the list to active or finished orders. Without it, all active orders are
+    shown on the first page, followed by the finished orders which are paginated. The ``cursor`` query parameter
+    selects the page.
+
+    The rendered list is cached until any order changes, see cache.py. The current list generation is used as ETag, so
+    reloading an unchanged list is answered with 304 Not Modified.
+
+    The view is async, so that slow clients served by ASGI do not block a worker thread.
+    """
 
     model = Order
-    queryset = Order.objects.order_by('-created_at')
+    context_object_name = 'order_list'
+    template_name = 'orders/order_list.html'
+    body_template_name = 'orders/order_list_body.html'
+    cached_context = ('order_list', 'state_filter', 'next_cursor', 'last_modified', 'order_list_body')
+    page_size = 20
+    state_filters = {
+        'active': ACTIVE_STATES,
+        'finished': FINISHED_STATES,
+    }
+
+    async def get(self, request, *args, **kwargs):
+        """Show the list, rendering it only if it is not cached yet."""
+        await self.aload_session()
+        self.state_filter = request.GET.get('state')
+        if self.state_filter not in self.state_filters:
+            self.state_filter = None
+        self.cursor = request.GET.get('cursor')
+        generation = await order_cache.aget_list_generation()
+        etag = self.get_etag(generation, self.state_filter, self.cursor)
+        response = self.get_not_modified_response(etag)
+        if response is not None:
+            return response
+        cache_key = order_cache.order_list_key(generation, self.state_filter, self.cursor)
+        context = await cache.aget(cache_key)
+        if context is None:
+            self.object_list = await self.aget_queryset()
+            context = self.get_context_data(
+                last_modified=(await Order.objects.aaggregate(last_modified=Max('updated_at')))['last_modified']
+            )
+            context['order_list_body'] = await sync_to_async(render_to_string)(
+                self.body_template_name, context, request
+            )
+            context = {name: context[name] for name in self.cached_context}
+            await cache.aset(cache_key, context)
+        response = self.get_not_modified_response(etag, context['last_modified'])
+        if response is not None:
+            return response
+        self.object_list = context['order_list']
+        return self.add_validators(self.render_to_response(context), etag, context['last_modified'])
+
+    async def aget_queryset(self):
+        """Return the orders of the requested page and remember the cursor of the next page."""
+        states = self.state_filters[self.state_filter or 'finished']
+        try:
+            orders, self.next_cursor = await akeyset_page(
+                Order.objects.filter(state__in=states), self.cursor, self.page_size
+            )
+        except InvalidCursor as err:
+            raise Http404(str(err)) from err
+        if self.state_filter is None and not self.cursor:
+            active_orders = Order.objects.filter(state__in=ACTIVE_STATES).order_by('-created_at', '-id')
+            orders = [order async for order in active_orders] + orders
+        return orders
+
+    def get_context_data(self, **kwargs):
+        """Add the current state filter and the cursor of the next page."""
+        context = super().get_context_data(**kwargs)
+        context['state_filter'] = self.state_filter
+        context['next_cursor'] = self.next_cursor
+        return context
+
+
+def get_page_number(request):
+    """Return the page number from the ``page`` query parameter, starting at 1."""
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 0
+    if page < 1:
+        raise ValueError(f'Invalid page: {request.GET.get("page")}')
+    return page
+
+
+class SearchOrders(UserSessionMixin, TemplateView):
+    """
+    Search orders by restaurant, coordinator, item descriptions and month, best matches first, see search.py.
+
+    The ``q`` query parameter contains the search query, the ``page`` query parameter selects the page.
+
+    The view is async, so that slow clients served by ASGI do not block a worker thread.
+    """
+
+    template_name = 'orders/order_search.html'
+    page_size = 20
+
+    async def get(self, request, *args, **kwargs):
+        """Show one page of matching orders."""
+        await self.aload_session()
+        query = request.GET.get('q', '').strip()
+        try:
+            page = get_page_number(request)
+        except ValueError as err:
+            raise Http404(str(err)) from err
+        orders, has_next = await sync_to_async(search_orders)(query, page, self.page_size) if query else ([], False)
+        return self.render_to_response(self.get_context_data(
+            query=query,
+            order_list=orders,
+            previous_page=page - 1 if page > 1 else None,
+            next_page=page + 1 if has_next else None,
+        ))
+
+
+class CreateOrderForm(forms.ModelForm):
+    """Order form which can fill in the restaurant from the menus app, see menus/catalog.py."""
+
+    class Meta:  # noqa
+        model = Order
+        fields = ['coordinator', 'restaurant_name', 'restaurant_url', 'preparation_expires_after']
+
+    field_order = ['coordinator', 'restaurant']
+    restaurant = forms.TypedChoiceField(
+        coerce=int, required=False, empty_value=None,
+        help_text='Name and URL are taken from the menu unless you enter them.'
+    )
+
+    def __init__(self, *args, **kwargs):
+        """Offer the cached restaurants, the restaurant name is only required if none is chosen."""
+        super().__init__(*args, **kwargs)
+        restaurants = catalog.get_restaurants()
+        if restaurants:
+            self.fields['restaurant'].choices = [('', 'Other restaurant')] + [
+                (restaurant['id'], restaurant['name']) for restaurant in restaurants
+            ]
+            self.fields['restaurant_name'].required = False
+        else:
+            del self.fields['restaurant']
+
+    def clean(self):
+        """Fill in name and URL of the chosen restaurant, unless they have been entered."""
+        cleaned_data = super().clean()
+        restaurant = catalog.get_restaurant(cleaned_data.get('restaurant'))
+        if restaurant is not None:
+            cleaned_data['restaurant_name'] = cleaned_data.get('restaurant_name') or restaurant['name']
+            cleaned_data['restaurant_url'] = cleaned_data.get('restaurant_url') or restaurant['url']
+            self.instance.restaurant_id = restaurant['id']
+        elif not cleaned_data.get('restaurant_name') and 'restaurant_name' not in self.errors:
+            self.add_error('restaurant_name', forms.Field.default_error_messages['required'])
+        return cleaned_data
 
 
 class CreateOrder(UserSessionMixin, CreateView):
-    """Create a new order."""
+    """Create a new order, optionally from a restaurant of the menus app given by the ``restaurant`` parameter."""
 
     model = Order
-    fields = ['coordinator', 'restaurant_name', 'restaurant_url']
+    form_class = CreateOrderForm
     template_name_suffix = '_create'
 
     def dispatch(self, request, *args, **kwargs):
@@ -35,7 +246,11 @@ class CreateOrder(UserSessionMixin, CreateView):
 
     def get_initial(self):
         """Populate the coordinator name if the user is already known in the session."""
-        return {'coordinator': self.username}
+        initial = {'coordinator': self.username}
+        restaurant = catalog.get_restaurant_by_slug(self.request.GET.get('restaurant'))
+        if restaurant is not None:
+            initial['restaurant'] = restaurant['id']
+        return initial
 
     def form_valid(self, form):
         """Enable coordinator mode in session when data is valid."""
@@ -49,11 +264,104 @@ class CreateOrder(UserSessionMixin, CreateView):
         self.add_order_to_session(order)
 
 
-class ViewOrder(UserSessionMixin, DetailView):
-    """Show single order."""
+class ViewOrder(ConditionalGetMixin, UserSessionMixin, DetailView):
+    """
+    Show single order.
 
-    queryset = Order.objects.prefetch_related('items', 'history')
+    The rendered order is cached per order version and user, see cache.py. The coordination panel is rendered on every
+    request because it depends on the session and contains CSRF tokens.
+
+    The order version is used as ETag and the time of its last change as Last-Modified, so reloading an unchanged order
+    is answered with 304 Not Modified.
+
+    The view is async, so that slow clients served by ASGI do not block a worker thread.
+
+    Orders moved to the archive by the archive_orders command are shown from their archived copy, see archive.py.
+    """
+
+    archived_items = None
+    queryset = Order.objects.prefetch_related('history')
     slug_url_kwarg = 'order_slug'
+    template_name = 'orders/order_detail.html'
+    body_template_name = 'orders/order_detail_body.html'
+    cached_context = ('order', 'participants', 'order_total', 'order_body')
+
+    async def get(self, request, *args, **kwargs):
+        """Show the order, loading and rendering it only if the current version is not cached yet."""
+        await self.aload_session()
+        order_slug = kwargs[self.slug_url_kwarg]
+        version = await order_cache.aget_order_version(order_slug)
+        context = None
+        if version is not None:
+            response = self.get_not_modified_response(self.get_etag(order_slug, version))
+            if response is not None:
+                return response
+            context = await cache.aget(order_cache.order_detail_key(order_slug, version, self.username))
+        if context is None:
+            self.object = await self.aget_object()
+            await order_cache.aremember_order_version(self.object)
+            context = self.get_context_data(object=self.object, order_items=await self.aget_order_items())
+            context['order_body'] = await sync_to_async(render_to_string)(self.body_template_name, context, request)
+            context = {name: context[name] for name in self.cached_context}
+            await cache.aset(order_cache.order_detail_key(order_slug, self.object.version, self.username), context)
+        self.object = context['order']
+        etag = self.get_etag(order_slug, self.object.version)
+        response = self.get_not_modified_response(etag, self.object.updated_at)
+        if response is not None:
+            return response
+        return self.add_validators(self.render_to_response(context), etag, self.object.updated_at)
+
+    async def aget_object(self):
+        """Return the order matching the slug from the URL, falling back to the archive, or raise Http404."""
+        order_slug = self.kwargs[self.slug_url_kwarg]
+        try:
+            return await self.get_queryset().aget(slug=order_slug)
+        except Order.DoesNotExist:
+            pass
+        try:
+            archived_order = await ArchivedOrder.objects.aget(slug=order_slug)
+        except ArchivedOrder.DoesNotExist as err:
+            raise Http404(f'No order found matching {order_slug}') from err
+        order, self.archived_items = archive.load_order(archived_order)
+        return order
+
+    def get_context_data(self, **kwargs):
+        """
+        Add the order items grouped by participant, with subtotals and the grand total.
+
+        :param order_items: items of the order as returned by aget_order_items()
+        """
+        items = kwargs.pop('order_items')
+        context = super().get_context_data(**kwargs)
+        participants = []
+        for name, group in groupby(items, key=attrgetter('participant')):
+            participant_items = list(group)
+            participants.append({
+                'name': name,
+                'items': participant_items,
+                'total': participant_items[0].participant_total,
+            })
+        context['participants'] = participants
+        context['order_total'] = items[0].order_total if items else Decimal('0')
+        return context
+
+    async def aget_order_items(self):
+        """
+        Return the items of the order, sorted by participant.
+
+        Every item is annotated with its line_total, the participant_total of its participant and the order_total, all
+        calculated by the database within a single query.
+        """
+        if self.archived_items is not None:
+            return self.archived_items
+        money = DecimalField(max_digits=9, decimal_places=2)
+        line_total = ExpressionWrapper(F('price') * F('amount'), output_field=money)
+        items = self.object.items.annotate(
+            line_total=line_total,
+            participant_total=Window(Sum(line_total), partition_by=[F('participant')], output_field=money),
+            order_total=Window(Sum(line_total), output_field=money),
+        ).order_by('participant', 'id')
+        return [item async for item in items]
 
 
 class UpdateOrderState(SingleObjectMixin, UserSessionMixin, View):
@@ -82,18 +390,26 @@ class UpdateOrderState(SingleObjectMixin, UserSessionMixin, View):
         :param request: django http request
         :param new_state: either 'ordering', 'ordered' or 'delivered'
         """
-        if new_state == 'ordering':
-            self.order.ordering()
-            messages.add_message(request, messages.INFO, 'New state ordering')
-        elif new_state == 'ordered':
-            self.order.ordered()
-            messages.add_message(request, messages.INFO, 'New state ordered')
-        elif new_state == 'delivered':
-            self.order.delivered()
-            self.remove_order_from_session()
-            messages.add_message(request, messages.INFO, 'Order finished.')
-        else:
+        transitions = {
+            'ordering': (self.order.ordering, 'New state ordering'),
+            'ordered': (self.order.ordered, 'New state ordered'),
+            'delivered': (self.order.delivered, 'Order finished.'),
+        }
+        if new_state not in transitions:
             messages.add_message(request, messages.ERROR, 'Not possible')
+            return
+        transition, message = transitions[new_state]
+        try:
+            changed = transition()
+        except ValueError as err:
+            messages.add_message(request, messages.ERROR, f'Not possible: {err}')
+            return
+        if not changed:
+            messages.add_message(request, messages.ERROR, 'Order has been changed in the meantime, please try again.')
+            return
+        if new_state == 'delivered':
+            self.remove_order_from_session()
+        messages.add_message(request, messages.INFO, message)
 
     def get_success_url(self):
         """Return the view_order url for the current order."""
@@ -127,7 +443,12 @@ class CancelOrder(SingleObjectMixin, UserSessionMixin, View):
         :param reason: why the order is canceled
         """
         try:
-            self.order.cancel(reason)
+            if not self.order.cancel(reason):
+                messages.add_message(
+                    request, messages.ERROR,
+                    f'Order #{self.order.id} could not be canceled: it has been changed in the meantime'
+                )
+                return
             self.remove_order_from_session()
             messages.add_message(
                 request, messages.ERROR,
@@ -1,20 +1,86 @@
 # pylint: disable=C0111
 # pylint: disable=W0201
 from django import forms
+from django.db import IntegrityError
 from django.urls import reverse
+from django.utils.functional import cached_property
 from django.shortcuts import redirect
-from django.views.generic.edit import CreateView, UpdateView, DeleteView
+from django.views.generic.base import TemplateView
+from django.views.generic.edit import UpdateView, DeleteView
 from django.contrib import messages
 
+from ...menus import catalog
 from ..models import Order, OrderItem
 from ..mixins import UserSessionMixin
 
 
-class CreateOrderItem(UserSessionMixin, CreateView):
-    """Add a new order item to an existing order."""
+class OrderItemParticipantForm(forms.Form):
+    """Participant name shared by all items which are added at once."""
 
-    model = OrderItem
-    fields = ['participant', 'description', 'price', 'amount']
+    participant = forms.CharField(max_length=OrderItem._meta.get_field('participant').max_length)
+
+
+class CartItemForm(forms.ModelForm):
+    """
+    A single row of the items which are added at once.
+
+    Descriptions are suggested while typing. If a menu is given, its items are suggested instead and the price can be
+    left empty for them.
+    """
+
+    class Meta:  # noqa
+        model = OrderItem
+        fields = ['description', 'price', 'amount']
+
+    def __init__(self, *args, menu=None, **kwargs):
+        """
+        Create the form.
+
+        :param menu: dict of menu item prices by name
+        """
+        super().__init__(*args, **kwargs)
+        self.menu = menu or {}
+        self.fields['description'].widget.attrs['list'] = 'item-suggestions'
+        if self.menu:
+            self.fields['price'].required = False
+
+    def clean(self):
+        """Take the price from the menu if it has been left empty."""
+        cleaned_data = super().clean()
+        if cleaned_data.get('price') is None and 'price' not in self.errors:
+            price = self.menu.get(cleaned_data.get('description'))
+            if price is None:
+                self.add_error('price', forms.Field.default_error_messages['required'])
+            else:
+                cleaned_data['price'] = price
+        return cleaned_data
+
+
+class BaseCartItemFormSet(forms.BaseFormSet):
+    """Formset of items which are added at once, empty rows are ignored."""
+
+    def clean(self):
+        """Reject the same description being added twice."""
+        if any(self.errors):
+            return
+        descriptions = set()
+        for form in self.forms:
+            description = form.cleaned_data.get('description')
+            if description in descriptions:
+                raise forms.ValidationError(f'{description} has been added twice.')
+            if description:
+                descriptions.add(description)
+
+
+CartItemFormSet = forms.formset_factory(
+    CartItemForm, formset=BaseCartItemFormSet, extra=3, min_num=1, validate_min=True
+)
+
+
+class CreateOrderItem(UserSessionMixin, TemplateView):
+    """Add one or more new order items to an existing order."""
+
+    template_name = 'orders/orderitem_create.html'
 
     def dispatch(self, request, *args, **kwargs):
         """Ensure that the associated order's state is preparing."""
@@ -27,27 +93,59 @@ class CreateOrderItem(UserSessionMixin, CreateView):
             return redirect('orders:view_order', order_slug=self.order.slug)
         return super().dispatch(request, *args, **kwargs)
 
-    def get_initial(self):
-        """Populate the participant name if the user is already known in the session."""
-        return {'participant': self.username}
+    def get_forms(self):
+        """Return the participant form and the item formset, bound to the POST data if there is any."""
+        data = self.request.POST if self.request.method == 'POST' else None
+        form = OrderItemParticipantForm(data, initial={'participant': self.username})
+        menu = {item['name']: item['price'] for item in self.restaurant['items']} if self.restaurant else None
+        formset = CartItemFormSet(data, prefix='items', form_kwargs={'menu': menu})
+        return form, formset
+
+    @cached_property
+    def restaurant(self):
+        """Return the cached restaurant of the order with its menu, or None."""
+        return catalog.get_restaurant(self.order.restaurant_id) if self.order.restaurant_id else None
 
     def get_context_data(self, **kwargs):
-        """Load associated Order record."""
+        """Load associated Order record and the menu of its restaurant."""
         context = super().get_context_data(**kwargs)
         context['order'] = self.order
+        context['restaurant'] = self.restaurant
         return context
 
-    def form_valid(self, form):
-        """Associate created OrderItem with existing Order and add the participant's name to the session state."""
-        form_order_item = form.save(commit=False)
-        order_item = self.order.items.create(
-            participant=form_order_item.participant,
-            description=form_order_item.description,
-            price=form_order_item.price,
-            amount=form_order_item.amount,
-        )
-        self.add_order_item_to_session(str(self.order.id), str(order_item.id))
-        self.username = order_item.participant
+    def get(self, request, *args, **kwargs):
+        """Show empty forms."""
+        form, formset = self.get_forms()
+        return self.render_to_response(self.get_context_data(form=form, formset=formset))
+
+    def post(self, request, *args, **kwargs):
+        """Add all filled in items to the order at once and add them to the session state."""
+        form, formset = self.get_forms()
+        if form.is_valid() and formset.is_valid():
+            participant = form.cleaned_data['participant']
+            items = [item_form.save(commit=False) for item_form in formset if item_form.has_changed()]
+            for item in items:
+                item.participant = participant
+            existing = list(self.order.items.filter(
+                participant=participant, description__in=[item.description for item in items]
+            ).values_list('description', flat=True))
+            if existing:
+                form.add_error(None, f'You already added {", ".join(existing)}.')
+            else:
+                return self.add_items(request, items)
+        return self.render_to_response(self.get_context_data(form=form, formset=formset))
+
+    def add_items(self, request, items):
+        """Save the given items and redirect to the order."""
+        try:
+            items = self.order.add_items(items)
+        except ValueError as err:
+            messages.add_message(request, messages.ERROR, f'Can not add order item: {err}')
+        except IntegrityError:
+            messages.add_message(request, messages.ERROR, 'Can not add order item, it has been added already.')
+        else:
+            self.add_order_items_to_session(str(self.order.id), [str(item.id) for item in items])
+            self.username = items[0].participant
         return redirect('orders:view_order', order_slug=self.order.slug)
 
 
@@ -60,6 +158,11 @@ class UpdateOrderItemForm(forms.ModelForm):
 
     participant = forms.CharField(disabled=True)
 
+    def __init__(self, *args, **kwargs):
+        """Suggest descriptions while typing."""
+        super().__init__(*args, **kwargs)
+        self.fields['description'].widget.attrs['list'] = 'item-suggestions'
+
 
 class UpdateOrderItem(UserSessionMixin, UpdateView):
     """Update a single order item."""
@@ -71,7 +174,7 @@ class UpdateOrderItem(UserSessionMixin, UpdateView):
     def dispatch(self, request, *args, **kwargs):
         """Ensure that the associated order's state is preparing."""
         self.order = Order.objects.filter(slug=kwargs['order_slug']).get()
-        self.object = self.get_object()
+        self.object = super().get_object()
         if not self.order.is_preparing:
             messages.add_message(
                 request, messages.ERROR,
@@ -86,6 +189,14 @@ class UpdateOrderItem(UserSessionMixin, UpdateView):
             return redirect(self.get_success_url())
         return super().dispatch(request, *args, **kwargs)
 
+    def get_queryset(self):
+        """Look up the item among the items of the order, which sets the already loaded order as item.order."""
+        return self.order.items.all()
+
+    def get_object(self, queryset=None):
+        """Return the item loaded by dispatch(), instead of loading it again."""
+        return self.object
+
     def get_context_data(self, **kwargs):
         """Load associated Order record."""
         context = super().get_context_data(**kwargs)
@@ -96,6 +207,14 @@ class UpdateOrderItem(UserSessionMixin, UpdateView):
         """Return order detail view."""
         return reverse('orders:view_order', kwargs={'order_slug': self.order.slug})
 
+    def form_valid(self, form):
+        """Edit the item, unless the order has stopped preparing since dispatch() checked it."""
+        try:
+            return super().form_valid(form)
+        except ValueError as err:
+            messages.add_message(self.request, messages.ERROR, f'Can not edit order item: {err}')
+            return redirect(self.get_success_url())
+
 
 class DeleteOrderItem(UserSessionMixin, DeleteView):
     """Delete a single order item."""
@@ -106,7 +225,7 @@ class DeleteOrderItem(UserSessionMixin, DeleteView):
     def dispatch(self, request, *args, **kwargs):
         """Ensure that the associated order's state is preparing."""
         self.order = Order.objects.filter(slug=kwargs['order_slug']).get()
-        self.object = self.get_object()
+        self.object = super().get_object()
         if not self.order.is_preparing:
             messages.add_message(
                 request, messages.ERROR,
@@ -121,6 +240,14 @@ class DeleteOrderItem(UserSessionMixin, DeleteView):
             return redirect(self.get_success_url())
         return super().dispatch(request, *args, **kwargs)
 
+    def get_queryset(self):
+        """Look up the item among the items of the order, which sets the already loaded order as item.order."""
+        return self.order.items.all()
+
+    def get_object(self, queryset=None):
+        """Return the item loaded by dispatch(), instead of loading it again."""
+        return self.object
+
     def get_context_data(self, **kwargs):
         """Load associated Order record."""
         context = super().get_context_data(**kwargs)
@@ -130,3 +257,11 @@ class DeleteOrderItem(UserSessionMixin, DeleteView):
     def get_success_url(self):
         """Return order detail view."""
         return reverse('orders:view_order', kwargs={'order_slug': self.order.slug})
+
+    def form_valid(self, form):
+        """Delete the item, unless the order has stopped preparing since dispatch() checked it."""
+        try:
+            return super().form_valid(form)
+        except ValueError as err:
+            messages.add_message(self.request, messages.ERROR, f'Can not delete order item: {err}')
+            return redirect(self.get_success_url())
@@ -0,0 +1,66 @@
+$(function () {
+    // Add another empty row to the order item formset.
+    $('.cart-add-item').on('click', function () {
+        var $table = $('.cart-items');
+        var $total = $('#id_' + $table.data('prefix') + '-TOTAL_FORMS');
+        var index = parseInt($total.val(), 10);
+        var row = $('#cart-item-template').html().replace(/__prefix__/g, index);
+        $table.append(row);
+        $total.val(index + 1);
+    });
+
+    // Suggest descriptions while typing and fill in the price of picked suggestions. Menus are part of the page,
+    // otherwise suggestions of earlier orders are requested after a short pause.
+    var $suggestions = $('#item-suggestions');
+    var suggestionTimer = null;
+    var suggestionRequest = null;
+    $(document).on('input', 'input[list="item-suggestions"]', function () {
+        var text = this.value;
+        var $option = $suggestions.find('option').filter(function () {
+            return this.value === text;
+        });
+        var $price = $(this).closest('.cart-item, form').find('input[name$="price"]').first();
+        if ($option.length && !$price.val()) {
+            $price.val($option.attr('data-price'));
+        }
+        if (!$suggestions.data('url') || $option.length) {
+            return;
+        }
+        clearTimeout(suggestionTimer);
+        suggestionTimer = setTimeout(function () {
+            if (suggestionRequest) {
+                suggestionRequest.abort();
+            }
+            suggestionRequest = $.getJSON($suggestions.data('url'), {q: text}, function (data) {
+                $suggestions.empty();
+                data.suggestions.forEach(function (suggestion) {
+                    $('<option>').val(suggestion.description).attr('data-price', suggestion.price)
+                        .text(suggestion.price + ' €').appendTo($suggestions);
+                });
+            });
+        }, 100);
+    });
+
+    // Reload the order in place whenever its event stream reports a newer version.
+    var $order = $('.order-page[data-order-events]');
+    if ($order.length && window.EventSource) {
+        var version = parseInt($order.data('order-version'), 10);
+        var source = new EventSource($order.data('order-events'));
+        var refresh = function (event) {
+            var change = JSON.parse(event.data);
+            if (change.version <= version) {
+                return;
+            }
+            version = change.version;
+            $.get(window.location.href, function (html) {
+                var $page = $('<div>').append($.parseHTML(html)).find('.order-page');
+                if ($page.length) {
+                    $order.html($page.html());
+                }
+            });
+        };
+        ['order', 'items', 'state'].forEach(function (name) {
+            source.addEventListener(name, refresh);
+        });
+    }
+});
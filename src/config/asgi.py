@@ -0,0 +1,19 @@
+"""
+ASGI config for webapi project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+import sys
+
+from django.core.asgi import get_asgi_application
+
+# This allows easy placement of apps within the interior
+# chaospizza directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)).replace('/config', ''), 'chaospizza'))
+
+application = get_asgi_application()
@@ -8,6 +8,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/1.11/ref/settings/
 """
 import environ
+from django.core.exceptions import ImproperlyConfigured
 
 # (chaosdorf-pizza/config/settings/base.py - 3 = chaosdorf-pizza/)
 ROOT_DIR = environ.Path(__file__) - 3
@@ -43,6 +44,7 @@ THIRD_PARTY_APPS = [
 LOCAL_APPS = [
     'chaospizza.menus.apps.MenusConfig',
     'chaospizza.orders.apps.OrdersConfig',
+    'chaospizza.metrics.apps.MetricsConfig',
 ]
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
@@ -50,6 +52,8 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 # MIDDLEWARE CONFIGURATION
 # ------------------------------------------------------------------------------
 MIDDLEWARE = [
+    # First, so that all other middleware is measured as part of the request.
+    'chaospizza.metrics.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,6 +91,53 @@ USE_TZ = True
 DATABASES = {'default': env.db('DJANGO_DATABASE_URL')}
 
 
+# CACHE CONFIGURATION
+# ------------------------------------------------------------------------------
+# See: https://docs.djangoproject.com/en/4.2/topics/cache/
+# Rendered order pages are cached, see chaospizza/orders/cache.py. The local-memory
+# cache is private to each process, so use a shared backend (e.g.
+# filecache:///var/tmp/chaospizza-cache) when running multiple worker processes.
+CACHES = {'default': env.cache('DJANGO_CACHE_URL', default='locmemcache://')}
+CACHES['default'].setdefault('KEY_PREFIX', 'chaospizza')
+
+
+# SESSION CONFIGURATION
+# ------------------------------------------------------------------------------
+# See: https://docs.djangoproject.com/en/4.2/topics/http/sessions/#configuring-the-session-engine
+# Every page reads the session, see chaospizza/orders/mixins.py. With the
+# default database sessions this costs a query per request, and another one
+# whenever the session changes. signed_cookies keeps the session in the client
+# and needs neither, cache needs a shared cache backend (see above) when running
+# multiple worker processes, cached_db reads from the cache but still writes to
+# the database.
+SESSION_STORES = ('db', 'cache', 'cached_db', 'signed_cookies')
+SESSION_STORE = env('DJANGO_SESSION_STORE', default='db')
+if SESSION_STORE not in SESSION_STORES:
+    raise ImproperlyConfigured(f'DJANGO_SESSION_STORE must be one of {", ".join(SESSION_STORES)}')
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_STORE}'
+# Messages are always kept in a cookie, so showing them never touches the session.
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+
+# ORDER EVENTS CONFIGURATION
+# ------------------------------------------------------------------------------
+# Seconds between two checks for changed orders when the database does not
+# support LISTEN/NOTIFY, see chaospizza/orders/events.py.
+ORDER_EVENTS_POLL_INTERVAL = env.float('ORDER_EVENTS_POLL_INTERVAL', default=1.0)
+
+
+# METRICS CONFIGURATION
+# ------------------------------------------------------------------------------
+# Request metrics are served at /metrics in the Prometheus text format, see
+# chaospizza/metrics/registry.py. Every worker process writes its totals to a
+# file in METRICS_DIR, which must be shared by all worker processes and emptied
+# before the server starts. Without it, /metrics only shows the totals of the
+# process serving it. /metrics requires METRICS_TOKEN as bearer token, and is
+# disabled without it unless DEBUG is enabled.
+METRICS_DIR = env('METRICS_DIR', default='')
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+
+
 # EMAIL CONFIGURATION
 # ------------------------------------------------------------------------------
 EMAIL_BACKEND = env('DJANGO_EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
@@ -123,7 +174,9 @@ AUTH_PASSWORD_VALIDATORS = [
 # https://docs.djangoproject.com/en/1.11/ref/settings/#templates
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # The Django template engine, measuring render times for the request metrics.
+        'BACKEND': 'chaospizza.metrics.templates.DjangoTemplates',
+        'NAME': 'django',
         'APP_DIRS': True,
         'DIRS': [str(APPS_DIR.path('templates'))],
         'OPTIONS': {
@@ -25,6 +25,7 @@ from .base import *  # noqa
 # See: https://docs.djangoproject.com/en/dev/ref/settings/#secret-key
 # Raises ImproperlyConfigured exception if DJANGO_SECRET_KEY not in os.environ
 SECRET_KEY = secret('DJANGO_SECRET_KEY') or env('DJANGO_SECRET_KEY')
+METRICS_TOKEN = secret('METRICS_TOKEN') or env('METRICS_TOKEN', default='')
 
 
 # SECURITY CONFIGURATION
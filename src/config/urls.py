@@ -9,6 +9,7 @@ from django.views import defaults as default_views
 urlpatterns = [
     re_path(r'^', include('chaospizza.orders.urls')),
     re_path(r'^menus/', include('chaospizza.menus.urls')),
+    re_path(r'^', include('chaospizza.metrics.urls')),
     re_path(r'^admin/', admin.site.urls, name='admin'),
 ]
 
@@ -14,9 +14,30 @@ echo "from django.contrib.auth.models import User; \
   User.objects.create_superuser('$USERNAME', '$EMAIL', '$PASSWORD')" \
    | python manage.py shell
 
+if [ "${ORDER_EXPIRY_INTERVAL:-5}" != "0" ]; then
+    echo "*** Starting order expiry loop"
+    python manage.py expire_orders --loop --interval ${ORDER_EXPIRY_INTERVAL:-5} &
+fi
+
+if [ -n "$METRICS_DIR" ]; then
+    echo "*** Clearing request metrics of previous runs"
+    rm -rf "$METRICS_DIR"
+fi
+
 echo "*** Launching application server"
-exec gunicorn config.wsgi:application \
+# Sync workers serve the WSGI application, which is faster as long as clients are
+# quick. With GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker the ASGI
+# application is served instead, which keeps order event streams and slow
+# clients open without blocking a worker each.
+WORKER_CLASS=${GUNICORN_WORKER_CLASS:-sync}
+if [ "$WORKER_CLASS" = "sync" ]; then
+    APPLICATION=config.wsgi:application
+else
+    APPLICATION=config.asgi:application
+fi
+exec gunicorn $APPLICATION \
     --name chaospizza \
     --bind 0.0.0.0:${GUNICORN_BIND_PORT:-8000} \
     --workers ${GUNICORN_WORKERS:-4} \
+    --worker-class $WORKER_CLASS \
     "$@"